@@ -0,0 +1,178 @@
+"""
+Admission control for the expensive endpoints of the API.
+
+Endpoints are grouped into classes; each limited class admits at most
+`concurrency` requests at a time per process and lets up to `queue` more
+wait for a slot for at most `wait` seconds. Anything beyond that is turned
+away at once instead of tying up a worker thread:
+
+* 429 Too Many Requests when the class's wait queue is full
+* 503 Service Unavailable when no slot freed up in time, or the request ran
+  past its deadline
+
+Both carry a Retry-After estimated from recent service times. Unclassified
+endpoints (dashboard, student lookups, predictions) are never limited, so
+they keep their latency while heavy calls queue up.
+
+A class may also set a `deadline` in seconds, counted from when the request
+arrived. Views check it between stages with check_deadline(), which raises
+DeadlineExceeded so the rest of the work is skipped. Keep every class's
+concurrency + queue well below the worker's thread count: waiting requests
+hold a thread.
+"""
+
+import json
+import math
+import threading
+import time
+
+from flask import g, has_request_context, jsonify, request
+
+import metrics
+
+# Explanations get their own class so a burst of them can't crowd out the other heavy endpoints
+DEFAULT_CLASSES = {
+    'shap_analysis': 'explain',
+    'advanced_analytics': 'heavy',
+    'model_performance': 'heavy',
+    'upload_file': 'heavy',
+}
+DEFAULT_LIMITS = {
+    'explain': {'concurrency': 1, 'queue': 1, 'wait': 5.0, 'deadline': 30.0},
+    'heavy': {'concurrency': 1, 'queue': 1, 'wait': 5.0, 'deadline': 60.0},
+}
+MAX_RETRY_AFTER = 60
+
+admission_rejections = metrics.registry.register(metrics.Counter(
+    'admission_rejections_total', 'Requests turned away by admission control', ('class', 'reason')))
+admission_wait = metrics.registry.register(metrics.Histogram(
+    'admission_wait_seconds', 'Time admitted requests waited for a slot', ('class',)))
+
+
+class DeadlineExceeded(Exception):
+    """The request ran past its admission deadline"""
+
+
+class Rejected(Exception):
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Limiter:
+    """Counting semaphore with a bounded, timed wait queue"""
+
+    def __init__(self, name, concurrency, queue=0, wait=0.0, deadline=None):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.wait = wait
+        self.deadline = deadline
+        self.active = 0
+        self.waiting = 0
+        # Moving average of how long an admitted request holds its slot
+        self.service_seconds = 1.0
+        self._condition = threading.Condition()
+
+    def retry_after(self):
+        estimate = self.service_seconds * (self.waiting + 1) / max(self.concurrency, 1)
+        return min(MAX_RETRY_AFTER, max(1, math.ceil(estimate)))
+
+    def acquire(self, timeout=None):
+        """Take a slot, waiting up to timeout (default: the class's wait); raises Rejected"""
+        timeout = self.wait if timeout is None else min(timeout, self.wait)
+        with self._condition:
+            if self.active < self.concurrency:
+                self.active += 1
+                return 0.0
+            if self.waiting >= self.queue or timeout <= 0:
+                raise Rejected(429, 'queue full', self.retry_after())
+
+            self.waiting += 1
+            start = time.perf_counter()
+            try:
+                admitted = self._condition.wait_for(lambda: self.active < self.concurrency, timeout)
+            finally:
+                self.waiting -= 1
+            if not admitted:
+                raise Rejected(503, 'wait timeout', self.retry_after())
+            self.active += 1
+            return time.perf_counter() - start
+
+    def release(self, held_seconds):
+        with self._condition:
+            self.active -= 1
+            self.service_seconds = 0.8 * self.service_seconds + 0.2 * held_seconds
+            self._condition.notify()
+
+
+def merge_limits(overrides):
+    """DEFAULT_LIMITS with a JSON object of per-class overrides applied (null drops a class)"""
+    limits = {name: dict(settings) for name, settings in DEFAULT_LIMITS.items()}
+    for name, settings in (json.loads(overrides) if overrides else {}).items():
+        if settings is None:
+            limits.pop(name, None)
+        else:
+            limits.setdefault(name, {'concurrency': 1}).update(settings)
+    return limits
+
+
+def check_deadline():
+    """Raise DeadlineExceeded if the current request is past its deadline"""
+    if not has_request_context():
+        return
+    deadline = g.get('admission_deadline')
+    if deadline is not None and time.monotonic() > deadline:
+        raise DeadlineExceeded(f"Request exceeded its {g.admission_limiter.deadline:g}s budget")
+
+
+def _rejection(status, reason, retry_after):
+    response = jsonify({'error': f'Server busy ({reason}); retry later', 'retry_after': retry_after})
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def instrument_app(app):
+    """Limit the endpoint classes configured in ADMISSION_CLASSES / ADMISSION_LIMITS"""
+    classes = app.config.get('ADMISSION_CLASSES', DEFAULT_CLASSES)
+    limits = app.config.get('ADMISSION_LIMITS', DEFAULT_LIMITS)
+    limiters = {name: Limiter(name, **settings) for name, settings in limits.items()}
+    app.extensions['admission'] = limiters
+    if not limiters:
+        return app
+
+    @app.before_request
+    def admit_request():
+        limiter = limiters.get(classes.get(request.endpoint))
+        if limiter is None:
+            return None
+        arrived = time.monotonic()
+        try:
+            waited = limiter.acquire()
+        except Rejected as e:
+            admission_rejections.inc(limiter.name, e.reason)
+            return _rejection(e.status, e.reason, e.retry_after)
+        admission_wait.observe(waited, limiter.name)
+        g.admission_limiter = limiter
+        g.admission_admitted = time.monotonic()
+        if limiter.deadline:
+            g.admission_deadline = arrived + limiter.deadline
+        return None
+
+    @app.teardown_request
+    def release_slot(exc):
+        limiter = g.pop('admission_limiter', None)
+        if limiter is not None:
+            limiter.release(time.monotonic() - g.pop('admission_admitted'))
+
+    @app.errorhandler(DeadlineExceeded)
+    def deadline_exceeded(e):
+        limiter = g.get('admission_limiter')
+        name = limiter.name if limiter is not None else 'unlimited'
+        admission_rejections.inc(name, 'deadline')
+        return _rejection(503, 'deadline exceeded', limiter.retry_after() if limiter is not None else 1)
+
+    return app
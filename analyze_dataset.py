@@ -1,14 +1,15 @@
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from dataset_cache import read_excel_cached
 
 # Read the dataset
 print("🔍 Analyzing Student Engagement Dataset")
 print("=" * 50)
 
 try:
-    # Read Excel file
-    df = pd.read_excel('Dataset.xlsx')
+    # Read Excel file (cached after the first run)
+    df = read_excel_cached('Dataset.xlsx')
 
     print(f"📊 Dataset Shape: {df.shape[0]} rows × {df.shape[1]} columns")
     print("\n📋 Column Information:")
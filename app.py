@@ -1,16 +1,18 @@
-from flask import Flask, jsonify, request, render_template, send_file, send_from_directory
+from flask import Flask, abort, g, has_request_context, jsonify, request, render_template, send_file, send_from_directory
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
-import joblib
 import os
 from datetime import datetime
 import json
+import hmac
 import shap
 import matplotlib.pyplot as plt
 import seaborn as sns
 import io
 import base64
+import threading
+import time
 from werkzeug.utils import secure_filename
 import smtplib
 from email.mime.text import MIMEText
@@ -18,6 +20,16 @@ from email.mime.multipart import MIMEMultipart
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.utils import PlotlyJSONEncoder
+from student_store import create_student_store
+from student_schema import to_records
+import admission
+import metrics
+import model_report
+from model_registry import ModelRegistry
+import prediction_cache
+import profiling
+import rescoring
+import shadow
 
 app = Flask(__name__, static_folder='dist', static_url_path='')
 CORS(app)  # Enable CORS for frontend integration
@@ -27,6 +39,57 @@ app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['ALLOWED_EXTENSIONS'] = {'csv', 'xlsx', 'xls'}
 
+# Student data backend: 'pandas' (in-memory frame) or 'sqlite' (indexed database)
+app.config['STUDENT_BACKEND'] = os.environ.get('STUDENT_BACKEND', 'pandas')
+app.config['STUDENT_DATA_PATH'] = os.environ.get('STUDENT_DATA_PATH', 'data/processed_data.csv')
+app.config['STUDENT_DB_PATH'] = os.environ.get('STUDENT_DB_PATH', 'data/students.db')
+
+# Model for interactive single-student endpoints: 'fast' (distilled) or 'full'
+app.config['INTERACTIVE_MODEL'] = os.environ.get('INTERACTIVE_MODEL', 'fast')
+
+# Per-student scores and cached explanations kept up to date by rescoring.py
+app.config['SCORE_STATE_DIR'] = os.environ.get('SCORE_STATE_DIR', rescoring.DEFAULT_STATE_DIR)
+
+# Model bundles: new versions in MODEL_DIR are picked up every
+# MODEL_WATCH_INTERVAL seconds (0 disables hot reload); ADMIN_TOKEN guards
+# /admin/model and its rollback (disabled while empty)
+app.config['MODEL_DIR'] = os.environ.get('MODEL_DIR', 'models')
+app.config['MODEL_WATCH_INTERVAL'] = float(os.environ.get('MODEL_WATCH_INTERVAL', 5))
+app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN', '')
+
+# Shadow scoring (see shadow.py): a candidate bundle in SHADOW_MODEL_DIR is
+# compared against served predictions off the request path; empty disables
+app.config['SHADOW_MODEL_DIR'] = os.environ.get('SHADOW_MODEL_DIR', '')
+app.config['SHADOW_QUEUE_SIZE'] = int(os.environ.get('SHADOW_QUEUE_SIZE', shadow.DEFAULT_QUEUE_SIZE))
+app.config['SHADOW_SAMPLE_RATE'] = float(os.environ.get('SHADOW_SAMPLE_RATE', 1.0))
+
+# Probabilities cached per preprocessed feature vector and model version,
+# shared by predict, simulate and upload scoring (0 disables)
+app.config['PREDICTION_CACHE_SIZE'] = int(os.environ.get('PREDICTION_CACHE_SIZE',
+                                                         prediction_cache.DEFAULT_MAX_ENTRIES))
+
+# Per-route latency histograms, stage timings and cache hit rates on /metrics
+metrics.instrument_app(app)
+
+# Concurrency limits, wait queues and deadlines for the expensive endpoints
+# (see admission.py); ADMISSION_LIMITS is JSON merged over the defaults, e.g.
+# '{"heavy": {"concurrency": 2, "queue": 2}}', with null to unlimit a class
+app.config['ADMISSION_CLASSES'] = admission.DEFAULT_CLASSES
+app.config['ADMISSION_LIMITS'] = admission.merge_limits(os.environ.get('ADMISSION_LIMITS', ''))
+admission.instrument_app(app)
+
+# Opt-in profiling (see profiling.py); nothing is registered unless one is set.
+# PROFILE_TOKEN enables the X-Profile request header and /admin/profiles,
+# PROFILE_ROUTES profiles every request to the listed endpoints and
+# PROFILE_SAMPLER_INTERVAL (seconds) starts the rolling whole-process sampler
+app.config['PROFILE_TOKEN'] = os.environ.get('PROFILE_TOKEN', '')
+app.config['PROFILE_ROUTES'] = [route for route in os.environ.get('PROFILE_ROUTES', '').split(',') if route]
+app.config['PROFILE_MODE'] = os.environ.get('PROFILE_MODE', 'cprofile')
+app.config['PROFILE_SAMPLER_INTERVAL'] = float(os.environ.get('PROFILE_SAMPLER_INTERVAL', 0))
+app.config['PROFILE_SAMPLER_WINDOW'] = float(os.environ.get('PROFILE_SAMPLER_WINDOW', 60))
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', 'profiles')
+profiling.instrument_app(app)
+
 # Email configuration (update with your settings)
 EMAIL_CONFIG = {
     'smtp_server': 'smtp.gmail.com',
@@ -35,11 +98,43 @@ EMAIL_CONFIG = {
     'sender_password': 'your-app-password'
 }
 
-# Model and preprocessing objects (to be loaded)
-model = None
-feature_columns = None
-scaler = None
-explainer = None
+# Served model bundle (model, fast model, feature pipeline, explainer...);
+# each request pins the bundle current when it starts, see current_bundle()
+model_registry = ModelRegistry(app.config['MODEL_DIR'])
+result_cache = prediction_cache.PredictionCache(app.config['PREDICTION_CACHE_SIZE'])
+# Entries of the replaced version can't match any more; free their room
+model_registry.on_swap(lambda new, old: old is not None and result_cache.clear())
+os.register_at_fork(after_in_child=result_cache.after_fork)
+shadow_scorer = None
+student_store = None
+
+# Set once a first request had to load the model itself (a bare WSGI server
+# such as `gunicorn app:app`; serve.py and `python app.py` load it up front)
+model_load_attempted = False
+model_load_lock = threading.Lock()
+
+# Readiness of this process for /readyz; each forked worker has its own copy
+serving_state = {
+    'ready': False,
+    'draining': False,
+    'warmup_seconds': None,
+    'error': None,
+}
+
+# Persisted performance report and its background refresh state
+performance_report = None
+performance_report_mtime = None
+performance_refresh_thread = None
+performance_refresh_error = None
+performance_lock = threading.Lock()
+
+# Score state from rescoring.py and the manifest mtime it was loaded at
+score_state = (None, None)
+score_state_mtime = None
+
+# pyplot keeps one global current figure, and shap.summary_plot draws on it,
+# so only one thread may plot at a time
+plot_lock = threading.Lock()
 
 # Create necessary directories
 os.makedirs('uploads', exist_ok=True)
@@ -69,14 +164,14 @@ def upload_page():
 def dashboard():
     """Get dashboard KPIs and metrics"""
     try:
-        # Load processed data for dashboard metrics
-        df = pd.read_csv('data/processed_data.csv')
+        store = get_student_store()
 
         # Calculate KPIs
-        total_students = len(df)
-        high_risk = len(df[df['risk_level'] == 'High'])
-        medium_risk = len(df[df['risk_level'] == 'Medium'])
-        low_risk = len(df[df['risk_level'] == 'Low'])
+        risk_counts = store.risk_counts()
+        total_students = int(risk_counts.sum())
+        high_risk = int(risk_counts.get('High', 0))
+        medium_risk = int(risk_counts.get('Medium', 0))
+        low_risk = int(risk_counts.get('Low', 0))
 
         kpis = {
             'total_students': total_students,
@@ -84,7 +179,7 @@ def dashboard():
             'medium_risk': medium_risk,
             'low_risk': low_risk,
             'disengagement_rate': round((high_risk / total_students) * 100, 2),
-            'avg_engagement_score': round(df['engagement_score'].mean(), 2)
+            'avg_engagement_score': round(store.column_mean('engagement_score'), 2)
         }
 
         return jsonify(kpis)
@@ -96,39 +191,31 @@ def dashboard():
 def get_students():
     """Get all students with filtering and pagination"""
     try:
-        df = pd.read_csv('data/processed_data.csv')
-
         # Get query parameters
         search = request.args.get('search', '')
         risk_filter = request.args.get('risk', '')
         department = request.args.get('department', '')
+        sort_by = request.args.get('sort', '')
+        ascending = request.args.get('order', 'asc').lower() != 'desc'
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
 
-        # Apply filters - search only on student_id since name doesn't exist
-        if search:
-            df = df[df['student_id'].astype(str).str.contains(search, case=False, na=False)]
-
-        if risk_filter:
-            # Handle case sensitivity
-            df = df[df['risk_level'].str.lower() == risk_filter.lower()]
-
-        if department:
-            # Department is numeric in the data
-            df = df[df['department'].astype(str) == str(department)]
-
-        # Pagination
+        # Filters, sort order and pagination are applied by the student store
+        # (search only on student_id since name doesn't exist; risk is case
+        # insensitive; department is numeric in the data)
         start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        total_pages = (len(df) + per_page - 1) // per_page
-
-        students = df.iloc[start_idx:end_idx].to_dict('records')
+        students, total = get_student_store().query_students(
+            search=search, risk=risk_filter, department=department,
+            sort_by=sort_by or None, ascending=ascending,
+            offset=start_idx, limit=per_page
+        )
+        total_pages = (total + per_page - 1) // per_page
 
         return jsonify({
             'students': students,
             'total_pages': total_pages,
             'current_page': page,
-            'total_students': len(df)
+            'total_students': total
         })
 
     except Exception as e:
@@ -138,16 +225,16 @@ def get_students():
 def get_student(student_id):
     """Get detailed information for a specific student"""
     try:
-        df = pd.read_csv('data/processed_data.csv')
-        student = df[df['student_id'] == student_id]
+        student = get_student_store().get_student(student_id)
 
         if student.empty:
             return jsonify({'error': 'Student not found'}), 404
 
-        student_data = student.iloc[0].to_dict()
+        student_data = to_records(student)[0]
 
         # Get feature importance if available
-        if model and hasattr(model, 'feature_importances_'):
+        bundle = current_bundle()
+        if bundle and hasattr(bundle.model, 'feature_importances_'):
             # Calculate SHAP values or feature importance
             feature_importance = get_feature_importance(student_data)
             student_data['feature_importance'] = feature_importance
@@ -166,21 +253,19 @@ def predict():
         if not data:
             return jsonify({'error': 'No data provided'}), 400
 
-        # Convert to DataFrame
-        input_df = pd.DataFrame([data])
-
-        # Preprocess the data (same preprocessing as training)
-        processed_data = preprocess_data(input_df)
+        # Preprocess the data (same fitted pipeline as training)
+        started = time.perf_counter()
+        processed_data = preprocess_data(data)
 
         # Make prediction
-        if model:
-            prediction = model.predict(processed_data)
-            probability = model.predict_proba(processed_data)
+        if current_bundle():
+            prediction, probability = predict_interactive(processed_data)
+            submit_shadow(data, probability, time.perf_counter() - started)
 
             result = {
-                'risk_level': prediction[0],
-                'engagement_score': probability[0][1] * 100,  # Assuming binary classification
-                'confidence': max(probability[0]) * 100
+                'risk_level': int(prediction[0]),
+                'engagement_score': float(probability[0][1]) * 100,  # Assuming binary classification
+                'confidence': float(max(probability[0])) * 100
             }
 
             return jsonify(result)
@@ -192,7 +277,11 @@ def predict():
 
 @app.route('/api/simulate', methods=['POST'])
 def simulate():
-    """Simulate different scenarios"""
+    """Simulate different scenarios
+
+    Send either one set of 'modifications' or a 'scenarios' list of them; a
+    scenario sweep is scored as a single batch.
+    """
     try:
         data = request.get_json()
 
@@ -202,33 +291,51 @@ def simulate():
         # Get base student data
         student_id = data.get('student_id')
         modifications = data.get('modifications', {})
+        scenarios = data.get('scenarios')
 
         # Load student data and apply modifications
-        df = pd.read_csv('data/processed_data.csv')
-        student_data = df[df['student_id'] == student_id]
+        student_data = get_student_store().get_student(student_id)
 
         if student_data.empty:
             return jsonify({'error': 'Student not found'}), 404
 
-        # Apply modifications
-        student_dict = student_data.iloc[0].to_dict()
-        for feature, value in modifications.items():
-            if feature in student_dict:
-                student_dict[feature] = value
-        
-        # Convert back to DataFrame
-        student_df = pd.DataFrame([student_dict])
-
-        # Make prediction with modified data
-        if model:
-            processed_data = preprocess_data(student_df)
-            prediction = model.predict(processed_data)
-            probability = model.predict_proba(processed_data)
+        base_student = to_records(student_data)[0]
+
+        def apply_modifications(changes):
+            student_dict = dict(base_student)
+            for feature, value in changes.items():
+                if feature in student_dict:
+                    student_dict[feature] = value
+            return student_dict
+
+        # Make prediction with modified data; engineered features are
+        # recomputed from the modified source columns
+        if current_bundle():
+            if scenarios is not None:
+                started = time.perf_counter()
+                records = [apply_modifications(changes) for changes in scenarios]
+                processed_data = preprocess_data(records)
+                predictions, probabilities = predict_interactive(processed_data)
+                submit_shadow(records, probabilities, time.perf_counter() - started)
+                return jsonify({
+                    'original_risk': data.get('original_risk', ''),
+                    'scenarios': [{
+                        'modifications': changes,
+                        'new_risk': int(prediction),
+                        'new_engagement_score': float(probability[1]) * 100
+                    } for changes, prediction, probability in zip(scenarios, predictions, probabilities)]
+                })
+
+            started = time.perf_counter()
+            record = apply_modifications(modifications)
+            processed_data = preprocess_data(record)
+            prediction, probability = predict_interactive(processed_data)
+            submit_shadow(record, probability, time.perf_counter() - started)
 
             result = {
                 'original_risk': data.get('original_risk', ''),
-                'new_risk': prediction[0],
-                'new_engagement_score': probability[0][1] * 100,
+                'new_risk': int(prediction[0]),
+                'new_engagement_score': float(probability[0][1]) * 100,
                 'modifications': modifications
             }
 
@@ -241,15 +348,21 @@ def simulate():
 def analytics():
     """Get detailed analytics data"""
     try:
-        df = pd.read_csv('data/processed_data.csv')
+        store = get_student_store()
 
-        # Generate analytics data
+        # Generate analytics data (aggregates are computed by the student store)
         analytics_data = {
-            'risk_distribution': df['risk_level'].value_counts().to_dict(),
-            'department_analysis': df.groupby('department')['risk_level'].value_counts().unstack().fillna(0).to_dict(),
-            'attendance_performance_correlation': df[['attendance', 'engagement_score']].corr().to_dict()
+            'risk_distribution': store.risk_counts().to_dict(),
+            'department_analysis': store.department_risk_counts().unstack().fillna(0).to_dict(),
+            'attendance_performance_correlation': store.frame(['attendance_rate', 'engagement_score']).corr().to_dict()
         }
 
+        # Predicted risk, maintained incrementally by rescoring.py
+        _, score_manifest = get_score_state()
+        if score_manifest is not None:
+            analytics_data['predicted_risk_distribution'] = score_manifest['aggregates'].get('risk_counts', {})
+            analytics_data['predicted_department_risk'] = score_manifest['aggregates'].get('department_risk_counts', {})
+
         return jsonify(analytics_data)
 
     except Exception as e:
@@ -272,6 +385,7 @@ def upload_file():
             file.save(filepath)
 
             # Process the uploaded file
+            admission.check_deadline()
             results = process_batch_predictions(filepath)
 
             return jsonify({
@@ -281,6 +395,8 @@ def upload_file():
         else:
             return jsonify({'error': 'File type not allowed'}), 400
 
+    except admission.DeadlineExceeded:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -288,46 +404,61 @@ def upload_file():
 def shap_analysis(student_id):
     """Get SHAP analysis for a specific student"""
     try:
-        df = pd.read_csv('data/processed_data.csv')
-        student = df[df['student_id'] == student_id]
+        student = get_student_store().get_student(student_id)
 
         if student.empty:
             return jsonify({'error': 'Student not found'}), 404
 
+        bundle = current_bundle()
+        if bundle is None:
+            return jsonify({'error': 'Model not loaded'}), 500
+
         # Prepare data for SHAP analysis
+        feature_columns = bundle.feature_columns
         student_data = student[feature_columns]
-        student_scaled = scaler.transform(student_data)
-
-        if explainer:
-            # Calculate SHAP values
-            shap_values = explainer.shap_values(student_scaled)
-
-            # Create visualization
-            plt.figure(figsize=(10, 8))
-            shap.summary_plot(shap_values, student_data,
-                            feature_names=feature_columns, show=False)
-
-            # Save plot to base64
-            img_buffer = io.BytesIO()
-            plt.savefig(img_buffer, format='png', bbox_inches='tight')
-            img_buffer.seek(0)
-            img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
-            plt.close()
-
-            # Get feature importance for this student
-            student_shap = shap_values[0] if len(shap_values.shape) > 2 else shap_values
-            feature_importance = list(zip(feature_columns, student_shap))
+        student_scaled = preprocess_data(student)
+
+        if bundle.explainer:
+            admission.check_deadline()
+            with metrics.stage('explain'):
+                # Calculate SHAP values
+                shap_values = bundle.explainer.shap_values(student_scaled)
+
+                # Create visualization
+                img_buffer = io.BytesIO()
+                with plot_lock:
+                    figure = plt.figure(figsize=(10, 8))
+                    try:
+                        shap.summary_plot(shap_values, student_data,
+                                        feature_names=feature_columns, show=False)
+
+                        # Save plot to base64
+                        plt.savefig(img_buffer, format='png', bbox_inches='tight')
+                    finally:
+                        plt.close(figure)
+                img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
+
+            # Get feature importance for this student (one row; first class
+            # for multi-class explainers)
+            student_shap = np.asarray(shap_values[0] if isinstance(shap_values, list) else shap_values)[0]
+            feature_importance = [(col, float(value)) for col, value in zip(feature_columns, student_shap)]
             feature_importance.sort(key=lambda x: abs(x[1]), reverse=True)
 
+            admission.check_deadline()
+            with metrics.stage('predict'):
+                probability = bundle.model.predict_proba(student_scaled)[0]
+
             return jsonify({
                 'shap_plot': f'data:image/png;base64,{img_base64}',
                 'feature_importance': feature_importance[:10],
-                'prediction': model.predict(student_scaled)[0],
-                'confidence': max(model.predict_proba(student_scaled)[0]) * 100
+                'prediction': int(probability.argmax()),
+                'confidence': float(max(probability)) * 100
             })
         else:
             return jsonify({'error': 'SHAP explainer not available'}), 500
 
+    except admission.DeadlineExceeded:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -335,7 +466,8 @@ def shap_analysis(student_id):
 def advanced_analytics():
     """Get advanced analytics with interactive charts"""
     try:
-        df = pd.read_csv('data/processed_data.csv')
+        store = get_student_store()
+        df = store.frame()
 
         # Generate interactive charts using Plotly
         charts = {}
@@ -352,6 +484,7 @@ def advanced_analytics():
         numeric_cols = [col for col in numeric_cols if col not in exclude_cols]
         
         if len(numeric_cols) > 1:
+            admission.check_deadline()
             correlation_matrix = df[numeric_cols].corr()
 
             # Create heatmap
@@ -364,13 +497,10 @@ def advanced_analytics():
             charts['correlation_heatmap'] = json.loads(fig.to_json())
 
         # 3. Department-wise performance
+        admission.check_deadline()
         if 'department' in df.columns:
             try:
-                dept_performance = df.groupby('department').agg({
-                    'engagement_score': 'mean',
-                    'attendance_rate': 'mean',
-                    'risk_level': lambda x: (x == 'High').mean() * 100
-                }).round(2).reset_index()
+                dept_performance = store.department_performance().round(2).reset_index()
 
                 # Create bar chart
                 fig = px.bar(dept_performance, x='department', y='engagement_score',
@@ -383,6 +513,7 @@ def advanced_analytics():
                 print(f"Error creating department performance: {e}")
 
         # 4. Risk factors analysis
+        admission.check_deadline()
         try:
             risk_factors = analyze_risk_factors(df)
             charts['risk_factors'] = risk_factors
@@ -392,6 +523,8 @@ def advanced_analytics():
 
         return jsonify(charts)
 
+    except admission.DeadlineExceeded:
+        raise
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -406,8 +539,7 @@ def send_alert():
         student_id = data.get('student_id')
         alert_type = data.get('alert_type', 'high_risk')
 
-        df = pd.read_csv('data/processed_data.csv')
-        student = df[df['student_id'] == student_id]
+        student = get_student_store().get_student(student_id)
 
         if student.empty:
             return jsonify({'error': 'Student not found'}), 404
@@ -425,73 +557,245 @@ def send_alert():
 
 @app.route('/api/model_performance')
 def model_performance():
-    """Get detailed model performance metrics"""
-    try:
-        df = pd.read_csv('data/processed_data.csv')
-
-        # Split features and target
-        # Use risk_level_encoded for numeric target, convert risk_level to numeric if needed
-        if 'risk_level_encoded' in df.columns:
-            y = df['risk_level_encoded']
-        else:
-            # Convert string risk_level to numeric for metrics
-            label_encoders = joblib.load('models/label_encoders.pkl')
-            y = label_encoders['risk_level'].transform(df['risk_level'])
-        
-        X = df[feature_columns]
-
-        # Scale features
-        X_scaled = scaler.transform(X)
+    """Get detailed model performance metrics
 
-        # Get predictions
-        predictions = model.predict(X_scaled)
-        probabilities = model.predict_proba(X_scaled)
-
-        # Calculate metrics
-        from sklearn.metrics import classification_report, confusion_matrix
+    Serves the report saved at training time. When the processed data or the
+    model has changed since, the stale report is returned while a fresh one
+    is computed in the background; ?recompute=true forces that refresh.
+    Without any saved report, answers 202 while the first one is computed.
+    """
+    try:
+        report = get_performance_report()
+        if report is None:
+            # No saved report for this model bundle yet: compute it off the request thread
+            refresh_performance_report_async()
+            response = jsonify({
+                'status': 'computing',
+                'message': 'The performance report is being computed; retry shortly',
+                'last_error': performance_refresh_error
+            })
+            response.status_code = 202
+            response.headers['Retry-After'] = '5'
+            return response
 
-        report = classification_report(y, predictions, output_dict=True)
-        conf_matrix = confusion_matrix(y, predictions)
+        stale = is_performance_report_stale(report)
+        if stale or request.args.get('recompute', '').lower() in ('1', 'true', 'yes'):
+            refresh_performance_report_async()
 
-        # Feature importance
-        if hasattr(model, 'feature_importances_'):
-            feature_imp = list(zip(feature_columns, model.feature_importances_))
-            feature_imp.sort(key=lambda x: x[1], reverse=True)
-        else:
-            feature_imp = []
+        metrics = report.get('full_data') or report.get('held_out')
 
-        # Calculate accuracy
-        accuracy = (predictions == y).sum() / len(y) * 100
-        
         return jsonify({
-            'classification_report': report,
-            'confusion_matrix': conf_matrix.tolist(),
-            'feature_importance': feature_imp[:10],
-            'model_accuracy': accuracy
+            'classification_report': metrics['classification_report'],
+            'confusion_matrix': metrics['confusion_matrix'],
+            'feature_importance': report['feature_importance'][:10],
+            'model_accuracy': metrics['accuracy'],
+            'per_class': metrics['per_class'],
+            'held_out': report.get('held_out'),
+            'full_data': report.get('full_data'),
+            'generated_at': report.get('generated_at'),
+            'model_version': report.get('model_version'),
+            'data_version': report.get('data_version'),
+            'distillation': report.get('distillation'),
+            'stale': stale,
+            'refreshing': performance_refresh_thread is not None and performance_refresh_thread.is_alive()
         })
 
+    except admission.DeadlineExceeded:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def preprocess_data(df):
-    df = df.copy()
-    # Example: fill missing values
-    df.fillna(0, inplace=True)
-    # Ensure all required columns exist
-    for col in feature_columns:
-        if col not in df.columns:
-            df[col] = 0
-    # Select only the feature columns
-    df_selected = df[feature_columns]
-    # Scale
-    df_scaled = scaler.transform(df_selected)
-    return df_scaled
+def get_performance_report():
+    """Return the saved performance report, reloading it when the file changes"""
+    global performance_report, performance_report_mtime
+
+    path = model_report.REPORT_PATH
+    if not os.path.exists(path):
+        return performance_report
+    mtime = os.path.getmtime(path)
+    hit = performance_report is not None and mtime == performance_report_mtime
+    if not hit:
+        with performance_lock:
+            performance_report = model_report.load_report(path)
+            performance_report_mtime = mtime
+    metrics.record_cache('performance_report', hit)
+    return performance_report
+
+def is_performance_report_stale(report):
+    """True when the report was computed for other data or another model"""
+    return (report.get('data_version') != model_report.file_version(app.config['STUDENT_DATA_PATH'])
+            or report.get('model_version') != model_registry.version)
+
+def compute_performance_report():
+    """Recompute full-data metrics for the current model and data, then save
+
+    Held-out metrics come from the training split, so they are kept only when
+    the report still belongs to the same model.
+    """
+    global performance_report, performance_report_mtime
+
+    # Runs in a background thread too: stick to one bundle throughout
+    bundle = current_bundle()
+    model = bundle.model
+    model_version = bundle.version
+    data_version = model_report.file_version(app.config['STUDENT_DATA_PATH'])
+    # The full-precision file, as at training time, not the compacted serving frame
+    df = pd.read_csv(app.config['STUDENT_DATA_PATH'])
+
+    label_encoders = bundle.label_encoders
+    class_names = list(label_encoders['risk_level'].classes_) if 'risk_level' in label_encoders else None
+
+    # Use risk_level_encoded for numeric target, convert risk_level to numeric if needed
+    if 'risk_level_encoded' in df.columns:
+        y = df['risk_level_encoded'].to_numpy()
+    else:
+        y = label_encoders['risk_level'].transform(df['risk_level'].astype(str))
+
+    previous = get_performance_report()
+    held_out = distillation = None
+    if previous and previous.get('model_version') == model_version:
+        held_out = previous.get('held_out')
+        distillation = previous.get('distillation')
+
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'model_type': type(model).__name__,
+        'model_version': model_version,
+        'data_version': data_version,
+        'class_names': model_report.to_json_safe(class_names),
+        'held_out': held_out,
+        'full_data': model_report.evaluate(model, bundle.feature_pipeline.feature_matrix(df), y,
+                                           class_names=class_names),
+        'feature_importance': model_report.feature_importance(model, bundle.feature_columns)
+    }
+    if distillation:
+        report['distillation'] = distillation
+    model_report.save_report(report)
+
+    with performance_lock:
+        performance_report = report
+        performance_report_mtime = os.path.getmtime(model_report.REPORT_PATH)
+    return report
+
+def refresh_performance_report_async():
+    """Start a background recompute unless one is already running"""
+    global performance_refresh_thread
+
+    with performance_lock:
+        if performance_refresh_thread is not None and performance_refresh_thread.is_alive():
+            return
 
+        def run():
+            global performance_refresh_error
+            try:
+                compute_performance_report()
+                performance_refresh_error = None
+                print("✅ Performance report refreshed")
+            except Exception as e:
+                performance_refresh_error = str(e)
+                print(f"⚠️  Performance report refresh failed: {e}")
+
+        performance_refresh_thread = threading.Thread(target=run, name='performance-report', daemon=True)
+        performance_refresh_thread.start()
+
+def current_bundle():
+    """The model bundle this request started with (the latest one outside requests)
+
+    Requests keep their bundle to the end, so a hot reload never mixes one
+    version's model with another's feature pipeline.
+    """
+    if has_request_context():
+        if 'model_bundle' not in g:
+            g.model_bundle = model_registry.current
+        return g.model_bundle
+    return model_registry.current
+
+@app.before_request
+def pin_model_bundle():
+    if request.endpoint != 'liveness':
+        ensure_model_loaded()
+    g.model_bundle = model_registry.current
+
+def get_interactive_model():
+    """Model for latency-sensitive single-student calls
+
+    The distilled fast model when one was trained (and INTERACTIVE_MODEL is
+    'fast'); batch scoring, reports and SHAP always use the full model.
+    """
+    return current_bundle().interactive_model(app.config['INTERACTIVE_MODEL'] == 'fast')
+
+@metrics.timed('predict')
+def predict_interactive(processed_data):
+    """(predictions, probabilities) from the interactive model in one model call"""
+    probability = predict_cached(get_interactive_model(), processed_data)
+    return probability.argmax(axis=1), probability
+
+def predict_cached(model, processed_data, store=True):
+    """model.predict_proba through the shared prediction cache; model is one of the current bundle's"""
+    bundle = current_bundle()
+    model_name = 'fast' if model is bundle.fast_model else 'full'
+    return result_cache.predict_proba(model, processed_data, bundle.version, model_name, store=store)
+
+def submit_shadow(records, probabilities, seconds, interactive=True):
+    """Hand an answered prediction to the shadow scorer, if one is running"""
+    if shadow_scorer is not None:
+        shadow_scorer.submit(records, probabilities, seconds, current_bundle(), interactive,
+                             route=metrics.current_route())
+
+def get_student_store():
+    """Return the configured student store, creating it on first use"""
+    global student_store
+
+    if student_store is None:
+        student_store = create_student_store(
+            app.config['STUDENT_BACKEND'],
+            csv_path=app.config['STUDENT_DATA_PATH'],
+            db_path=app.config['STUDENT_DB_PATH']
+        )
+    return student_store
+
+@metrics.timed('preprocess')
+def preprocess_data(data):
+    """Turn raw or processed student records into the scaled model input
+
+    data may be a DataFrame, a single record dict or a list of dicts. Imputation,
+    categorical encoding and feature engineering use the pipeline fitted at
+    training time, so serving matches training exactly.
+    """
+    return current_bundle().feature_pipeline.feature_matrix(data)
+
+
+def get_score_state():
+    """(scores indexed by student_id, manifest) from rescoring.py, or (None, None)
+
+    Reloaded whenever a rescoring run rewrites the state; ignored when it
+    was built for a different model than the one being served.
+    """
+    global score_state, score_state_mtime
+
+    manifest_path = os.path.join(app.config['SCORE_STATE_DIR'], rescoring.MANIFEST_NAME)
+    try:
+        mtime = os.path.getmtime(manifest_path)
+    except OSError:
+        return None, None
+
+    metrics.record_cache('score_state', mtime == score_state_mtime)
+    if mtime != score_state_mtime:
+        scores, manifest = rescoring.load_score_state(app.config['SCORE_STATE_DIR'])
+        if scores is not None:
+            scores = scores.set_index('student_id', drop=False)
+        score_state = (scores, manifest)
+        score_state_mtime = mtime
+
+    scores, manifest = score_state
+    if manifest is None or manifest['version'].get('model') != model_registry.version:
+        return None, None
+    return scores, manifest
 
 def get_feature_importance(student_data):
-    """Calculate feature importance for a student"""
-    # This will be implemented with SHAP or model feature importance
-    return {}
+    """Top feature contributions for a student, from the rescoring explanation cache"""
+    scores, _ = get_score_state()
+    return rescoring.cached_explanation(scores, student_data.get('student_id'))
 
 def allowed_file(filename):
     """Check if file type is allowed"""
@@ -502,38 +806,40 @@ def process_batch_predictions(filepath):
     """Process batch predictions from uploaded file"""
     try:
         # Read uploaded file
-        if filepath.endswith('.csv'):
-            df = pd.read_csv(filepath)
-        else:
-            df = pd.read_excel(filepath)
-
-        # Preprocess data (using global feature_columns)
-        # First ensure data has all required columns
-        for col in feature_columns:
-            if col not in df.columns:
-                df[col] = 0
-        
-        # Select only the feature columns
-        processed_data = df[feature_columns]
-        
-        # Scale and make predictions
-        scaled_data = scaler.transform(processed_data)
-        predictions = model.predict(scaled_data)
-        probabilities = model.predict_proba(scaled_data)
+        with metrics.stage('load'):
+            if filepath.endswith('.csv'):
+                df = pd.read_csv(filepath)
+            else:
+                df = pd.read_excel(filepath)
+
+        # Preprocess data with the fitted feature pipeline and make predictions
+        admission.check_deadline()
+        started = time.perf_counter()
+        scaled_data = preprocess_data(df)
+        with metrics.stage('predict'):
+            # Reads the prediction cache without filling it: one large upload
+            # would otherwise evict every interactive entry
+            probabilities = predict_cached(current_bundle().model, scaled_data, store=False)
+            predictions = probabilities.argmax(axis=1)
+        submit_shadow(df, probabilities, time.perf_counter() - started, interactive=False)
 
         # Format results
+        ids = df['student_id'].tolist() if 'student_id' in df.columns else None
+        names = df['name'].tolist() if 'name' in df.columns else None
         results = []
         for i, (pred, prob) in enumerate(zip(predictions, probabilities)):
             results.append({
-                'student_id': df.iloc[i].get('student_id', f'STUD_{i+1}'),
-                'name': df.iloc[i].get('name', f'Student {i+1}'),
-                'risk_level': pred,
-                'engagement_score': max(prob) * 100,
-                'confidence': max(prob) * 100
+                'student_id': ids[i] if ids is not None else f'STUD_{i+1}',
+                'name': names[i] if names is not None else f'Student {i+1}',
+                'risk_level': int(pred),
+                'engagement_score': float(max(prob)) * 100,
+                'confidence': float(max(prob)) * 100
             })
 
         return results
 
+    except admission.DeadlineExceeded:
+        raise
     except Exception as e:
         raise Exception(f"Batch processing failed: {str(e)}")
 
@@ -630,34 +936,160 @@ def send_email_alert(student_data, alert_type):
         print(f"Email sending failed: {e}")
         return False
 
-def load_model():
-    """Load the trained model and create SHAP explainer"""
-    global model, feature_columns, scaler, explainer
+def warm_bundle(bundle):
+    """One inference and one explanation with a new bundle before it serves traffic"""
+    students, _ = get_student_store().query_students(limit=1)
+    if not students:
+        return
+    processed = bundle.feature_pipeline.feature_matrix(students[0])
+    bundle.interactive_model(app.config['INTERACTIVE_MODEL'] == 'fast').predict_proba(processed)
+    bundle.model.predict_proba(processed)
+    if bundle.explainer is not None:
+        bundle.explainer.shap_values(processed)
 
+def load_model():
+    """Load the model bundle and start watching for new versions"""
     try:
-        model = joblib.load('models/student_engagement_model.pkl')
-        feature_columns = joblib.load('models/feature_columns.pkl')
-        scaler = joblib.load('models/scaler.pkl')
+        model_registry.load()
+    except Exception as e:
+        print(f"⚠️  Warning: Could not load model: {e}")
+        return
+
+    model_registry.warm = warm_bundle
+    interval = app.config['MODEL_WATCH_INTERVAL']
+    if interval > 0 and not model_registry.watching:
+        model_registry.start_watcher(interval)
+        # Threads don't survive fork; pre-forked workers each watch on their own
+        os.register_at_fork(after_in_child=model_registry.after_fork)
+
+    start_shadow_scorer()
+
+def ensure_model_loaded():
+    """Load the model on first use when no entry point loaded it up front"""
+    global model_load_attempted
+
+    if model_registry.current is not None or model_load_attempted:
+        return
+    with model_load_lock:
+        if model_registry.current is None and not model_load_attempted:
+            model_load_attempted = True
+            print("⚠️  Model not preloaded (serve.py does that); loading it in this worker now")
+            load_model()
+
+def warm_up():
+    """Run one request's worth of work in this process; marks it ready on success"""
+    start = time.perf_counter()
+    serving_state['ready'] = False
+    try:
+        ensure_model_loaded()
+        bundle = model_registry.current
+        if bundle is None:
+            raise RuntimeError("no model loaded")
+
+        store = get_student_store()
+        store.risk_counts()
+        students, _ = store.query_students(limit=1)
+        if not students:
+            raise RuntimeError("the student store is empty")
+        student = store.get_student(students[0]['student_id'])
+
+        processed = bundle.feature_pipeline.feature_matrix(student)
+        predict_interactive(processed)
+        bundle.model.predict_proba(processed)
+        if bundle.explainer is not None:
+            bundle.explainer.shap_values(processed)
+    except Exception as e:
+        serving_state['error'] = str(e)
+        print(f"⚠️  Worker {os.getpid()} warm-up failed: {e}")
+        return False
 
-        # Try to load SHAP explainer if available
-        try:
-            explainer = joblib.load('models/shap_explainer.pkl')
-            print("✅ SHAP explainer loaded successfully")
-        except Exception as e:
-            print(f"⚠️  SHAP explainer loading failed: {e}")
-            # Create new SHAP explainer if not saved
-            try:
-                sample_data = pd.read_csv('data/processed_data.csv')
-                sample_X = sample_data[feature_columns]
-                sample_X_scaled = scaler.transform(sample_X)
-                explainer = shap.TreeExplainer(model)
-                print("✅ New SHAP explainer created")
-            except Exception as e:
-                print(f"⚠️  Could not create SHAP explainer: {e}")
-                explainer = None
+    serving_state.update(ready=True, error=None, warmup_seconds=time.perf_counter() - start)
+    print(f"🔥 Worker {os.getpid()} warmed up in {serving_state['warmup_seconds']:.2f}s")
+    return True
+
+def start_shadow_scorer():
+    """Start comparing SHADOW_MODEL_DIR's bundle against served predictions, when set"""
+    global shadow_scorer
 
+    if not app.config['SHADOW_MODEL_DIR'] or shadow_scorer is not None:
+        return
+    shadow_scorer = shadow.ShadowScorer(app.config['SHADOW_MODEL_DIR'], app.config['SHADOW_QUEUE_SIZE'],
+                                        app.config['SHADOW_SAMPLE_RATE'])
+    try:
+        shadow_scorer.load_candidate()
     except Exception as e:
-        print(f"⚠️  Warning: Could not load model: {e}")
+        print(f"⚠️  Shadow candidate not loaded yet: {e}")
+    shadow_scorer.start()
+    os.register_at_fork(after_in_child=shadow_scorer.after_fork)
+
+def admin_authorized():
+    token = app.config['ADMIN_TOKEN']
+    supplied = request.headers.get('X-Admin-Token', '')
+    return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+@app.route('/healthz')
+def liveness():
+    """Liveness: 200 while the process is up"""
+    return jsonify({'status': 'alive', 'pid': os.getpid()})
+
+@app.route('/readyz')
+def readiness():
+    """Readiness: 200 once this process has a model and finished warm-up
+
+    Under a server that didn't warm up (e.g. `gunicorn app:app`) the first
+    probe does it, so the probe keeps failing until the model can serve.
+    """
+    if not serving_state['ready'] and not serving_state['draining']:
+        warm_up()
+    ready = serving_state['ready'] and not serving_state['draining']
+    body = {
+        'status': 'ready' if ready else 'not ready',
+        'pid': os.getpid(),
+        'warmup_seconds': serving_state['warmup_seconds'],
+        'model_version': model_registry.version,
+    }
+    if serving_state['draining']:
+        body['reason'] = 'shutting down'
+    elif serving_state['error']:
+        body['reason'] = serving_state['error']
+    elif not ready:
+        body['reason'] = 'warming up'
+    return jsonify(body), 200 if ready else 503
+
+@app.route('/admin/model')
+def model_status():
+    """Served, previous, on-disk and archived model versions"""
+    if not admin_authorized():
+        abort(403)
+    return jsonify(model_registry.status())
+
+@app.route('/admin/shadow')
+def shadow_status():
+    """Agreement, probability drift and latency of the shadow candidate so far"""
+    if not admin_authorized():
+        abort(403)
+    if shadow_scorer is None:
+        return jsonify({'enabled': False})
+    return jsonify(shadow_scorer.summary())
+
+@app.route('/admin/prediction_cache')
+def prediction_cache_status():
+    """Size, hit rate and invalidations of this worker's prediction cache"""
+    if not admin_authorized():
+        abort(403)
+    return jsonify(result_cache.stats())
+
+@app.route('/admin/model/rollback', methods=['POST'])
+def model_rollback():
+    """Serve an archived model version again (default: the previous one)"""
+    if not admin_authorized():
+        abort(403)
+    version = (request.get_json(silent=True) or {}).get('version')
+    try:
+        bundle = model_registry.rollback(version)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'message': f'Now serving model {bundle.version}', 'current': bundle.describe()})
 
 if __name__ == '__main__':
     # Create necessary directories
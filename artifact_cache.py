@@ -0,0 +1,181 @@
+"""
+Content-addressed cache of trained model bundles.
+
+train_model.py hashes its input data, the feature configuration, the
+training parameters and the training code into a cache key. After a run the
+saved bundle (models/*.pkl, the performance report and processed_data.csv) is
+copied to models/cache/<key>/. A later run with the same key restores that
+bundle instead of retraining. Old entries are pruned by age and count.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from dataset_cache import file_sha256
+from features import PIPELINE_PATH
+from model_report import REPORT_PATH, file_version
+
+DEFAULT_CACHE_DIR = 'models/cache'
+MANIFEST_NAME = 'manifest.json'
+
+# Files that make up a trained bundle; optional ones may be missing
+BUNDLE_FILES = [
+    'models/student_engagement_model.pkl',
+    'models/student_engagement_model_fast.pkl',
+    'models/scaler.pkl',
+    'models/feature_columns.pkl',
+    'models/label_encoders.pkl',
+    PIPELINE_PATH,
+    'models/training_history.pkl',
+    REPORT_PATH,
+    'models/shap_explainer.pkl',
+    'data/processed_data.csv',
+]
+
+DEFAULT_MAX_ENTRIES = 5
+DEFAULT_MAX_AGE_DAYS = 30
+
+
+def cache_key(data_paths, config):
+    """SHA-256 over the data files' contents and a JSON-serializable config"""
+    payload = {
+        'data': [file_sha256(path) for path in data_paths],
+        'config': config,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _entry_dir(key, cache_dir):
+    return os.path.join(cache_dir, key[:16])
+
+
+def _load_manifest(entry_dir):
+    try:
+        with open(os.path.join(entry_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(entry_dir, manifest):
+    tmp_path = os.path.join(entry_dir, f'.{MANIFEST_NAME}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+    os.replace(tmp_path, os.path.join(entry_dir, MANIFEST_NAME))
+
+
+def _copy(src, dst):
+    """Copy src to dst atomically
+
+    Never hard-link: save_model() rewrites bundle files in place, which would
+    corrupt a linked cache entry.
+    """
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    tmp_path = f'{dst}.{os.getpid()}.tmp'
+    shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def lookup(key, cache_dir=DEFAULT_CACHE_DIR):
+    """Manifest of the cached bundle for key, or None"""
+    manifest = _load_manifest(_entry_dir(key, cache_dir))
+    if manifest is None or manifest.get('key') != key:
+        return None
+    return manifest
+
+
+def cached_model_version(key, cache_dir=DEFAULT_CACHE_DIR):
+    """Version (content hash) of the model in the cached bundle for key, or None"""
+    manifest = lookup(key, cache_dir)
+    if manifest is None or BUNDLE_FILES[0] not in manifest['files']:
+        return None
+    return file_version(os.path.join(_entry_dir(key, cache_dir), manifest['files'][BUNDLE_FILES[0]]))
+
+
+def restore_bundle(key, cache_dir=DEFAULT_CACHE_DIR):
+    """Copy a cached bundle back into place; returns its manifest or None on a miss
+
+    Bundle files the entry doesn't have (e.g. a SHAP explainer from a fast
+    run) are removed so nothing from another model is left behind.
+    """
+    manifest = lookup(key, cache_dir)
+    if manifest is None:
+        return None
+
+    entry_dir = _entry_dir(key, cache_dir)
+    for path in BUNDLE_FILES:
+        if path in manifest['files']:
+            _copy(os.path.join(entry_dir, manifest['files'][path]), path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    manifest['last_used'] = time.time()
+    _write_manifest(entry_dir, manifest)
+    return manifest
+
+
+def store_bundle(key, config=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Copy the bundle that was just saved into the cache under key"""
+    entry_dir = _entry_dir(key, cache_dir)
+    if lookup(key, cache_dir) is not None:
+        return entry_dir
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = os.path.join(cache_dir, f'.{key[:16]}.{os.getpid()}.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    files = {}
+    for path in BUNDLE_FILES:
+        if os.path.exists(path):
+            name = path.replace('/', '__')
+            _copy(path, os.path.join(tmp_dir, name))
+            files[path] = name
+
+    now = time.time()
+    _write_manifest(tmp_dir, {
+        'key': key,
+        'created_at': now,
+        'last_used': now,
+        'config': config,
+        'files': files,
+    })
+
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    os.replace(tmp_dir, entry_dir)
+    return entry_dir
+
+
+def prune_cache(cache_dir=DEFAULT_CACHE_DIR, max_entries=DEFAULT_MAX_ENTRIES,
+                max_age_days=DEFAULT_MAX_AGE_DAYS, keep=None):
+    """Drop entries unused for max_age_days and all but the max_entries most recent
+
+    keep is a key that is never pruned (the bundle currently in use).
+    Returns the removed entry directories.
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry_dir = os.path.join(cache_dir, name)
+        if not os.path.isdir(entry_dir) or name.startswith('.'):
+            continue
+        manifest = _load_manifest(entry_dir)
+        entries.append((manifest.get('last_used', 0) if manifest else 0, entry_dir,
+                        manifest.get('key') if manifest else None))
+    entries.sort(key=lambda entry: entry[0], reverse=True)
+
+    cutoff = time.time() - max_age_days * 86400
+    removed = []
+    for rank, (last_used, entry_dir, key) in enumerate(entries):
+        if key is not None and key == keep:
+            continue
+        if rank >= max_entries or last_used < cutoff:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            removed.append(entry_dir)
+    return removed
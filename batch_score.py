@@ -0,0 +1,305 @@
+"""
+Offline bulk scoring for the Student Engagement Prediction System.
+
+Rescores the whole student base (the student store, or any large CSV,
+Parquet or Excel input) outside the Flask process. The model bundle is
+loaded once in the parent and shared copy-on-write with forked worker
+processes. Each worker scores one chunk at a time and writes it as its own
+Parquet part file, so an interrupted run resumes from the chunks it hasn't
+finished yet.
+
+Usage:
+    python batch_score.py                                   # data/processed_data.csv
+    python batch_score.py --backend sqlite --top-k 3        # SQLite store, with top contributions
+    python batch_score.py --input big.parquet --output data/scores/big --jobs 8
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import model_report
+from chunked_training import DEFAULT_CHUNK_ROWS, expand_sources, iter_chunks
+from dataset_cache import PARQUET_AVAILABLE
+from features import FeaturePipeline, PIPELINE_PATH
+from student_store import DEFAULT_CSV_PATH, DEFAULT_DB_PATH, create_student_store
+
+DEFAULT_OUTPUT_DIR = 'data/scores'
+MANIFEST_NAME = 'manifest.json'
+PART_EXTENSION = '.parquet' if PARQUET_AVAILABLE else '.csv'
+
+# Model bundle for the current process; forked workers inherit the parent's
+_scoring_state = {}
+
+
+def load_scoring_state(model_dir='models', fast=False):
+    """Load the model, fitted feature pipeline and class names used for scoring"""
+    model_path = os.path.join(model_dir, 'student_engagement_model_fast.pkl' if fast
+                              else 'student_engagement_model.pkl')
+    model = joblib.load(model_path)
+    label_encoders = joblib.load(os.path.join(model_dir, 'label_encoders.pkl'))
+
+    pipeline_path = os.path.join(model_dir, os.path.basename(PIPELINE_PATH))
+    if os.path.exists(pipeline_path):
+        pipeline = joblib.load(pipeline_path)
+    else:
+        # Bundles saved before the feature pipeline existed
+        pipeline = FeaturePipeline.from_artifacts(
+            pd.read_csv(DEFAULT_CSV_PATH), label_encoders,
+            joblib.load(os.path.join(model_dir, 'feature_columns.pkl')),
+            joblib.load(os.path.join(model_dir, 'scaler.pkl'))
+        )
+
+    if 'risk_level' in label_encoders:
+        class_names = [str(name) for name in label_encoders['risk_level'].classes_]
+    else:
+        class_names = [str(label) for label in getattr(model, 'classes_', [0, 1])]
+
+    return {'model': model, 'pipeline': pipeline, 'class_names': class_names, 'model_path': model_path}
+
+
+def _init_scoring_worker(state, threads):
+    """Share the parent's bundle (no copy when forked) and cap model threads"""
+    _scoring_state.update(state)
+    if hasattr(_scoring_state['model'], 'n_jobs'):
+        _scoring_state['model'].set_params(n_jobs=threads)
+
+
+def top_contributions(model, X, feature_columns, k, predictions=None, approx=False):
+    """Top-k features per row by absolute TreeSHAP contribution
+
+    Uses XGBoost's native pred_contribs, which is much faster than the shap
+    package. approx uses Saabas attributions instead, about 100x faster on
+    the full model but not exact SHAP values. Binary models explain the
+    class 1 margin; multi-class models explain each row's predicted class.
+    """
+    import xgboost as xgb
+
+    if not isinstance(model, xgb.XGBModel):
+        raise ValueError("Top contributions need an XGBoost model")
+
+    contribs = model.get_booster().predict(xgb.DMatrix(X), pred_contribs=True,
+                                           approx_contribs=approx)
+    if contribs.ndim == 3:
+        contribs = contribs[np.arange(len(X)), predictions]
+    contribs = contribs[:, :-1]  # drop the bias column
+
+    k = min(k, contribs.shape[1])
+    top = np.argsort(-np.abs(contribs), axis=1)[:, :k]
+    names = np.asarray(feature_columns, dtype=object)
+
+    columns = {}
+    for rank in range(k):
+        columns[f'top{rank + 1}_feature'] = pd.Categorical(names[top[:, rank]], categories=list(feature_columns))
+        columns[f'top{rank + 1}_contribution'] = contribs[np.arange(len(X)), top[:, rank]].astype(np.float32)
+    return pd.DataFrame(columns)
+
+
+def score_frame(df, top_k=0, approx=False, state=None):
+    """Predictions, class probabilities and optional top contributions for a chunk
+
+    state is a load_scoring_state() bundle; defaults to this process's.
+    """
+    state = state or _scoring_state
+    model = state['model']
+    pipeline = state['pipeline']
+    class_names = state['class_names']
+
+    X = pipeline.feature_matrix(df)
+    probabilities = model.predict_proba(X)
+    predictions = probabilities.argmax(axis=1)
+
+    scores = pd.DataFrame(index=pd.RangeIndex(len(df)))
+    if 'student_id' in df.columns:
+        scores['student_id'] = df['student_id'].to_numpy()
+    scores['prediction'] = predictions.astype(np.int8)
+    scores['risk_level'] = pd.Categorical.from_codes(predictions, categories=class_names)
+    for i, name in enumerate(class_names):
+        scores[f'probability_{name}'] = probabilities[:, i].astype(np.float32)
+
+    if top_k:
+        scores = scores.join(top_contributions(model, X, pipeline.feature_columns, top_k,
+                                               predictions, approx))
+    return scores
+
+
+def _part_path(output_dir, index):
+    return os.path.join(output_dir, f'part-{index:05d}{PART_EXTENSION}')
+
+
+def score_chunk(index, df, output_dir, top_k=0, approx=False):
+    """Score one chunk and write its part file atomically; returns (index, rows, seconds)"""
+    start = time.perf_counter()
+    scores = score_frame(df, top_k, approx)
+
+    path = _part_path(output_dir, index)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if PARQUET_AVAILABLE:
+        scores.to_parquet(tmp_path, index=False)
+    else:
+        scores.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return index, len(df), time.perf_counter() - start
+
+
+def _load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(model_report.to_json_safe(manifest), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def bulk_score(input_path=None, backend=None, output_dir=DEFAULT_OUTPUT_DIR, chunk_rows=DEFAULT_CHUNK_ROWS,
+               n_jobs=None, top_k=0, fast=False, model_dir='models', overwrite=False,
+               db_path=DEFAULT_DB_PATH, approx_contribs=False):
+    """Score every row of the input in parallel and write Parquet parts to output_dir
+
+    The input is input_path (a file or directory of CSV/Parquet/Excel) or,
+    with backend, the student store. A previous run into the same
+    output_dir with the same input, model, chunk size and top_k is resumed:
+    chunks that already have a part file are skipped. overwrite discards
+    earlier results instead. Returns a summary dict.
+    """
+    state = load_scoring_state(model_dir, fast)
+
+    if backend:
+        store = create_student_store(backend, DEFAULT_CSV_PATH, db_path)
+        source = f'{backend} student store'
+        input_versions = [model_report.file_version(db_path if backend == 'sqlite' else DEFAULT_CSV_PATH)]
+        chunks = store.iter_frames(chunk_rows)
+    else:
+        paths = expand_sources(input_path or DEFAULT_CSV_PATH)
+        source = ', '.join(paths)
+        input_versions = [model_report.file_version(path) for path in paths]
+        chunks = iter_chunks(paths, chunk_rows)
+
+    fingerprint = {
+        'source': source,
+        'input_versions': input_versions,
+        'model_version': model_report.file_version(state['model_path']),
+        'chunk_rows': chunk_rows,
+        'top_k': top_k,
+        'approx_contribs': bool(top_k and approx_contribs),
+    }
+
+    manifest = _load_manifest(output_dir)
+    if manifest is not None and manifest.get('fingerprint') != fingerprint:
+        if not overwrite:
+            raise ValueError(f"{output_dir} holds scores for another input or model; "
+                             f"pass --overwrite to replace them")
+    if overwrite or (manifest is not None and manifest.get('fingerprint') != fingerprint):
+        shutil.rmtree(output_dir, ignore_errors=True)
+        manifest = None
+    os.makedirs(output_dir, exist_ok=True)
+
+    if manifest is None:
+        manifest = {'fingerprint': fingerprint, 'runs': []}
+        _write_manifest(output_dir, manifest)
+
+    workers = max(1, n_jobs or os.cpu_count() or 1)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"📤 Scoring {source} with {os.path.basename(state['model_path'])} "
+          f"({workers} worker(s), {chunk_rows} rows per chunk)")
+
+    start = time.perf_counter()
+    scored_rows = skipped_rows = chunks_total = 0
+
+    def report_progress():
+        elapsed = time.perf_counter() - start
+        print(f"   {scored_rows} rows scored ({scored_rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    if workers == 1:
+        _init_scoring_worker(state, threads)
+        for index, chunk in enumerate(chunks):
+            chunks_total += 1
+            if os.path.exists(_part_path(output_dir, index)):
+                skipped_rows += len(chunk)
+                continue
+            scored_rows += score_chunk(index, chunk, output_dir, top_k, approx_contribs)[1]
+            if chunks_total % 10 == 0:
+                report_progress()
+    else:
+        # Fork shares the loaded bundle copy-on-write; spawn pickles it once per worker
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork') if 'fork' in methods else None
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_scoring_worker, initargs=(state, threads)) as pool:
+            pending = set()
+            for index, chunk in enumerate(chunks):
+                chunks_total += 1
+                if os.path.exists(_part_path(output_dir, index)):
+                    skipped_rows += len(chunk)
+                    continue
+                # Bound the chunks in flight so memory stays proportional to chunk_rows
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        scored_rows += future.result()[1]
+                    report_progress()
+                pending.add(pool.submit(score_chunk, index, chunk, output_dir, top_k, approx_contribs))
+            for future in pending:
+                scored_rows += future.result()[1]
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'chunks': chunks_total,
+        'rows_scored': scored_rows,
+        'rows_resumed': skipped_rows,
+        'seconds': elapsed,
+        'rows_per_second': scored_rows / max(elapsed, 1e-9),
+        'workers': workers,
+    }
+    manifest['runs'].append(summary)
+    manifest['complete'] = True
+    _write_manifest(output_dir, manifest)
+
+    if skipped_rows:
+        print(f"⏭️  Resumed: {skipped_rows} rows already scored by an earlier run")
+    print(f"✅ Scored {scored_rows} rows in {elapsed:.1f}s ({summary['rows_per_second']:,.0f} rows/s) → {output_dir}")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score every student offline, in parallel')
+    parser.add_argument('--input', help='CSV/Parquet/Excel file or directory (default: data/processed_data.csv)')
+    parser.add_argument('--backend', choices=['pandas', 'sqlite'], help='Read from the student store instead')
+    parser.add_argument('--db-path', default=DEFAULT_DB_PATH, help='SQLite store path with --backend sqlite')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_DIR, help='Directory for the Parquet part files')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes (default: all CPUs)')
+    parser.add_argument('--top-k', type=int, default=0, help='Also write the top K feature contributions per row')
+    parser.add_argument('--approx-contribs', action='store_true',
+                        help='Rank --top-k features by fast approximate attributions instead of exact SHAP')
+    parser.add_argument('--fast', action='store_true', help='Use the distilled fast model')
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--overwrite', action='store_true', help='Discard earlier results instead of resuming')
+    args = parser.parse_args(argv)
+
+    if args.input and args.backend:
+        parser.error('--input and --backend are mutually exclusive')
+
+    bulk_score(args.input, args.backend, args.output, args.chunk_rows, args.jobs, args.top_k,
+               args.fast, args.model_dir, args.overwrite, args.db_path,
+               args.approx_contribs)
+
+
+if __name__ == '__main__':
+    main()
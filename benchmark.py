@@ -0,0 +1,332 @@
+"""
+Endpoint benchmark suite for the Student Engagement Prediction API.
+
+Drives every app.py route in-process through the Flask test client at a
+ladder of student-table sizes (20k, 100k and 1M by default). Each size runs
+in its own process with a scratch working directory holding a copy of the
+trained bundle, so peak memory is per size and nothing in models/ or data/
+is modified. Tables are drawn by synthetic_data.py's generator fitted to
+Dataset.xlsx, run through the bundle's feature pipeline and cached in
+benchmarks/data/.
+
+Latency percentiles, throughput and memory go to a JSON results file and
+are compared against a stored baseline; any metric worse than its threshold
+is reported as a regression and the exit status is 1.
+
+Usage:
+    python benchmark.py                                  # full ladder
+    python benchmark.py --sizes 20000 --iterations 20    # quick run
+    python benchmark.py --save-baseline                  # record a new baseline
+    python benchmark.py --baseline benchmarks/baseline.json --p99-threshold 0.5
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import synthetic_data
+from batch_score import load_scoring_state
+from chunked_training import iter_chunks
+from features import PIPELINE_PATH
+from rescoring import processed_rows
+
+DEFAULT_SIZES = [20000, 100000, 1000000]
+DEFAULT_ITERATIONS = 30
+WARMUP_ITERATIONS = 2
+BENCHMARK_DIR = 'benchmarks'
+DATA_DIR = os.path.join(BENCHMARK_DIR, 'data')
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+SOURCE_DATASET = synthetic_data.DEFAULT_SOURCE
+UPLOAD_ROWS = 200
+
+# Allowed relative worsening before a metric counts as a regression
+DEFAULT_THRESHOLDS = {
+    'p50_ms': 0.20,
+    'p99_ms': 0.50,
+    'throughput_rps': 0.20,
+    'rss_delta_mb': 0.50,
+    'peak_rss_mb': 0.20,
+}
+THRESHOLD_FLAGS = {
+    'p50_ms': '--p50-threshold',
+    'p99_ms': '--p99-threshold',
+    'throughput_rps': '--throughput-threshold',
+    'rss_delta_mb': '--rss-delta-threshold',
+    'peak_rss_mb': '--peak-rss-threshold',
+}
+# Metrics where larger is better
+HIGHER_IS_BETTER = {'throughput_rps'}
+# Ignore differences below these absolute amounts (timer and allocator noise);
+# throughput's slack is in milliseconds per request
+ABSOLUTE_SLACK = {'p50_ms': 1.0, 'p99_ms': 2.0, 'throughput_rps': 1.0, 'rss_delta_mb': 5.0, 'peak_rss_mb': 20.0}
+
+
+def scaled_dataset(n_rows, source=SOURCE_DATASET, model_dir='models', data_dir=DATA_DIR, seed=42,
+                   chunk_rows=100000):
+    """Processed student CSV with n_rows synthetic students, cached in data_dir
+
+    The raw rows come from a generator fitted to source (write_dataset()),
+    then go through the processed pipeline chunk by chunk with the bundle in
+    model_dir: encoding, engineered features and risk labels, as in the
+    student store. Rebuilt when the source or the bundle is newer.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'students_{n_rows}.csv')
+    state = load_scoring_state(model_dir)
+    inputs = [source, state['model_path'], os.path.join(model_dir, os.path.basename(PIPELINE_PATH))]
+    newest = max(os.path.getmtime(input_path) for input_path in inputs if os.path.exists(input_path))
+    if os.path.exists(path) and os.path.getmtime(path) >= newest:
+        return path
+
+    raw_path = os.path.join(data_dir, f'raw_students_{n_rows}.csv')
+    synthetic_data.write_dataset(synthetic_data.fit_generator(source), n_rows, raw_path, chunk_rows, seed)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        for index, chunk in enumerate(iter_chunks(raw_path, chunk_rows)):
+            predictions = state['model'].predict_proba(state['pipeline'].feature_matrix(chunk)).argmax(axis=1)
+            rows = processed_rows(state, chunk, predictions)
+            rows.to_csv(tmp_path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+        os.replace(tmp_path, path)
+    finally:
+        os.remove(raw_path)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def _rss_mb():
+    """Current resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError):
+        # No procfs (macOS): fall back to the peak
+        return _peak_rss_mb()
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def endpoint_cases(students, upload_csv):
+    """(name, request callable factory) for every benchmarked route
+
+    Each factory takes the test client and an iteration index and issues one
+    request, cycling through a fixed sample of students.
+    """
+    ids = [int(student_id) for student_id in students['student_id']]
+    department = str(students['department'].iloc[0]) if 'department' in students.columns else ''
+
+    def sid(i):
+        return ids[i % len(ids)]
+
+    return [
+        ('dashboard', lambda c, i: c.get('/api/dashboard')),
+        ('students', lambda c, i: c.get(f'/api/students?page={i % 50 + 1}&per_page=20')),
+        ('students_filtered', lambda c, i: c.get(
+            f'/api/students?risk=High&department={department}&sort=cgpa&order=desc&page={i % 5 + 1}')),
+        ('students_search', lambda c, i: c.get(f'/api/students?search={str(sid(i))[:4]}')),
+        ('student_detail', lambda c, i: c.get(f'/api/student/{sid(i)}')),
+        ('predict', lambda c, i: c.post('/api/predict', json=students.iloc[i % len(students)].to_dict())),
+        ('simulate', lambda c, i: c.post('/api/simulate', json={
+            'student_id': sid(i), 'modifications': {'attendance_rate': 95, 'study_hours_per_week': 25}})),
+        ('simulate_sweep', lambda c, i: c.post('/api/simulate', json={
+            'student_id': sid(i),
+            'scenarios': [{'attendance_rate': rate} for rate in range(50, 101, 5)]})),
+        ('analytics', lambda c, i: c.get('/api/analytics')),
+        ('advanced_analytics', lambda c, i: c.get('/api/advanced_analytics')),
+        ('shap_analysis', lambda c, i: c.get(f'/api/shap_analysis/{sid(i)}')),
+        ('upload', lambda c, i: c.post('/api/upload', content_type='multipart/form-data', data={
+            'file': (io.BytesIO(upload_csv), 'benchmark_upload.csv')})),
+        # Last: a stale report starts a background recompute over the whole table
+        ('model_performance', lambda c, i: c.get('/api/model_performance')),
+    ]
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def run_size(n_rows, data_path, model_dir, iterations, backend, endpoints=None):
+    """Benchmark every endpoint against an n_rows student table (run in a child process)"""
+    workdir = tempfile.mkdtemp(prefix=f'bench-{n_rows}-')
+    shutil.copytree(model_dir, os.path.join(workdir, 'models'),
+                    ignore=shutil.ignore_patterns('cache', 'versions'))
+    os.makedirs(os.path.join(workdir, 'data'))
+    os.chdir(workdir)
+
+    import app as app_module
+
+    app_module.app.config['STUDENT_BACKEND'] = backend
+    app_module.app.config['STUDENT_DATA_PATH'] = data_path
+    app_module.app.config['STUDENT_DB_PATH'] = os.path.join(workdir, 'data', 'students.db')
+    app_module.load_model()
+    client = app_module.app.test_client()
+
+    # Load the store once so the first endpoint doesn't pay for it
+    load_start = time.perf_counter()
+    store = app_module.get_student_store()
+    sample = store.frame().sample(n=min(200, n_rows), random_state=0)
+    load_seconds = time.perf_counter() - load_start
+
+    upload_csv = sample.head(UPLOAD_ROWS).to_csv(index=False).encode()
+    results = {}
+    for name, issue in endpoint_cases(sample, upload_csv):
+        if endpoints and name not in endpoints:
+            continue
+        for i in range(WARMUP_ITERATIONS):
+            issue(client, i)
+
+        rss_before = _rss_mb()
+        latencies, errors = [], 0
+        start = time.perf_counter()
+        for i in range(iterations):
+            request_start = time.perf_counter()
+            response = issue(client, i)
+            latencies.append((time.perf_counter() - request_start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - start
+
+        results[name] = {
+            'iterations': iterations,
+            'p50_ms': _percentile(latencies, 50),
+            'p99_ms': _percentile(latencies, 99),
+            'mean_ms': float(np.mean(latencies)),
+            'throughput_rps': iterations / elapsed,
+            'errors': errors,
+            'rss_delta_mb': max(0.0, _rss_mb() - rss_before),
+        }
+        print(f"   {name:<20} p50 {results[name]['p50_ms']:8.1f}ms  p99 {results[name]['p99_ms']:8.1f}ms  "
+              f"{results[name]['throughput_rps']:8.1f} req/s" + (f"  ⚠️  {errors} errors" if errors else ''))
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'rows': n_rows,
+        'backend': backend,
+        'store_load_seconds': load_seconds,
+        'peak_rss_mb': _peak_rss_mb(),
+        'endpoints': results,
+    }
+
+
+def compare_to_baseline(results, baseline, thresholds):
+    """List of regressions: metrics worse than baseline by more than their threshold"""
+    regressions = []
+    for size, run in results['sizes'].items():
+        base_run = baseline.get('sizes', {}).get(size)
+        if not base_run:
+            continue
+
+        pairs = [('peak_rss_mb', None, run.get('peak_rss_mb'), base_run.get('peak_rss_mb'))]
+        for endpoint, metrics in run['endpoints'].items():
+            base_metrics = base_run['endpoints'].get(endpoint, {})
+            for metric in ('p50_ms', 'p99_ms', 'throughput_rps', 'rss_delta_mb'):
+                pairs.append((metric, endpoint, metrics.get(metric), base_metrics.get(metric)))
+
+        for metric, endpoint, value, base in pairs:
+            if value is None or base is None or metric not in thresholds:
+                continue
+            if metric in HIGHER_IS_BETTER:
+                worse = (value > 0 and value < base * (1 - thresholds[metric])
+                         and (1000 / value - 1000 / base) > ABSOLUTE_SLACK.get(metric, 0))
+            else:
+                worse = (value > base * (1 + thresholds[metric])
+                         and value - base > ABSOLUTE_SLACK.get(metric, 0))
+            if worse:
+                regressions.append({
+                    'size': size, 'endpoint': endpoint, 'metric': metric,
+                    'baseline': base, 'value': value,
+                    'change': (value - base) / base if base else None,
+                })
+    return regressions
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, iterations=DEFAULT_ITERATIONS, backend='pandas', endpoints=None,
+                   model_dir='models', output=None):
+    """Run the ladder, one fresh process per size; returns the results dict"""
+    results = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'cpu_count': os.cpu_count(),
+        'iterations': iterations,
+        'backend': backend,
+        'sizes': {},
+    }
+    model_dir = os.path.abspath(model_dir)
+    context = multiprocessing.get_context('spawn')
+
+    for n_rows in sizes:
+        data_path = os.path.abspath(scaled_dataset(n_rows, model_dir=model_dir))
+        print(f"📏 {n_rows} students ({backend} store)")
+        with context.Pool(1) as pool:
+            results['sizes'][str(n_rows)] = pool.apply(
+                run_size, (n_rows, data_path, model_dir, iterations, backend, endpoints))
+        print(f"   peak RSS {results['sizes'][str(n_rows)]['peak_rss_mb']:.0f} MB")
+
+    output = output or os.path.join(BENCHMARK_DIR, f"results-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {output}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark app.py endpoints at several dataset sizes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help='Requests per endpoint')
+    parser.add_argument('--backend', choices=['pandas', 'sqlite'], default='pandas')
+    parser.add_argument('--endpoints', nargs='+', help='Only these benchmark cases (e.g. predict dashboard)')
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--output', help='Results JSON path (default: benchmarks/results-<time>.json)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the baseline')
+    for metric, flag in THRESHOLD_FLAGS.items():
+        parser.add_argument(flag, dest=f'{metric}_threshold', type=float, default=DEFAULT_THRESHOLDS[metric],
+                            help=f'Allowed relative worsening of {metric} (default {DEFAULT_THRESHOLDS[metric]:.0%})')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.iterations, args.backend, args.endpoints,
+                             args.model_dir, args.output)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📌 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️  No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    thresholds = {metric: getattr(args, f'{metric}_threshold') for metric in DEFAULT_THRESHOLDS}
+    regressions = compare_to_baseline(results, baseline, thresholds)
+    if not regressions:
+        print("✅ No regressions against the baseline")
+        return 0
+
+    print(f"❌ {len(regressions)} regression(s) against the baseline:")
+    for r in regressions:
+        where = f"{r['size']} rows / {r['endpoint']}" if r['endpoint'] else f"{r['size']} rows"
+        change = f" ({r['change']:+.0%})" if r['change'] is not None else ''
+        print(f"   {where}: {r['metric']} {r['baseline']:.1f} -> {r['value']:.1f}{change}")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
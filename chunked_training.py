@@ -0,0 +1,135 @@
+"""
+Out-of-core building blocks for training on datasets larger than memory.
+
+iter_chunks() streams Parquet files (record batch by record batch), CSV files
+or a cached Excel sheet as DataFrames of at most chunk_rows rows. BatchIter
+feeds preprocessed batches to XGBoost's external-memory DMatrix, which pages
+its quantized copy of the data to disk. StudentEngagementPredictor.train_chunked()
+in train_model.py combines them so only one chunk is in memory at a time.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.preprocessing import StandardScaler
+
+from dataset_cache import cached_sheet_path
+
+DEFAULT_CHUNK_ROWS = 50000
+SUPPORTED_EXTENSIONS = ('.parquet', '.pq', '.csv', '.xlsx', '.xls')
+
+SAMPLE_KEY = '_sample_key'
+
+
+def expand_sources(sources):
+    """Resolve a path, a directory of data files or a list of either to file paths"""
+    if isinstance(sources, str):
+        sources = [sources]
+
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(os.path.join(source, name) for name in sorted(os.listdir(source))
+                         if name.lower().endswith(SUPPORTED_EXTENSIONS))
+        else:
+            paths.append(source)
+
+    if not paths:
+        raise ValueError(f"No data files found in {sources}")
+    return paths
+
+
+def iter_chunks(sources, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield DataFrames of at most chunk_rows rows from each source in turn
+
+    Chunk boundaries are deterministic, so every pass over the same files
+    sees the same chunks in the same order.
+    """
+    for path in expand_sources(sources):
+        if path.lower().endswith(('.xlsx', '.xls')):
+            # openpyxl can't stream; parse the workbook once into the columnar cache
+            path = cached_sheet_path(path)
+
+        if path.lower().endswith(('.parquet', '.pq')):
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+                yield batch.to_pandas()
+        elif path.lower().endswith('.pkl'):
+            # Pickle fallback of the Excel cache (no pyarrow): the sheet loads whole
+            df = pd.read_pickle(path)
+            for start in range(0, len(df), chunk_rows):
+                yield df.iloc[start:start + chunk_rows]
+        else:
+            yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+def sample_rows(sample, chunk, size, rng):
+    """Keep a uniform sample of at most size rows across chunks (bottom-k sampling)
+
+    Rows carry a random key in SAMPLE_KEY; drop it once sampling is done.
+    """
+    chunk = chunk.assign(**{SAMPLE_KEY: rng.random(len(chunk))})
+    sample = chunk if sample is None else pd.concat([sample, chunk], ignore_index=True)
+    if len(sample) > size:
+        sample = sample.nsmallest(size, SAMPLE_KEY)
+    return sample
+
+
+def holdout_mask(chunk_index, n_rows, test_size, random_state=42):
+    """Held-out rows of one chunk; identical on every pass over the data"""
+    return np.random.default_rng([random_state, chunk_index]).random(n_rows) < test_size
+
+
+def subset_scaler(scaler, keep):
+    """StandardScaler restricted to the feature positions in keep"""
+    keep = np.asarray(keep, dtype=int)
+    subset = StandardScaler()
+    subset.mean_ = scaler.mean_[keep]
+    subset.var_ = scaler.var_[keep]
+    subset.scale_ = scaler.scale_[keep]
+    subset.n_features_in_ = len(keep)
+    subset.n_samples_seen_ = (scaler.n_samples_seen_[keep] if np.ndim(scaler.n_samples_seen_)
+                              else scaler.n_samples_seen_)
+    if hasattr(scaler, 'feature_names_in_'):
+        subset.feature_names_in_ = scaler.feature_names_in_[keep]
+    return subset
+
+
+class BatchIter(xgb.DataIter):
+    """Data iterator over (X, y) batches for external_memory_matrix()
+
+    make_batches is called at the start of every pass and must return a
+    fresh iterator; XGBoost reads the data several times while building its
+    on-disk cache.
+    """
+
+    def __init__(self, make_batches, cache_prefix):
+        self._make_batches = make_batches
+        self._batches = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._batches is None:
+            self._batches = self._make_batches()
+        batch = next(self._batches, None)
+        if batch is None:
+            return False
+        X, y = batch
+        input_data(data=X, label=y)
+        return True
+
+    def reset(self):
+        self._batches = None
+
+
+def external_memory_matrix(batch_iter):
+    """Training matrix streamed from batch_iter into its on-disk cache
+
+    ExtMemQuantileDMatrix only exists from XGBoost 3.0; earlier versions
+    (requirements.txt pins 1.7) build an external-memory DMatrix instead.
+    """
+    if hasattr(xgb, 'ExtMemQuantileDMatrix'):
+        return xgb.ExtMemQuantileDMatrix(batch_iter)
+    return xgb.DMatrix(batch_iter)
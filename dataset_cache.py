@@ -0,0 +1,190 @@
+"""
+Cached ingestion of Excel workbooks for training and analysis.
+
+Parsing Dataset.xlsx with openpyxl takes seconds on every run. The first read
+converts every sheet to Parquet under data/cache/ (pickle if pyarrow isn't
+installed), keyed by the workbook's path and SHA-256. Later reads load the cached
+sheets until the workbook content changes.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = 'data/cache'
+MANIFEST_NAME = 'manifest.json'
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    """Hash a file's contents without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _workbook_key(path):
+    """Workbook name plus a hash of its absolute path, so same-named workbooks don't collide"""
+    location = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:8]
+    return f'{os.path.splitext(os.path.basename(path))[0]}-{location}'
+
+
+def _cache_entries(cache_dir, path):
+    """Existing cache directories for this workbook, any version"""
+    if not os.path.isdir(cache_dir):
+        return []
+    prefix = f'{_workbook_key(path)}-'
+    return [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+            if name.startswith(prefix) and os.path.isdir(os.path.join(cache_dir, name))]
+
+
+def _load_manifest(entry_dir):
+    try:
+        with open(os.path.join(entry_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(entry_dir, manifest):
+    tmp_path = os.path.join(entry_dir, f'.{MANIFEST_NAME}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(entry_dir, MANIFEST_NAME))
+
+
+def _find_current_entry(path, cache_dir):
+    """Return (entry_dir, manifest, digest) for the workbook's current content
+
+    A matching size and mtime is trusted without rehashing; otherwise the
+    workbook is hashed and looked up by content. entry_dir and manifest are
+    None when this content isn't cached yet.
+    """
+    stat = os.stat(path)
+    entries = [(entry, _load_manifest(entry)) for entry in _cache_entries(cache_dir, path)]
+    source = os.path.abspath(path)
+    entries = [(entry, manifest) for entry, manifest in entries
+               if manifest and manifest.get('source') == source]
+
+    for entry, manifest in entries:
+        if manifest['size'] == stat.st_size and manifest['mtime'] == stat.st_mtime:
+            return entry, manifest, None
+
+    digest = file_sha256(path)
+    for entry, manifest in entries:
+        if manifest['sha256'] == digest:
+            manifest['size'], manifest['mtime'] = stat.st_size, stat.st_mtime
+            _write_manifest(entry, manifest)
+            return entry, manifest, digest
+
+    return None, None, digest
+
+
+def _write_sheet(df, entry_dir, index):
+    """Write one sheet in the fastest available format; return its file name"""
+    if PARQUET_AVAILABLE:
+        filename = f'sheet_{index}.parquet'
+        try:
+            df.to_parquet(os.path.join(entry_dir, filename), index=False)
+            return filename
+        except (ValueError, TypeError, ImportError) as e:
+            # Mixed-type object columns can't be stored as Parquet
+            print(f"⚠️  Parquet cache unavailable for sheet {index} ({e}), using pickle")
+    filename = f'sheet_{index}.pkl'
+    df.to_pickle(os.path.join(entry_dir, filename))
+    return filename
+
+
+def _read_sheet(entry_dir, filename):
+    if filename.endswith('.parquet'):
+        return pd.read_parquet(os.path.join(entry_dir, filename))
+    return pd.read_pickle(os.path.join(entry_dir, filename))
+
+
+def _build_entry(path, cache_dir, digest):
+    """Parse every sheet of the workbook once and cache it"""
+    print(f"📥 Converting {path} to cached columnar format...")
+    sheets = pd.read_excel(path, sheet_name=None)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    entry_name = f'{_workbook_key(path)}-{digest[:16]}'
+    entry_dir = os.path.join(cache_dir, entry_name)
+    tmp_dir = os.path.join(cache_dir, f'.{entry_name}.{os.getpid()}.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    stat = os.stat(path)
+    manifest = {
+        'source': os.path.abspath(path),
+        'sha256': digest,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sheets': []
+    }
+    for index, (name, df) in enumerate(sheets.items()):
+        manifest['sheets'].append({'name': name, 'file': _write_sheet(df, tmp_dir, index)})
+
+    _write_manifest(tmp_dir, manifest)
+
+    # Replace any stale versions of this workbook with the new one
+    for stale in _cache_entries(cache_dir, path):
+        shutil.rmtree(stale, ignore_errors=True)
+    os.replace(tmp_dir, entry_dir)
+
+    return entry_dir, manifest
+
+
+def _current_entry(path, cache_dir):
+    """(entry_dir, manifest) for the workbook's current content, building it if needed"""
+    entry_dir, manifest, digest = _find_current_entry(path, cache_dir)
+    if entry_dir is None:
+        return _build_entry(path, cache_dir, digest)
+    print(f"⚡ Using cached copy of {path}")
+    return entry_dir, manifest
+
+
+def _find_sheet(manifest, key):
+    """Manifest entry for a sheet given by position or name"""
+    sheets = manifest['sheets']
+    if isinstance(key, int):
+        if key >= len(sheets):
+            raise IndexError(f"Worksheet index {key} is invalid, {len(sheets)} worksheets found")
+        return sheets[key]
+    names = [sheet['name'] for sheet in sheets]
+    if key not in names:
+        raise ValueError(f"Worksheet named '{key}' not found")
+    return sheets[names.index(key)]
+
+
+def read_excel_cached(path, sheet_name=0, cache_dir=DEFAULT_CACHE_DIR):
+    """Drop-in replacement for pd.read_excel(path, sheet_name=...) backed by a cache
+
+    sheet_name follows pandas: an int position, a sheet name, a list of either
+    (returns a dict), or None for every sheet.
+    """
+    entry_dir, manifest = _current_entry(path, cache_dir)
+
+    def load(key):
+        return _read_sheet(entry_dir, _find_sheet(manifest, key)['file'])
+
+    if sheet_name is None:
+        return {sheet['name']: load(sheet['name']) for sheet in manifest['sheets']}
+    if isinstance(sheet_name, list):
+        return {key: load(key) for key in sheet_name}
+    return load(sheet_name)
+
+
+def cached_sheet_path(path, sheet_name=0, cache_dir=DEFAULT_CACHE_DIR):
+    """Path of one sheet's cached file, for readers that stream it in batches"""
+    entry_dir, manifest = _current_entry(path, cache_dir)
+    return os.path.join(entry_dir, _find_sheet(manifest, sheet_name)['file'])
@@ -0,0 +1,194 @@
+"""
+Post-training diagnostics for the Student Engagement Prediction System.
+
+Renders the feature importance and SHAP plots (and saves the SHAP explainer)
+from a saved model bundle. Each diagnostic runs in its own process, so this
+step can be scheduled after a fast/headless retrain or skipped entirely.
+
+Usage:
+    python diagnostics.py                      # everything, in parallel
+    python diagnostics.py --only shap_summary  # a subset
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+DIAGNOSTICS = ['feature_importance', 'shap_summary', 'shap_waterfall', 'shap_explainer']
+
+DEFAULT_OUTPUTS = {
+    'feature_importance': 'feature_importance.png',
+    'shap_summary': 'shap_summary.png',
+    'shap_waterfall': 'shap_waterfall.png',
+    'shap_explainer': 'models/shap_explainer.pkl',
+}
+
+
+def _pyplot():
+    """Import pyplot with a non-interactive backend (safe on headless hosts)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def plot_feature_importance(model, feature_columns, output=DEFAULT_OUTPUTS['feature_importance']):
+    """Plot and save the top 15 feature importances"""
+    if not hasattr(model, 'feature_importances_'):
+        return None
+
+    plt = _pyplot()
+    import seaborn as sns
+
+    feature_imp = pd.DataFrame({
+        'feature': feature_columns,
+        'importance': model.feature_importances_
+    }).sort_values('importance', ascending=False)
+
+    plt.figure(figsize=(10, 8))
+    sns.barplot(x='importance', y='feature', data=feature_imp.head(15))
+    plt.title('Top 15 Feature Importance')
+    plt.tight_layout()
+    plt.savefig(output, dpi=300, bbox_inches='tight')
+    plt.close()
+    return output
+
+
+def _positive_class_shap(explainer, shap_values):
+    """SHAP values and expected value for the positive class"""
+    expected_value = explainer.expected_value
+    if isinstance(shap_values, list) and len(shap_values) > 1:
+        return shap_values[1], expected_value[1]
+    if np.ndim(shap_values) == 3:
+        return shap_values[:, :, 1], np.ravel(expected_value)[1]
+    return shap_values, np.ravel(expected_value)[0] if np.ndim(expected_value) else expected_value
+
+
+def plot_shap_summary(explainer, X_sample, feature_columns, output=DEFAULT_OUTPUTS['shap_summary']):
+    """SHAP summary plot over a sample of rows"""
+    plt = _pyplot()
+    import shap
+
+    shap_values = explainer.shap_values(X_sample)
+    plt.figure(figsize=(12, 8))
+    shap.summary_plot(shap_values, X_sample, feature_names=feature_columns, show=False)
+    plt.savefig(output, dpi=300, bbox_inches='tight')
+    plt.close()
+    return output
+
+
+def plot_shap_waterfall(explainer, X_sample, feature_columns, sample_idx=0,
+                        output=DEFAULT_OUTPUTS['shap_waterfall']):
+    """SHAP waterfall plot explaining a single prediction"""
+    plt = _pyplot()
+    import shap
+
+    row = X_sample[sample_idx:sample_idx + 1]
+    values, expected_value = _positive_class_shap(explainer, explainer.shap_values(row))
+
+    plt.figure(figsize=(10, 6))
+    shap.plots.waterfall(shap.Explanation(values=values[0], base_values=expected_value,
+                                          data=row[0], feature_names=feature_columns), show=False)
+    plt.savefig(output, dpi=300, bbox_inches='tight')
+    plt.close()
+    return output
+
+
+def _load_bundle(model_dir):
+    import joblib
+    from features import PIPELINE_PATH
+
+    model = joblib.load(os.path.join(model_dir, 'student_engagement_model.pkl'))
+    feature_columns = joblib.load(os.path.join(model_dir, 'feature_columns.pkl'))
+    scaler = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
+    pipeline_path = os.path.join(model_dir, os.path.basename(PIPELINE_PATH))
+    pipeline = joblib.load(pipeline_path) if os.path.exists(pipeline_path) else None
+    return model, feature_columns, scaler, pipeline
+
+
+def _load_sample(data_path, feature_columns, scaler, pipeline, sample_size):
+    df = pd.read_csv(data_path, nrows=sample_size)
+    if pipeline is not None and pipeline.feature_columns is not None:
+        return pipeline.feature_matrix(df)
+    return scaler.transform(df[feature_columns])
+
+
+def run_diagnostic(name, model_dir='models', data_path='data/processed_data.csv',
+                   sample_size=1000, output=None):
+    """Produce one diagnostic from the saved bundle; returns (name, output path)"""
+    import shap
+
+    output = output or DEFAULT_OUTPUTS[name]
+    model, feature_columns, scaler, pipeline = _load_bundle(model_dir)
+
+    if name == 'feature_importance':
+        return name, plot_feature_importance(model, feature_columns, output)
+
+    explainer = shap.TreeExplainer(model)
+    if name == 'shap_explainer':
+        import joblib
+        import model_registry
+        joblib.dump(explainer, output)
+        if os.path.abspath(os.path.dirname(output)) == os.path.abspath(model_dir):
+            # The bundle changed; let a running app pick up the new explainer
+            model_registry.write_bundle_manifest(model_dir)
+        return name, output
+
+    X_sample = _load_sample(data_path, feature_columns, scaler, pipeline, sample_size)
+    if name == 'shap_summary':
+        return name, plot_shap_summary(explainer, X_sample, feature_columns, output)
+    if name == 'shap_waterfall':
+        return name, plot_shap_waterfall(explainer, X_sample, feature_columns, output=output)
+    raise ValueError(f"Unknown diagnostic: {name}")
+
+
+def generate_diagnostics(names=None, model_dir='models', data_path='data/processed_data.csv',
+                         sample_size=1000, n_jobs=None):
+    """Run the requested diagnostics in parallel worker processes
+
+    Returns {name: output path or error message}.
+    """
+    names = list(names or DIAGNOSTICS)
+    unknown = [name for name in names if name not in DIAGNOSTICS]
+    if unknown:
+        raise ValueError(f"Unknown diagnostics: {unknown}")
+
+    print(f"🩺 Generating diagnostics: {', '.join(names)}")
+    start = time.perf_counter()
+    results = {}
+
+    workers = min(n_jobs or os.cpu_count() or 1, len(names))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {name: pool.submit(run_diagnostic, name, model_dir, data_path, sample_size)
+                   for name in names}
+        for name, future in futures.items():
+            try:
+                _, output = future.result()
+                results[name] = output
+                print(f"   ✅ {name}: {output}")
+            except Exception as e:
+                results[name] = f"failed: {e}"
+                print(f"   ⚠️  {name} failed: {e}")
+
+    print(f"⏱️  Diagnostics took {time.perf_counter() - start:.1f}s")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render post-training diagnostics from a saved model')
+    parser.add_argument('--only', nargs='+', choices=DIAGNOSTICS, help='Diagnostics to produce (default: all)')
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--data', default='data/processed_data.csv', help='Processed data to sample for SHAP')
+    parser.add_argument('--sample-size', type=int, default=1000)
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes (default: one per diagnostic)')
+    args = parser.parse_args(argv)
+
+    generate_diagnostics(args.only, args.model_dir, args.data, args.sample_size, args.jobs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+"""
+Fitted feature pipeline shared by training and serving.
+
+FeaturePipeline resolves everything data-dependent once at fit time:
+imputation values, label-encoder lookup tables and which source columns feed
+the engineered features. After that the same object builds the model's input
+matrix for one row or a million with vectorized numpy operations, so
+train_model.py and app.py can't drift apart.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Engineered features and the keywords used to find their source column
+DERIVED_FEATURES = [
+    ('attendance_rate', ['attend']),
+    ('academic_performance', ['gpa', 'grade', 'mark', 'score', 'cgpa']),
+    ('study_intensity', ['study', 'hour', 'time']),
+    ('assignment_completion', ['assignment', 'project', 'submit']),
+    ('activity_participation', ['activit']),
+]
+
+INTERACTION_FEATURES = [
+    ('attendance_performance_interaction', 'attendance_rate', 'academic_performance'),
+    ('study_assignment_interaction', 'study_intensity', 'assignment_completion'),
+]
+
+FAILURE_RISK_FEATURE = ('failure_risk', 'past_failures')
+
+# Columns derived from the target; never used as feature sources
+TARGET_DERIVED_COLUMNS = ['risk_level', 'risk_level_encoded', 'engagement_score']
+
+PIPELINE_PATH = 'models/feature_pipeline.pkl'
+
+# Below this many rows, per-value dict lookups beat building pandas indexes
+SMALL_BATCH_ROWS = 64
+
+
+def _is_categorical(series):
+    return not pd.api.types.is_numeric_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class FeaturePipeline:
+    """Impute, encode and engineer student features with fitted lookup tables"""
+
+    def __init__(self):
+        self.target_column = None
+        self.numeric_fill = {}
+        self.categorical_classes = {}
+        self.categorical_fill = {}
+        self.derived_sources = {}
+        self.interactions = []
+        self.failure_source = None
+        self.feature_columns = None
+        self.scale_mean = None
+        self.scale_std = None
+        self._class_index = {}
+        self._class_lookup = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_class_index'] = {}
+        state['_class_lookup'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    # ------------------------------------------------------------------ fit
+
+    def fit(self, df, target_column=None, label_encoders=None):
+        """Learn imputation values, encoder tables and feature sources from df
+
+        label_encoders (column -> fitted LabelEncoder) marks columns that are
+        already integer-encoded, e.g. when rebuilding a pipeline from
+        processed data and a saved label_encoders.pkl.
+        """
+        self.target_column = target_column
+        label_encoders = {col: enc for col, enc in (label_encoders or {}).items()
+                          if col in df.columns and col not in TARGET_DERIVED_COLUMNS}
+
+        self.numeric_fill = {}
+        self.categorical_classes = {}
+        self.categorical_fill = {}
+
+        for col in df.columns:
+            if col == target_column or col in TARGET_DERIVED_COLUMNS:
+                continue
+            series = df[col]
+            if col in label_encoders:
+                classes = [str(c) for c in label_encoders[col].classes_]
+                self.categorical_classes[col] = classes
+                codes = series.dropna()
+                mode = int(codes.mode()[0]) if len(codes) else 0
+                self.categorical_fill[col] = classes[mode] if mode < len(classes) else classes[0]
+            elif _is_categorical(series):
+                fill = series.mode()[0] if series.notnull().any() else ''
+                self.categorical_fill[col] = str(fill)
+                # LabelEncoder sorts the string classes
+                self.categorical_classes[col] = sorted(series.fillna(fill).astype(str).unique().tolist())
+            elif pd.api.types.is_bool_dtype(series):
+                continue
+            else:
+                median = series.median()
+                self.numeric_fill[col] = float(median) if pd.notnull(median) else 0.0
+
+        self._resolve_feature_sources(df.columns)
+        self._class_index = {}
+        self._class_lookup = {}
+        return self
+
+    def _resolve_feature_sources(self, columns):
+        """Pick the first input column matching each engineered feature's keywords
+
+        Columns that are themselves engineered outputs (present when fitting on
+        processed data) are only considered after every other column.
+        """
+        engineered = ({name for name, _ in DERIVED_FEATURES}
+                      | {name for name, _, _ in INTERACTION_FEATURES}
+                      | {FAILURE_RISK_FEATURE[0]})
+        candidates = [col for col in columns
+                      if col != self.target_column
+                      and col not in TARGET_DERIVED_COLUMNS
+                      and (col in self.numeric_fill or col in self.categorical_classes)]
+        candidates = ([col for col in candidates if col not in engineered]
+                      + [col for col in candidates if col in engineered])
+
+        self.derived_sources = {}
+        for name, keywords in DERIVED_FEATURES:
+            matches = [col for col in candidates if any(word in col.lower() for word in keywords)]
+            if matches:
+                self.derived_sources[name] = matches[0]
+
+        self.interactions = [(name, a, b) for name, a, b in INTERACTION_FEATURES
+                             if a in self.derived_sources and b in self.derived_sources]
+
+        name, source = FAILURE_RISK_FEATURE
+        self.failure_source = source if source in self.numeric_fill else None
+
+    def add_categories(self, categories):
+        """Merge category values seen outside the fitting sample
+
+        categories maps column -> raw values (e.g. collected while streaming
+        chunks); classes stay sorted, matching LabelEncoder.
+        """
+        for col, values in categories.items():
+            if col in self.categorical_classes:
+                merged = set(self.categorical_classes[col]) | {str(value) for value in values}
+                self.categorical_classes[col] = sorted(merged)
+        self._class_index = {}
+        self._class_lookup = {}
+        return self
+
+    def set_feature_columns(self, feature_columns, scaler=None):
+        """Record the model's input columns and the fitted StandardScaler"""
+        self.feature_columns = list(feature_columns)
+        if scaler is not None:
+            self.scale_mean = np.asarray(scaler.mean_, dtype=np.float64)
+            self.scale_std = np.asarray(scaler.scale_, dtype=np.float64)
+        return self
+
+    @classmethod
+    def from_artifacts(cls, processed_df, label_encoders, feature_columns, scaler):
+        """Rebuild a pipeline for a model bundle saved before pipelines existed"""
+        pipeline = cls().fit(processed_df, label_encoders=label_encoders)
+        return pipeline.set_feature_columns(feature_columns, scaler)
+
+    # ------------------------------------------------------------ primitives
+
+    def _classes(self, col):
+        if col not in self._class_index:
+            self._class_index[col] = pd.Index(self.categorical_classes[col])
+        return self._class_index[col]
+
+    def _lookup(self, col):
+        if col not in self._class_lookup:
+            self._class_lookup[col] = {label: code for code, label in enumerate(self.categorical_classes[col])}
+        return self._class_lookup[col]
+
+    def fill_code(self, col):
+        """Label code used for missing or unseen categories"""
+        return self._lookup(col)[self.categorical_fill[col]]
+
+    def encode_values(self, col, values):
+        """Map raw categories to label codes
+
+        Values that are already valid codes pass through; missing and unseen
+        categories fall back to the training mode instead of raising.
+        """
+        values = np.asarray(values, dtype=object)
+
+        if len(values) <= SMALL_BATCH_ROWS:
+            lookup = self._lookup(col)
+            codes = np.empty(len(values), dtype=np.int64)
+            for i, value in enumerate(values):
+                code = lookup.get(str(value), -1)
+                if code < 0:
+                    number = _to_float(value)
+                    if np.isfinite(number) and number == int(number) and 0 <= number < len(lookup):
+                        code = int(number)
+                    else:
+                        code = self.fill_code(col)
+                codes[i] = code
+            return codes
+
+        classes = self._classes(col)
+        codes = classes.get_indexer(values.astype(str))
+
+        unmatched = codes < 0
+        if unmatched.any():
+            numeric = pd.to_numeric(pd.Series(values[unmatched]), errors='coerce').to_numpy()
+            valid = ~np.isnan(numeric) & (numeric == np.floor(numeric)) & (numeric >= 0) & (numeric < len(classes))
+            fallback = self.fill_code(col)
+            codes[unmatched] = np.where(valid, np.nan_to_num(numeric), fallback).astype(codes.dtype)
+
+        return codes.astype(np.int64)
+
+    def numeric_values(self, col, values):
+        """Coerce values to float and fill gaps with the training median"""
+        values = np.asarray(values)
+        if values.dtype.kind not in 'fiub':
+            if len(values) <= SMALL_BATCH_ROWS:
+                values = np.array([_to_float(value) for value in values], dtype=np.float64)
+            else:
+                values = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy()
+        values = values.astype(np.float64)
+        fill = self.numeric_fill.get(col, 0.0)
+        if np.isnan(values).any():
+            values = np.where(np.isnan(values), fill, values)
+        return values
+
+    # ---------------------------------------------------------- frame path
+
+    def encode(self, df):
+        """Impute and label-encode the input columns of a DataFrame (training)"""
+        df = df.copy()
+        for col in df.columns:
+            if col in self.categorical_classes:
+                df[col] = self.encode_values(col, df[col].to_numpy())
+            elif col in self.numeric_fill and df[col].isnull().any():
+                df[col] = df[col].fillna(self.numeric_fill[col])
+        return df
+
+    def add_features(self, df):
+        """Append the engineered feature columns to an encoded DataFrame"""
+        for name, source in self.derived_sources.items():
+            if source in df.columns:
+                df[name] = df[source]
+
+        for name, a, b in self.interactions:
+            if a in df.columns and b in df.columns:
+                df[name] = df[a] * df[b]
+
+        if self.failure_source and self.failure_source in df.columns:
+            df[FAILURE_RISK_FEATURE[0]] = df[self.failure_source] > 0
+
+        return df
+
+    def transform(self, df):
+        """Full preprocessing of a raw DataFrame: encode then engineer features"""
+        return self.add_features(self.encode(df))
+
+    # --------------------------------------------------------- matrix path
+
+    def feature_matrix(self, data, scale=True):
+        """Build the model input matrix for raw or processed student records
+
+        data may be a DataFrame, a single record dict or a list of dicts.
+        Engineered features are always recomputed from their sources, so a
+        simulated change to cgpa also moves academic_performance. Columns the
+        input doesn't provide are filled with training imputation values.
+        """
+        if self.feature_columns is None:
+            raise ValueError("Feature pipeline has no feature columns; call set_feature_columns()")
+
+        if isinstance(data, dict):
+            data = {key: [value] for key, value in data.items()}
+            n_rows = 1
+        elif isinstance(data, list):
+            data = pd.DataFrame(data)
+            n_rows = len(data)
+        else:
+            n_rows = len(data)
+
+        if isinstance(data, pd.DataFrame) and n_rows <= SMALL_BATCH_ROWS:
+            data = data.to_dict('list')
+
+        columns = {}
+
+        def raw(col):
+            return np.asarray(data[col]) if col in data else None
+
+        def value(col):
+            if col in columns:
+                return columns[col]
+
+            source = self.derived_sources.get(col)
+            if col in self.categorical_classes:
+                values = raw(col)
+                result = (self.encode_values(col, values).astype(np.float64) if values is not None
+                          else np.full(n_rows, float(self.fill_code(col))))
+            elif source is not None and source != col and (source in data or col not in data):
+                result = value(source)
+            elif col == FAILURE_RISK_FEATURE[0] and self.failure_source:
+                result = (value(self.failure_source) > 0).astype(np.float64)
+            elif any(col == name for name, _, _ in self.interactions):
+                _, a, b = next(item for item in self.interactions if item[0] == col)
+                result = value(a) * value(b)
+            else:
+                values = raw(col)
+                result = (self.numeric_values(col, values) if values is not None
+                          else np.full(n_rows, self.numeric_fill.get(col, 0.0)))
+
+            columns[col] = result
+            return result
+
+        matrix = np.empty((n_rows, len(self.feature_columns)), dtype=np.float64)
+        for i, col in enumerate(self.feature_columns):
+            matrix[:, i] = value(col)
+
+        if scale and self.scale_mean is not None:
+            matrix -= self.scale_mean
+            matrix /= self.scale_std
+        return matrix
@@ -0,0 +1,454 @@
+"""
+Concurrent load test for the Student Engagement Prediction API.
+
+Replays a weighted mix of dashboard traffic (student list pages, detail
+views, simulations, SHAP views, occasional uploads...) over real HTTP
+against a server it starts locally, or any --url. Two ways to drive it:
+
+* --concurrency N: N clients issue requests back to back (closed loop)
+* --rate R: requests start on a fixed schedule of R per second (open loop);
+  latency is measured from the scheduled start, so a server that falls
+  behind shows it as queueing delay instead of silently slowing the test
+
+--ramp steps the concurrency up (1, 2, 4, ...) and reports the saturation
+throughput: the highest rate reached before adding clients stops helping.
+
+Per-route latency percentiles, the error rate and a timeline of percentiles
+per interval are printed and saved to benchmarks/loadtest-<time>.json,
+together with the server-side /metrics scraped before and after the run
+(per-route request and stage time as the server saw it).
+
+Usage:
+    python loadtest.py --concurrency 8 --duration 60
+    python loadtest.py --rate 20 --duration 120 --interval 10
+    python loadtest.py --ramp --max-concurrency 32 --step-seconds 15
+    python loadtest.py --url http://staging:5000 --concurrency 4 --mix students=5,student_detail=5
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from benchmark import BENCHMARK_DIR
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 5055
+DEFAULT_DURATION = 30
+DEFAULT_INTERVAL = 5
+REQUEST_TIMEOUT = 60
+SERVER_START_TIMEOUT = 300
+SAMPLE_STUDENTS = 200
+UPLOAD_ROWS = 50
+
+# Relative weights of each request type in the replayed traffic
+DEFAULT_MIX = {
+    'students': 30,
+    'student_detail': 25,
+    'dashboard': 15,
+    'simulate': 10,
+    'predict': 8,
+    'shap_analysis': 5,
+    'analytics': 3,
+    'simulate_sweep': 2,
+    'advanced_analytics': 1,
+    'model_performance': 0.5,
+    'upload': 0.5,
+}
+
+# Ramp stops once one more step adds less than this much throughput
+SATURATION_GAIN = 0.05
+
+SERVER_SCRIPT = (
+    "import os, sys\n"
+    "import app\n"
+    "os.makedirs(app.app.config['UPLOAD_FOLDER'], exist_ok=True)\n"
+    "app.load_model()\n"
+    "app.app.run(host=sys.argv[1], port=int(sys.argv[2]), threaded=True, debug=False)\n"
+)
+
+
+def _multipart(filename, payload):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: text/csv\r\n\r\n').encode() + payload + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def traffic_mix(students, weights=None):
+    """(names, probabilities, builders) for the weighted request mix
+
+    students is a list of student records from /api/students; each builder
+    takes a random.Random and returns (method, path, body, content type).
+    """
+    ids = [student['student_id'] for student in students]
+    departments = sorted({str(student['department']) for student in students if 'department' in student})
+    upload_csv = ','.join(students[0]) + '\n' + '\n'.join(
+        ','.join('' if value is None else str(value) for value in student.values())
+        for student in students[:UPLOAD_ROWS])
+
+    def as_json(payload):
+        return json.dumps(payload).encode(), 'application/json'
+
+    builders = {
+        'dashboard': lambda r: ('GET', '/api/dashboard', None, None),
+        'students': lambda r: ('GET', f'/api/students?page={r.randint(1, 50)}&per_page=20'
+                               + (f'&risk=High&department={r.choice(departments)}'
+                                  if departments and r.random() < 0.3 else ''), None, None),
+        'student_detail': lambda r: ('GET', f'/api/student/{r.choice(ids)}', None, None),
+        'predict': lambda r: ('POST', '/api/predict', *as_json(r.choice(students))),
+        'simulate': lambda r: ('POST', '/api/simulate', *as_json({
+            'student_id': r.choice(ids),
+            'modifications': {'attendance_rate': r.randint(50, 100), 'study_hours_per_week': r.randint(0, 40)}})),
+        'simulate_sweep': lambda r: ('POST', '/api/simulate', *as_json({
+            'student_id': r.choice(ids),
+            'scenarios': [{'attendance_rate': rate} for rate in range(50, 101, 5)]})),
+        'shap_analysis': lambda r: ('GET', f'/api/shap_analysis/{r.choice(ids)}', None, None),
+        'analytics': lambda r: ('GET', '/api/analytics', None, None),
+        'advanced_analytics': lambda r: ('GET', '/api/advanced_analytics', None, None),
+        'model_performance': lambda r: ('GET', '/api/model_performance', None, None),
+        'upload': lambda r: ('POST', '/api/upload', *_multipart('loadtest_upload.csv', upload_csv.encode())),
+    }
+
+    weights = DEFAULT_MIX if weights is None else weights
+    unknown = set(weights) - set(builders)
+    if unknown:
+        raise ValueError(f"Unknown request types in mix: {', '.join(sorted(unknown))}")
+    names = [name for name, weight in weights.items() if weight > 0]
+    total = sum(weights[name] for name in names)
+    return names, [weights[name] / total for name in names], builders
+
+
+class Client:
+    """One keep-alive HTTP connection, reopened whenever the server closes it"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=REQUEST_TIMEOUT)
+
+    def request(self, method, path, body=None, content_type=None):
+        """(status, response bytes); status 0 for connection errors and timeouts"""
+        headers = {'Content-Type': content_type} if content_type else {}
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            payload = response.read()
+            if response.will_close:
+                self.connection.close()
+            return response.status, payload
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            return 0, b''
+
+    def close(self):
+        self.connection.close()
+
+
+def parse_metrics(text):
+    """{(metric name, frozenset of label pairs): value} from Prometheus text"""
+    samples = {}
+    for line in text.splitlines():
+        match = re.match(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})?\s+(\S+)$', line)
+        if not match or line.startswith('#'):
+            continue
+        labels = frozenset(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or ''))
+        samples[(match.group(1), labels)] = float(match.group(3))
+    return samples
+
+
+def server_side_summary(before, after):
+    """Per-route request count, mean latency and stage time from two /metrics scrapes"""
+    def delta(name, labels):
+        return after.get((name, labels), 0.0) - before.get((name, labels), 0.0)
+
+    routes = {}
+    for (name, labels), _ in after.items():
+        label_dict = dict(labels)
+        if name == 'http_request_duration_seconds_count':
+            count = delta(name, labels)
+            if count <= 0:
+                continue
+            total = delta('http_request_duration_seconds_sum', labels)
+            route = routes.setdefault(label_dict['route'], {'requests': 0, 'mean_ms': 0.0, 'stages_ms': {}})
+            route['mean_ms'] = (route['mean_ms'] * route['requests'] + total * 1000) / (route['requests'] + count)
+            route['requests'] += int(count)
+        elif name == 'request_stage_duration_seconds_sum':
+            seconds = delta(name, labels)
+            if seconds > 0:
+                route = routes.setdefault(label_dict['route'], {'requests': 0, 'mean_ms': 0.0, 'stages_ms': {}})
+                route['stages_ms'][label_dict['stage']] = seconds * 1000
+
+    for route in routes.values():
+        # Stage time per request, comparable with mean_ms
+        route['stages_ms'] = {stage: total / max(route['requests'], 1) for stage, total in route['stages_ms'].items()}
+    return routes
+
+
+def scrape_metrics(url):
+    client = Client(url)
+    status, payload = client.request('GET', '/metrics')
+    client.close()
+    return payload.decode() if status == 200 else ''
+
+
+def _free_port(host):
+    with socket.socket() as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def start_server(host=DEFAULT_HOST, port=DEFAULT_PORT, env=None, log_path=None):
+    """Start app.py's server in a child process and wait until it answers"""
+    log = open(log_path, 'w') if log_path else subprocess.DEVNULL
+    process = subprocess.Popen([sys.executable, '-c', SERVER_SCRIPT, host, str(port)],
+                               env={**os.environ, **(env or {})}, stdout=log, stderr=subprocess.STDOUT)
+    url = f'http://{host}:{port}'
+    deadline = time.time() + SERVER_START_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}"
+                               + (f"; see {log_path}" if log_path else ''))
+        client = Client(url)
+        status, _ = client.request('GET', '/metrics')
+        client.close()
+        if status == 200:
+            return process, url
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"Server did not start within {SERVER_START_TIMEOUT}s")
+
+
+def sample_students(url, n=SAMPLE_STUDENTS):
+    """Student records to build requests from"""
+    client = Client(url)
+    status, payload = client.request('GET', f'/api/students?per_page={n}')
+    client.close()
+    if status != 200:
+        raise RuntimeError(f"Could not list students from {url} (status {status})")
+    students = json.loads(payload)['students']
+    if not students:
+        raise RuntimeError("The server has no students to replay requests for")
+    return students
+
+
+def run_load(url, mix, duration, concurrency=None, rate=None, seed=0):
+    """Drive the mix for duration seconds; returns the list of request records
+
+    Each record is (start offset in seconds, request type, latency in
+    seconds, status). With rate set, concurrency is the size of the client
+    pool that serves the schedule.
+    """
+    names, probabilities, builders = mix
+    records = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    stop_at = start + duration
+    schedule = None
+    if rate:
+        interval = 1.0 / rate
+        schedule = iter(range(int(duration * rate)))
+        concurrency = concurrency or max(1, int(rate))
+
+    def worker(index):
+        rnd = random.Random(seed * 1000 + index)
+        client = Client(url)
+        local = []
+        while True:
+            if schedule is not None:
+                with lock:
+                    slot = next(schedule, None)
+                if slot is None:
+                    break
+                scheduled = start + slot * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                scheduled = time.perf_counter()
+                if scheduled >= stop_at:
+                    break
+
+            name = rnd.choices(names, probabilities)[0]
+            status, _ = client.request(*builders[name](rnd))
+            local.append((scheduled - start, name, time.perf_counter() - scheduled, status))
+        client.close()
+        with lock:
+            records.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(records)
+
+
+def summarize(records, duration, interval=DEFAULT_INTERVAL):
+    """Overall, per-request-type and per-interval latency percentiles and error rates"""
+    def stats(rows, seconds):
+        if not rows:
+            return {'requests': 0}
+        latencies = np.array([row[2] for row in rows]) * 1000
+        errors = sum(1 for row in rows if row[3] == 0 or row[3] >= 500)
+        return {
+            'requests': len(rows),
+            'throughput_rps': len(rows) / seconds if seconds else None,
+            'errors': errors,
+            'error_rate': errors / len(rows),
+            'client_errors': sum(1 for row in rows if 400 <= row[3] < 500),
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'max_ms': float(latencies.max()),
+        }
+
+    by_type = {}
+    for row in records:
+        by_type.setdefault(row[1], []).append(row)
+    timeline = []
+    for window_start in np.arange(0, duration, interval):
+        rows = [row for row in records if window_start <= row[0] < window_start + interval]
+        timeline.append({'start_s': float(window_start), **stats(rows, min(interval, duration - window_start))})
+    return {
+        'overall': stats(records, duration),
+        'routes': {name: stats(rows, duration) for name, rows in sorted(by_type.items())},
+        'timeline': timeline,
+    }
+
+
+def _print_summary(summary):
+    overall = summary['overall']
+    if not overall['requests']:
+        print("⚠️  No requests completed")
+        return
+    print(f"   {'request':<20} {'count':>7} {'err%':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, s in list(summary['routes'].items()) + [('ALL', overall)]:
+        print(f"   {name:<20} {s['requests']:>7} {s['error_rate']:>6.1%} "
+              f"{s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f}")
+    print(f"   throughput {overall['throughput_rps']:.1f} req/s")
+    print("   timeline:")
+    for window in summary['timeline']:
+        if window['requests']:
+            print(f"   {window['start_s']:>6.0f}s {window['throughput_rps']:>8.1f} req/s  "
+                  f"p50 {window['p50_ms']:>8.1f}  p99 {window['p99_ms']:>8.1f}  errors {window['error_rate']:.1%}")
+
+
+def run_ramp(url, mix, step_seconds, max_concurrency, interval, seed=0):
+    """Double the concurrency each step until throughput stops growing"""
+    steps, best = [], None
+    concurrency = 1
+    while concurrency <= max_concurrency:
+        records = run_load(url, mix, step_seconds, concurrency=concurrency, seed=seed + concurrency)
+        summary = summarize(records, step_seconds, interval)
+        overall = summary['overall']
+        steps.append({'concurrency': concurrency, **summary})
+        print(f"   {concurrency:>4} clients: {overall.get('throughput_rps', 0):8.1f} req/s  "
+              f"p50 {overall.get('p50_ms', 0):8.1f}ms  p99 {overall.get('p99_ms', 0):8.1f}ms  "
+              f"errors {overall.get('error_rate', 0):.1%}")
+        throughput = overall.get('throughput_rps') or 0
+        if best is not None and throughput < best['throughput_rps'] * (1 + SATURATION_GAIN):
+            break
+        if best is None or throughput > best['throughput_rps']:
+            best = {'concurrency': concurrency, 'throughput_rps': throughput, 'p99_ms': overall.get('p99_ms')}
+        concurrency *= 2
+    return {'steps': steps, 'saturation': best}
+
+
+def parse_mix(spec):
+    """'students=5,student_detail=3' -> weights dict"""
+    weights = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a weighted request mix against the API under load')
+    parser.add_argument('--url', help='Target a running server instead of starting one locally')
+    parser.add_argument('--port', type=int, default=None, help='Port for the local server (default: a free one)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients (closed loop)')
+    parser.add_argument('--rate', type=float, help='Target requests per second (open loop)')
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help='Seconds of load')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='Timeline window in seconds')
+    parser.add_argument('--ramp', action='store_true', help='Step the concurrency up to find saturation')
+    parser.add_argument('--max-concurrency', type=int, default=64)
+    parser.add_argument('--step-seconds', type=float, default=15)
+    parser.add_argument('--mix', help='Request weights, e.g. students=5,student_detail=3 (default: built-in mix)')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds of unrecorded load first')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Results JSON path (default: benchmarks/loadtest-<time>.json)')
+    args = parser.parse_args(argv)
+
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    output = args.output or os.path.join(BENCHMARK_DIR, f'loadtest-{stamp}.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+
+    server = None
+    url = args.url
+    if url is None:
+        port = args.port or _free_port(DEFAULT_HOST)
+        log_path = os.path.splitext(output)[0] + '-server.log'
+        print(f"🚀 Starting the API on port {port} (log: {log_path})...")
+        server, url = start_server(DEFAULT_HOST, port, log_path=log_path)
+
+    try:
+        mix = traffic_mix(sample_students(url), parse_mix(args.mix) if args.mix else None)
+        if args.warmup > 0:
+            print(f"🔥 Warming up for {args.warmup:.0f}s...")
+            run_load(url, mix, args.warmup, concurrency=args.concurrency, seed=args.seed + 999)
+
+        metrics_before = scrape_metrics(url)
+        results = {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'url': url,
+            'mix': dict(zip(mix[0], mix[1])),
+        }
+        if args.ramp:
+            print(f"📈 Ramping concurrency up to {args.max_concurrency} ({args.step_seconds:.0f}s per step)...")
+            results['ramp'] = run_ramp(url, mix, args.step_seconds, args.max_concurrency, args.interval, args.seed)
+            saturation = results['ramp']['saturation']
+            if saturation:
+                print(f"🎯 Saturation: {saturation['throughput_rps']:.1f} req/s "
+                      f"at {saturation['concurrency']} clients")
+        else:
+            mode = f"{args.rate:g} req/s" if args.rate else f"{args.concurrency} clients"
+            print(f"⚡ {mode} for {args.duration:.0f}s...")
+            records = run_load(url, mix, args.duration, concurrency=None if args.rate else args.concurrency,
+                               rate=args.rate, seed=args.seed)
+            results.update({'concurrency': args.concurrency, 'rate': args.rate, 'duration': args.duration})
+            results.update(summarize(records, args.duration, args.interval))
+            _print_summary(results)
+        metrics_after = scrape_metrics(url)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if metrics_after:
+        results['server'] = server_side_summary(parse_metrics(metrics_before), parse_metrics(metrics_after))
+        metrics_path = os.path.splitext(output)[0] + '-metrics.txt'
+        with open(metrics_path, 'w') as f:
+            f.write(metrics_after)
+        print(f"📡 Server /metrics saved to {metrics_path}")
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
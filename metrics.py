@@ -0,0 +1,246 @@
+"""
+In-process metrics for the Student Engagement Prediction API.
+
+A small Prometheus-compatible registry (no client library needed):
+
+* per-route request latency histograms, request and error counters
+* per-stage timings (load, preprocess, predict, explain, serialize) via
+  ``with metrics.stage('predict'):`` or the ``@metrics.timed('load')``
+  decorator, labelled with the route they ran under
+* cache hit/miss counters via ``metrics.record_cache('student_frame', hit)``
+
+instrument_app() adds the request hooks and serves everything as
+Prometheus text on /metrics. Recording an observation is a bisect and a
+short locked update, so the hot path stays cheap.
+"""
+
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGES = ('load', 'preprocess', 'predict', 'explain', 'serialize')
+
+# Route label for stages that run outside a request (CLI tools, background threads)
+OFFLINE_ROUTE = 'offline'
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ''
+    pairs = []
+    for name, value in zip(labelnames, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with fixed label names"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram with fixed label names"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket counts (last one is +Inf), sum, count
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, *labels):
+        """(cumulative bucket counts, sum, count) for one label set"""
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                return [0] * (len(self.buckets) + 1), 0.0, 0
+            counts, total, count = list(state[0]), state[1], state[2]
+        cumulative, running = [], 0
+        for n in counts:
+            running += n
+            cumulative.append(running)
+        return cumulative, total, count
+
+    def samples(self):
+        with self._lock:
+            keys = sorted(self._values)
+        for labels in keys:
+            cumulative, total, count = self.snapshot(*labels)
+            for bound, n in zip(self.buckets + (float('inf'),), cumulative):
+                yield (f'{self.name}_bucket',
+                       _format_labels(self.labelnames + ('le',), labels + (_format_value(bound),)), n)
+            yield f'{self.name}_sum', _format_labels(self.labelnames, labels), total
+            yield f'{self.name}_count', _format_labels(self.labelnames, labels), count
+
+
+class Registry:
+    """Named metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_latency = registry.register(Histogram(
+    'http_request_duration_seconds', 'Request latency by route and method', ('route', 'method')))
+requests_total = registry.register(Counter(
+    'http_requests_total', 'Requests by route, method and status code', ('route', 'method', 'status')))
+request_errors = registry.register(Counter(
+    'http_request_errors_total', 'Requests that ended in a 5xx response or an unhandled exception', ('route',)))
+stage_latency = registry.register(Histogram(
+    'request_stage_duration_seconds', 'Time spent per processing stage within a route', ('route', 'stage')))
+cache_requests = registry.register(Counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit or miss)', ('cache', 'result')))
+
+_local = threading.local()
+
+
+def current_route():
+    """Route label of the request being handled, or OFFLINE_ROUTE"""
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return OFFLINE_ROUTE
+
+
+@contextmanager
+def stage(name):
+    """Time a block as one processing stage of the current route
+
+    A stage nested in a stage of the same name (a store method calling
+    another) is only counted once.
+    """
+    active = getattr(_local, 'stages', None)
+    if active is None:
+        active = _local.stages = set()
+    if name in active:
+        yield
+        return
+
+    active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        active.discard(name)
+        stage_latency.observe(time.perf_counter() - start, current_route(), name)
+
+
+def timed(name):
+    """Decorator form of stage()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_cache(cache, hit, count=1):
+    cache_requests.inc(cache, 'hit' if hit else 'miss', amount=count)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that times jsonify() as the serialize stage"""
+
+    def response(self, *args, **kwargs):
+        with stage('serialize'):
+            return super().response(*args, **kwargs)
+
+
+def instrument_app(app, path='/metrics'):
+    """Record per-route latency, status and error metrics and serve them on path"""
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            route = current_route()
+            request_latency.observe(time.perf_counter() - start, route, request.method)
+            requests_total.inc(route, request.method, str(response.status_code))
+            if response.status_code >= 500:
+                request_errors.inc(route)
+        return response
+
+    @app.teardown_request
+    def record_unhandled(exc):
+        # after_request doesn't run when the view raised
+        start = g.pop('metrics_start', None)
+        if exc is not None and start is not None:
+            route = current_route()
+            request_latency.observe(time.perf_counter() - start, route, request.method)
+            requests_total.inc(route, request.method, '500')
+            request_errors.inc(route)
+
+    @app.route(path)
+    def prometheus_metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
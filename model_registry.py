@@ -0,0 +1,375 @@
+"""
+Versioned model bundles with background reload and an atomic swap.
+
+A bundle is everything app.py needs to serve one trained model: the model,
+the distilled fast model, the feature pipeline, the scaler, the label
+encoders and the SHAP explainer. Its version is the content hash of the
+model file (the same model_version that reports and score states carry).
+
+train_model.py writes models/bundle.json after every other file of a new
+bundle, so a bundle is complete when the manifest exists and every file it
+lists still has the recorded hash. ModelRegistry polls for that and:
+
+* loads the new bundle in a background thread, warms it up, then replaces
+  `registry.current` in one assignment; requests that already picked up the
+  old bundle finish on it
+* copies every bundle it serves to models/versions/<version>/ (the last few),
+  which is what rollback() restores from
+* calls on_swap() listeners so caches keyed by model version can drop entries
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import joblib
+import pandas as pd
+
+import model_report
+from features import FeaturePipeline, PIPELINE_PATH
+
+MANIFEST_NAME = 'bundle.json'
+VERSIONS_DIR = 'versions'
+MODEL_FILE = 'student_engagement_model.pkl'
+FAST_MODEL_FILE = 'student_engagement_model_fast.pkl'
+EXPLAINER_FILE = 'shap_explainer.pkl'
+# Files whose hashes define a complete bundle
+BUNDLE_FILES = (MODEL_FILE, FAST_MODEL_FILE, 'feature_columns.pkl', 'scaler.pkl', 'label_encoders.pkl',
+                os.path.basename(PIPELINE_PATH), EXPLAINER_FILE)
+# Also archived with a bundle, but rewritten freely while it is served
+EXTRA_FILES = ('training_history.pkl', os.path.basename(model_report.REPORT_PATH))
+
+# Manifest entries that describe where a model came from, not its files
+LINEAGE_KEYS = ('incremental_update', 'lineage')
+
+DEFAULT_KEEP = 5
+# Bundles without a manifest (saved before it existed) are trusted once the
+# model file hasn't changed for this long
+SETTLE_SECONDS = 10
+
+
+def _write_json(path, payload):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def write_bundle_manifest(model_dir='models', inherit_from=None, **extra):
+    """Record the current files of model_dir as one complete bundle; call after writing them all
+
+    The lineage of an incremental update is carried over from the manifest in
+    inherit_from (default: model_dir) while the model itself is unchanged.
+    """
+    files = {name: model_report.file_version(os.path.join(model_dir, name))
+             for name in BUNDLE_FILES if os.path.exists(os.path.join(model_dir, name))}
+    manifest = {
+        'version': files.get(MODEL_FILE),
+        'saved_at': datetime.now().isoformat(timespec='seconds'),
+        'files': files,
+    }
+    previous = read_bundle_manifest(inherit_from or model_dir)
+    if previous and previous.get('version') == manifest['version']:
+        manifest.update({key: previous[key] for key in LINEAGE_KEYS if key in previous})
+    manifest.update(extra)
+    _write_json(os.path.join(model_dir, MANIFEST_NAME), manifest)
+    return manifest
+
+
+def read_bundle_manifest(model_dir):
+    try:
+        with open(os.path.join(model_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def complete_version(model_dir):
+    """Version of the complete bundle in model_dir, or None while one is being written"""
+    manifest = read_bundle_manifest(model_dir)
+    if manifest is None:
+        path = os.path.join(model_dir, MODEL_FILE)
+        if not os.path.exists(path) or time.time() - os.path.getmtime(path) < SETTLE_SECONDS:
+            return None
+        return model_report.file_version(path)
+
+    for name, version in manifest.get('files', {}).items():
+        if model_report.file_version(os.path.join(model_dir, name)) != version:
+            return None
+    return manifest.get('version')
+
+
+class ModelBundle:
+    """One loaded model version and the preprocessing objects trained with it"""
+
+    def __init__(self, version, model, feature_columns, scaler, label_encoders, feature_pipeline,
+                 fast_model=None, explainer=None, source=None):
+        self.version = version
+        self.model = model
+        self.fast_model = fast_model
+        self.feature_columns = feature_columns
+        self.scaler = scaler
+        self.label_encoders = label_encoders
+        self.feature_pipeline = feature_pipeline
+        self.explainer = explainer
+        self.source = source
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+
+    @classmethod
+    def load(cls, model_dir='models', data_path='data/processed_data.csv'):
+        """Load a bundle directory, rebuilding what older bundles didn't save"""
+        model_path = os.path.join(model_dir, MODEL_FILE)
+        model = joblib.load(model_path)
+        feature_columns = joblib.load(os.path.join(model_dir, 'feature_columns.pkl'))
+        scaler = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
+        label_encoders = joblib.load(os.path.join(model_dir, 'label_encoders.pkl'))
+
+        fast_model = None
+        if os.path.exists(os.path.join(model_dir, FAST_MODEL_FILE)):
+            fast_model = joblib.load(os.path.join(model_dir, FAST_MODEL_FILE))
+            print("✅ Distilled fast model loaded for interactive endpoints")
+
+        try:
+            feature_pipeline = joblib.load(os.path.join(model_dir, os.path.basename(PIPELINE_PATH)))
+            print("✅ Feature pipeline loaded successfully")
+        except Exception as e:
+            # Bundles trained before the feature pipeline existed: rebuild it
+            # from the saved encoders and the processed training data
+            print(f"⚠️  Feature pipeline loading failed: {e}")
+            feature_pipeline = FeaturePipeline.from_artifacts(
+                pd.read_csv(data_path), label_encoders, feature_columns, scaler)
+            print("✅ Feature pipeline rebuilt from saved encoders")
+
+        try:
+            explainer = joblib.load(os.path.join(model_dir, EXPLAINER_FILE))
+            print("✅ SHAP explainer loaded successfully")
+        except Exception as e:
+            print(f"⚠️  SHAP explainer loading failed: {e}")
+            try:
+                import shap
+                explainer = shap.TreeExplainer(model)
+                print("✅ New SHAP explainer created")
+            except Exception as e:
+                print(f"⚠️  Could not create SHAP explainer: {e}")
+                explainer = None
+
+        return cls(model_report.file_version(model_path), model, feature_columns, scaler, label_encoders,
+                   feature_pipeline, fast_model=fast_model, explainer=explainer, source=model_dir)
+
+    def interactive_model(self, prefer_fast=True):
+        """The distilled fast model when there is one (and it's preferred), else the full model"""
+        if self.fast_model is not None and prefer_fast:
+            return self.fast_model
+        return self.model
+
+    def describe(self):
+        return {
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'model_type': type(self.model).__name__,
+            'fast_model': self.fast_model is not None,
+            'explainer': self.explainer is not None,
+            'feature_count': len(self.feature_columns),
+        }
+
+
+class ModelRegistry:
+    """The bundle being served, and the machinery to replace it without a restart"""
+
+    def __init__(self, model_dir='models', keep=DEFAULT_KEEP, data_path='data/processed_data.csv'):
+        self.model_dir = model_dir
+        self.archive_dir = os.path.join(model_dir, VERSIONS_DIR)
+        self.keep = keep
+        self.data_path = data_path
+        self.current = None
+        self.previous = None
+        self.warm = None
+        self.last_error = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._watch_interval = 0
+
+    def on_swap(self, callback):
+        """Call callback(new_bundle, old_bundle) after every swap"""
+        self._listeners.append(callback)
+        return callback
+
+    @property
+    def version(self):
+        return self.current.version if self.current is not None else None
+
+    def load(self):
+        """Load the bundle in model_dir now (startup); returns it"""
+        with self._lock:
+            bundle = ModelBundle.load(self.model_dir, self.data_path)
+            self._swap(bundle)
+        self._archive_quietly(bundle.version)
+        return bundle
+
+    def _swap(self, bundle):
+        old, self.current = self.current, bundle
+        if old is not None and old.version != bundle.version:
+            # Kept in memory so a rollback to it is instant
+            self.previous = old
+        for callback in self._listeners:
+            try:
+                callback(bundle, old)
+            except Exception as e:
+                print(f"⚠️  Model swap listener failed: {e}")
+        if old is not None and old.version != bundle.version:
+            print(f"🔁 Serving model {bundle.version} (was {old.version})")
+
+    def check(self):
+        """Load and swap in a new complete bundle from model_dir, if there is one"""
+        version = complete_version(self.model_dir)
+        if version is None or version == self.version:
+            return False
+        with self._lock:
+            if version == self.version:
+                return False
+            print(f"📦 New model bundle {version} found; loading in the background...")
+            bundle = ModelBundle.load(self.model_dir, self.data_path)
+            if bundle.version != version or complete_version(self.model_dir) != version:
+                # Overwritten while we were reading it; the next poll picks up the newer one
+                return False
+            if self.warm is not None:
+                self.warm(bundle)
+            self._swap(bundle)
+        self.last_error = None
+        self._archive_quietly(version)
+        return True
+
+    @property
+    def watching(self):
+        return self._watcher is not None
+
+    def start_watcher(self, interval):
+        """Poll model_dir every interval seconds in a daemon thread"""
+        self._watch_interval = interval
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.check()
+                except Exception as e:
+                    self.last_error = str(e)
+                    print(f"⚠️  Model reload failed: {e}")
+
+        self._watcher = threading.Thread(target=run, name='model-watcher', daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def after_fork(self):
+        """Threads and held locks don't survive fork: start over in the child"""
+        self._lock = threading.Lock()
+        self._watcher = None
+        if self._watch_interval > 0:
+            self.start_watcher(self._watch_interval)
+
+    def archive(self, version):
+        """Copy the complete bundle in model_dir to versions/<version>/ and prune old copies"""
+        target = os.path.join(self.archive_dir, version)
+        if os.path.exists(os.path.join(target, MANIFEST_NAME)):
+            return target
+
+        tmp_dir = f'{target}.{os.getpid()}.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name in BUNDLE_FILES + EXTRA_FILES:
+            path = os.path.join(self.model_dir, name)
+            if os.path.exists(path):
+                shutil.copy2(path, os.path.join(tmp_dir, name))
+        manifest = write_bundle_manifest(tmp_dir, inherit_from=self.model_dir, archived_at=datetime.now().isoformat(timespec='seconds'))
+        if manifest['version'] != version:
+            # model_dir moved on while copying
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return None
+        os.replace(tmp_dir, target)
+
+        for old in self.archived_versions()[self.keep:]:
+            if old['version'] not in (self.version, getattr(self.previous, 'version', None)):
+                shutil.rmtree(os.path.join(self.archive_dir, old['version']), ignore_errors=True)
+        return target
+
+    def _archive_quietly(self, version):
+        try:
+            self.archive(version)
+        except OSError as e:
+            print(f"⚠️  Could not archive model bundle {version}: {e}")
+
+    def archived_versions(self):
+        """Archived bundles, most recently archived first"""
+        if not os.path.isdir(self.archive_dir):
+            return []
+        versions = []
+        for entry in os.scandir(self.archive_dir):
+            manifest = read_bundle_manifest(entry.path) if entry.is_dir() else None
+            if manifest and manifest.get('version') == entry.name:
+                versions.append({'version': entry.name, 'saved_at': manifest.get('saved_at'),
+                                 'archived_at': manifest.get('archived_at')})
+        return sorted(versions, key=lambda v: v['archived_at'] or '', reverse=True)
+
+    def rollback(self, version=None):
+        """Serve an archived bundle again and restore it into model_dir
+
+        version defaults to the bundle served before the current one. The
+        files are restored too, so other workers (which poll model_dir) and
+        restarts follow.
+        """
+        if version is None:
+            if self.previous is not None:
+                version = self.previous.version
+            else:
+                older = [v['version'] for v in self.archived_versions() if v['version'] != self.version]
+                if not older:
+                    raise ValueError("No earlier model version to roll back to")
+                version = older[0]
+
+        source = os.path.join(self.archive_dir, version)
+        if complete_version(source) != version:
+            raise ValueError(f"Model version {version} is not archived")
+
+        with self._lock:
+            if self.previous is not None and self.previous.version == version:
+                bundle = self.previous
+            else:
+                bundle = ModelBundle.load(source, self.data_path)
+                if self.warm is not None:
+                    self.warm(bundle)
+            self._restore(source)
+            self._swap(bundle)
+        return bundle
+
+    def _restore(self, source):
+        for name in BUNDLE_FILES + EXTRA_FILES:
+            path = os.path.join(self.model_dir, name)
+            if os.path.exists(os.path.join(source, name)):
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                shutil.copy2(os.path.join(source, name), tmp_path)
+                os.replace(tmp_path, path)
+            elif name in BUNDLE_FILES and os.path.exists(path):
+                # e.g. a fast model the restored version was trained without
+                os.remove(path)
+        write_bundle_manifest(self.model_dir, inherit_from=source, rolled_back_at=datetime.now().isoformat(timespec='seconds'))
+
+    def status(self):
+        return {
+            'current': self.current.describe() if self.current is not None else None,
+            'previous': self.previous.describe() if self.previous is not None else None,
+            'on_disk': complete_version(self.model_dir),
+            'archived': self.archived_versions(),
+            'watch_interval': self._watch_interval,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,144 @@
+"""
+Model performance report shared by train_model.py and app.py.
+
+The report is computed once when a model is saved and written to
+models/model_performance.json. /api/model_performance serves it directly and
+only recomputes the full-data section (in the background) when the processed
+data changes.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, roc_auc_score
+
+REPORT_PATH = 'models/model_performance.json'
+
+_version_cache = {}
+
+
+def file_version(path):
+    """Short content hash of a file, memoized on its size and mtime"""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _version_cache:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        _version_cache[key] = digest.hexdigest()[:16]
+    return _version_cache[key]
+
+
+def to_json_safe(value):
+    """Convert numpy containers and scalars to plain Python for json.dump"""
+    if isinstance(value, dict):
+        return {str(k): to_json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_safe(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return to_json_safe(value.tolist())
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return value
+
+
+def classification_metrics(y_true, y_pred, y_proba=None, class_names=None):
+    """Accuracy, classification report, confusion matrix and per-class stats"""
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    labels = np.unique(np.concatenate([y_true, y_pred]))
+
+    report = classification_report(y_true, y_pred, output_dict=True, zero_division=0)
+    conf_matrix = confusion_matrix(y_true, y_pred, labels=labels)
+
+    per_class = []
+    for i, label in enumerate(labels):
+        stats = report.get(str(label), {})
+        per_class.append({
+            'label': int(label),
+            'name': class_names[int(label)] if class_names is not None and int(label) < len(class_names) else str(label),
+            'precision': stats.get('precision', 0.0),
+            'recall': stats.get('recall', 0.0),
+            'f1_score': stats.get('f1-score', 0.0),
+            'support': int(stats.get('support', 0)),
+            'predicted': int(conf_matrix[:, i].sum())
+        })
+
+    metrics = {
+        'samples': int(len(y_true)),
+        'accuracy': accuracy_score(y_true, y_pred) * 100,
+        'classification_report': report,
+        'confusion_matrix': conf_matrix,
+        'per_class': per_class
+    }
+
+    if y_proba is not None:
+        try:
+            y_proba = np.asarray(y_proba)
+            if y_proba.shape[1] == 2:
+                metrics['roc_auc'] = roc_auc_score(y_true, y_proba[:, 1])
+            else:
+                metrics['roc_auc'] = roc_auc_score(y_true, y_proba, multi_class='ovr')
+        except ValueError:
+            metrics['roc_auc'] = None
+
+    return to_json_safe(metrics)
+
+
+def feature_importance(model, feature_columns):
+    """(feature, importance) pairs sorted from most to least important"""
+    if not hasattr(model, 'feature_importances_'):
+        return []
+    pairs = sorted(zip(feature_columns, model.feature_importances_), key=lambda x: x[1], reverse=True)
+    return to_json_safe(pairs)
+
+
+def evaluate(model, X, y, class_names=None):
+    """Score a model on a prepared (scaled) matrix and compute its metrics"""
+    predictions = model.predict(X)
+    probabilities = model.predict_proba(X) if hasattr(model, 'predict_proba') else None
+    return classification_metrics(y, predictions, probabilities, class_names)
+
+
+def build_report(model, feature_columns, held_out, full_data, model_version=None,
+                 data_version=None, class_names=None):
+    """Assemble the persisted performance report
+
+    held_out and full_data are (X_scaled, y) pairs; full_data may be None.
+    """
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'model_type': type(model).__name__,
+        'model_version': model_version,
+        'data_version': data_version,
+        'class_names': to_json_safe(list(class_names)) if class_names is not None else None,
+        'held_out': evaluate(model, *held_out, class_names=class_names),
+        'full_data': evaluate(model, *full_data, class_names=class_names) if full_data is not None else None,
+        'feature_importance': feature_importance(model, feature_columns)
+    }
+
+
+def save_report(report, path=REPORT_PATH):
+    """Write the report atomically so readers never see a partial file"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(to_json_safe(report), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_report(path=REPORT_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,125 @@
+"""
+LRU cache of model probabilities, keyed by the preprocessed feature vector.
+
+The key is a hash of one row of the feature matrix (after imputation,
+encoding, feature engineering and scaling) plus the model version and which
+of the bundle's models scored it, so two requests that reach the same model
+input share one result however their raw payloads differ. /api/predict,
+/api/simulate and upload batch scoring share the cache, and a batch only
+sends its missing rows to the model. Batches only read it (store=False):
+one large file would otherwise evict every interactive entry.
+
+Entries of an old model version can never be returned, and the app clears
+the cache on every model swap so they don't take up room either.
+"""
+
+import collections
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+import metrics
+
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def row_key(row, version, model_name):
+    digest = hashlib.blake2b(np.ascontiguousarray(row, dtype=np.float64).tobytes(), digest_size=16)
+    return version, model_name, digest.digest()
+
+
+class PredictionCache:
+    """Bounded, thread-safe LRU of probability rows"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, name='prediction'):
+        self.max_entries = max_entries
+        self.name = name
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def predict_proba(self, model, X, version, model_name, store=True):
+        """model.predict_proba(X), answering cached rows without calling the model
+
+        With store=False the rows the model had to score aren't added.
+        """
+        if not self.enabled or version is None:
+            return model.predict_proba(X)
+
+        keys = [row_key(row, version, model_name) for row in X]
+        cached = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                probabilities = self._entries.get(key)
+                if probabilities is not None:
+                    self._entries.move_to_end(key)
+                    cached[i] = probabilities
+        missing = [i for i, probabilities in enumerate(cached) if probabilities is None]
+        self._count(len(keys) - len(missing), len(missing))
+
+        if not missing:
+            return np.vstack(cached)
+        if not store and len(missing) == len(keys):
+            return model.predict_proba(X)
+        if len(missing) == len(keys):
+            result = model.predict_proba(X)
+        else:
+            computed = model.predict_proba(X[missing])
+            result = np.empty((len(keys), computed.shape[1]), dtype=computed.dtype)
+            result[missing] = computed
+            for i, probabilities in enumerate(cached):
+                if probabilities is not None:
+                    result[i] = probabilities
+
+        if not store:
+            return result
+        with self._lock:
+            for i in missing:
+                # Copies, so callers can't change a cached row through the result
+                self._entries[keys[i]] = result[i].copy()
+                self._entries.move_to_end(keys[i])
+            overflow = len(self._entries) - self.max_entries
+            for _ in range(max(overflow, 0)):
+                self._entries.popitem(last=False)
+            self.evictions += max(overflow, 0)
+        return result
+
+    def _count(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+        metrics.record_cache(self.name, True, count=hits)
+        metrics.record_cache(self.name, False, count=misses)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def after_fork(self):
+        """A lock held by another thread at fork stays locked in the child: replace it"""
+        self._lock = threading.Lock()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'pid': os.getpid(),
+            }
@@ -0,0 +1,247 @@
+"""
+On-demand profiling for the Student Engagement Prediction API.
+
+Everything here is opt-in; with the default configuration instrument_app()
+registers nothing, so disabled profiling costs nothing per request.
+
+* Per-request profiling: a request carrying ``X-Profile: <PROFILE_TOKEN>``
+  (or any request to an endpoint listed in PROFILE_ROUTES) runs under
+  cProfile, or under a stack sampler with ``X-Profile-Mode: sampling``. The
+  profile is saved in PROFILE_DIR and named in the ``X-Profile-Id`` response
+  header; fetch it from /admin/profiles/<id> with the same header.
+* Rolling profiler: with PROFILE_SAMPLER_INTERVAL > 0 a background thread
+  samples every thread's stack at that interval and writes the aggregated
+  stacks for each PROFILE_SAMPLER_WINDOW seconds as a folded-stacks file
+  (flamegraph.pl / speedscope input).
+"""
+
+import collections
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+
+from flask import Response, abort, g, jsonify, request
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_MODE_HEADER = 'X-Profile-Mode'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+PROFILE_MODES = ('cprofile', 'sampling')
+
+REQUEST_SAMPLE_INTERVAL = 0.001
+DEFAULT_KEEP = 50
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """Periodically sample Python stacks and count identical ones
+
+    thread_id restricts sampling to one thread (a single request);
+    otherwise every thread but the sampler's own is sampled.
+    """
+
+    def __init__(self, interval=REQUEST_SAMPLE_INTERVAL, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.counts = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        own = threading.get_ident()
+        frames = sys._current_frames()
+        stacks = []
+        for thread_id, frame in frames.items():
+            if thread_id == own or (self.thread_id is not None and thread_id != self.thread_id):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stacks.append(';'.join(reversed(stack)))
+        with self._lock:
+            self.counts.update(stacks)
+            self.samples += 1
+
+    def take(self):
+        """Return the folded stacks collected so far and start a new window"""
+        with self._lock:
+            counts, self.counts = self.counts, collections.Counter()
+            self.samples = 0
+        return '\n'.join(f'{stack} {n}' for stack, n in counts.most_common()) + '\n'
+
+
+class RollingProfiler(StackSampler):
+    """Low-frequency whole-process sampler that dumps one file per window"""
+
+    def __init__(self, profile_dir, interval=0.1, window=60, keep=DEFAULT_KEEP):
+        super().__init__(interval)
+        self.profile_dir = profile_dir
+        self.window = window
+        self.keep = keep
+
+    def _run(self):
+        window_start = time.time()
+        while not self._stop.wait(self.interval):
+            self.sample()
+            if time.time() - window_start >= self.window:
+                self.dump()
+                window_start = time.time()
+
+    def dump(self):
+        folded = self.take()
+        name = f"rolling-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+        _write_profile(self.profile_dir, name, folded.encode(), self.keep)
+        return name
+
+
+def _write_profile(profile_dir, name, payload, keep=DEFAULT_KEEP):
+    """Write a profile atomically and drop the oldest beyond keep"""
+    os.makedirs(profile_dir, exist_ok=True)
+    path = os.path.join(profile_dir, name)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+    profiles = sorted((entry for entry in os.scandir(profile_dir) if not entry.name.endswith('.tmp')),
+                      key=lambda entry: entry.stat().st_mtime)
+    for entry in profiles[:max(0, len(profiles) - keep)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+    return path
+
+
+def _marshal_stats(profiler):
+    """cProfile results in the pstats file format (loadable by snakeviz, pstats)"""
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+
+def profile_text(path, limit=40):
+    """Readable report for a saved profile: pstats by cumulative time, or folded stacks"""
+    if path.endswith('.prof'):
+        stream = io.StringIO()
+        pstats.Stats(path, stream=stream).sort_stats('cumulative').print_stats(limit)
+        return stream.getvalue()
+    with open(path) as f:
+        return f.read()
+
+
+def instrument_app(app):
+    """Register the profiling hooks the app's configuration enables, and nothing else"""
+    token = app.config.get('PROFILE_TOKEN') or ''
+    routes = set(app.config.get('PROFILE_ROUTES') or ())
+    profile_dir = app.config.get('PROFILE_DIR', 'profiles')
+    keep = app.config.get('PROFILE_KEEP', DEFAULT_KEEP)
+
+    interval = float(app.config.get('PROFILE_SAMPLER_INTERVAL') or 0)
+    if interval > 0:
+        window = float(app.config.get('PROFILE_SAMPLER_WINDOW', 60))
+
+        def start_rolling_profiler():
+            app.extensions['rolling_profiler'] = RollingProfiler(profile_dir, interval, window, keep).start()
+
+        start_rolling_profiler()
+        # Threads don't survive fork; pre-forked workers each start their own
+        os.register_at_fork(after_in_child=start_rolling_profiler)
+
+    if not token and not routes:
+        return app
+
+    def authorized():
+        supplied = request.headers.get(PROFILE_HEADER, '')
+        return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+    @app.before_request
+    def start_request_profile():
+        if request.endpoint in ('list_profiles', 'get_profile'):
+            return
+        if request.endpoint not in routes and not authorized():
+            return
+        mode = request.headers.get(PROFILE_MODE_HEADER, app.config.get('PROFILE_MODE', 'cprofile')).lower()
+        if mode not in PROFILE_MODES:
+            mode = 'cprofile'
+        if mode == 'sampling':
+            g.request_profiler = StackSampler(thread_id=threading.get_ident()).start()
+        else:
+            g.request_profiler = cProfile.Profile()
+            g.request_profiler.enable()
+
+    @app.after_request
+    def finish_request_profile(response):
+        profiler = g.pop('request_profiler', None)
+        if profiler is None:
+            return response
+
+        profile_id = f"{request.endpoint or 'unmatched'}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        if isinstance(profiler, StackSampler):
+            profiler.stop()
+            name = f'{profile_id}.folded'
+            payload = profiler.take().encode()
+        else:
+            profiler.disable()
+            name = f'{profile_id}.prof'
+            payload = _marshal_stats(profiler)
+        _write_profile(profile_dir, name, payload, keep)
+        response.headers[PROFILE_ID_HEADER] = name
+        return response
+
+    @app.teardown_request
+    def discard_request_profile(exc):
+        # after_request doesn't run when the view raised; don't leave the profiler on
+        profiler = g.pop('request_profiler', None)
+        if isinstance(profiler, StackSampler):
+            profiler.stop()
+        elif profiler is not None:
+            profiler.disable()
+
+    @app.route('/admin/profiles')
+    def list_profiles():
+        if not authorized():
+            abort(403)
+        names = sorted(os.listdir(profile_dir)) if os.path.isdir(profile_dir) else []
+        return jsonify({'profiles': [name for name in names if not name.endswith('.tmp')]})
+
+    @app.route('/admin/profiles/<name>')
+    def get_profile(name):
+        if not authorized():
+            abort(403)
+        path = os.path.join(profile_dir, os.path.basename(name))
+        if not os.path.exists(path):
+            abort(404)
+        return Response(profile_text(path, int(request.args.get('limit', 40))), mimetype='text/plain')
+
+    return app
+
@@ -0,0 +1,326 @@
+"""
+Incremental rescoring: score only the students whose features changed.
+
+Every scored student is kept in a score state (data/student_scores/) with a
+64-bit hash of their model input vector, the prediction, class probabilities
+and their top feature contributions (the cached explanation). When a new term
+export arrives, rescore_export() hashes its rows, diffs them against the
+stored hashes and runs the model and the explainer only on new or changed
+students. Those rows are then written into the student store, and the
+predicted-risk aggregates in the manifest are adjusted by exactly their
+old and new contributions.
+
+A new model or feature pipeline invalidates the whole state; the next run
+rescores every student once.
+
+The student store's CSV is rewritten by training and restored by artifact
+cache hits, so the raw export rows of every rescored student are also kept
+in the score state directory, which neither touches. train_model.py calls
+reapply_rescored() afterwards to write them back with the current model.
+
+Usage:
+    python rescoring.py term_export.xlsx
+    python rescoring.py term_export.csv --backend sqlite --top-k 3
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import model_report
+from batch_score import load_scoring_state, score_frame
+from chunked_training import iter_chunks
+from dataset_cache import PARQUET_AVAILABLE
+from features import PIPELINE_PATH
+from student_store import DEFAULT_CSV_PATH, DEFAULT_DB_PATH, create_student_store, upsert_csv
+
+DEFAULT_STATE_DIR = 'data/student_scores'
+MANIFEST_NAME = 'manifest.json'
+SCORES_NAME = 'scores.parquet' if PARQUET_AVAILABLE else 'scores.pkl'
+EXPORT_ROWS_NAME = 'export_rows.parquet' if PARQUET_AVAILABLE else 'export_rows.pkl'
+DEFAULT_TOP_K = 5
+
+
+def feature_hashes(pipeline, df):
+    """64-bit hash of each row's unscaled model input vector
+
+    Values are rounded to float32 first, so noise in the last bits of a
+    float (a CSV round trip, say) doesn't count as a change.
+    """
+    matrix = pipeline.feature_matrix(df, scale=False).astype(np.float32)
+    return pd.util.hash_pandas_object(pd.DataFrame(matrix), index=False).to_numpy()
+
+
+def state_version(state, top_k, approx):
+    """What the cached scores depend on besides the student's own features"""
+    pipeline_path = os.path.join(os.path.dirname(state['model_path']), os.path.basename(PIPELINE_PATH))
+    return {
+        'model': model_report.file_version(state['model_path']),
+        'pipeline': model_report.file_version(pipeline_path),
+        'feature_columns': list(state['pipeline'].feature_columns),
+        'top_k': top_k,
+        'approx_contribs': approx,
+    }
+
+
+def load_score_state(state_dir=DEFAULT_STATE_DIR):
+    """(scores, manifest) from an earlier run, or (None, None)"""
+    try:
+        with open(os.path.join(state_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        scores = _read_frame(os.path.join(state_dir, manifest['scores']))
+    except (OSError, ValueError, KeyError):
+        return None, None
+    return scores, manifest
+
+
+def _write_frame(df, path):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if PARQUET_AVAILABLE:
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _read_frame(path):
+    return pd.read_parquet(path) if path.endswith('.parquet') else pd.read_pickle(path)
+
+
+def save_score_state(scores, manifest, state_dir=DEFAULT_STATE_DIR):
+    """Write the scores, then the manifest that points at them, atomically"""
+    os.makedirs(state_dir, exist_ok=True)
+    _write_frame(scores, os.path.join(state_dir, SCORES_NAME))
+
+    manifest['scores'] = SCORES_NAME
+    path = os.path.join(state_dir, MANIFEST_NAME)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(model_report.to_json_safe(manifest), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_export_rows(state_dir=DEFAULT_STATE_DIR):
+    """Latest raw export row of every student written to the store, or None"""
+    path = os.path.join(state_dir, EXPORT_ROWS_NAME)
+    try:
+        return _read_frame(path)
+    except (OSError, ValueError):
+        return None
+
+
+def save_export_rows(rows, state_dir=DEFAULT_STATE_DIR):
+    """Add rows to the kept export rows, replacing older rows of the same students"""
+    os.makedirs(state_dir, exist_ok=True)
+    previous = load_export_rows(state_dir)
+    if previous is not None:
+        rows = pd.concat([previous, rows], ignore_index=True)
+    rows = rows.drop_duplicates('student_id', keep='last').reset_index(drop=True)
+    _write_frame(rows, os.path.join(state_dir, EXPORT_ROWS_NAME))
+
+
+def reapply_rescored(csv_path=DEFAULT_CSV_PATH, state_dir=DEFAULT_STATE_DIR, model_dir='models'):
+    """Write every student rescore_export() has seen back into the store's CSV
+
+    The kept raw rows are reprocessed and predicted with the bundle in
+    model_dir, so they match a retrained model. Returns the number of rows.
+    """
+    rows = load_export_rows(state_dir)
+    if rows is None or rows.empty or not os.path.exists(csv_path):
+        return 0
+    state = load_scoring_state(model_dir)
+    predictions = state['model'].predict_proba(state['pipeline'].feature_matrix(rows)).argmax(axis=1)
+    upsert_csv(csv_path, processed_rows(state, rows, predictions))
+    print(f"🔁 Re-applied {len(rows)} rescored students to {csv_path}")
+    return len(rows)
+
+
+def cached_explanation(scores, student_id):
+    """{feature: contribution} from the score state for one student, largest first"""
+    if scores is None or student_id not in scores.index:
+        return {}
+    row = scores.loc[student_id]
+    if isinstance(row, pd.DataFrame):
+        row = row.iloc[0]
+    explanation = {}
+    rank = 1
+    while f'top{rank}_feature' in row.index:
+        explanation[str(row[f'top{rank}_feature'])] = float(row[f'top{rank}_contribution'])
+        rank += 1
+    return explanation
+
+
+def _count_risk(aggregates, scores, sign):
+    """Add (sign=1) or remove (sign=-1) scored rows from the predicted-risk counts"""
+    risk_counts = aggregates.setdefault('risk_counts', {})
+    for level, n in scores['risk_level'].value_counts().items():
+        risk_counts[str(level)] = risk_counts.get(str(level), 0) + sign * int(n)
+
+    if 'department' in scores.columns:
+        by_department = aggregates.setdefault('department_risk_counts', {})
+        counts = scores.groupby(['department', 'risk_level'], observed=True).size()
+        for (department, level), n in counts.items():
+            levels = by_department.setdefault(str(department), {})
+            levels[str(level)] = levels.get(str(level), 0) + sign * int(n)
+            if levels[str(level)] == 0:
+                del levels[str(level)]
+            if not levels:
+                del by_department[str(department)]
+
+    aggregates['risk_counts'] = {level: n for level, n in risk_counts.items() if n}
+
+
+def processed_rows(state, df, predictions):
+    """Student store rows for export records: encoded inputs, engineered features and labels
+
+    Labeled rows get risk_level, risk_level_encoded and engagement_score
+    from the target the way StudentEngagementPredictor.preprocess_data()
+    derives them; unlabeled rows (a term still in progress) take the
+    model's predicted risk level.
+    """
+    pipeline = state['pipeline']
+    class_names = state['class_names']
+    binary = sorted(class_names) == ['High', 'Low']
+    rows = pipeline.transform(df)
+
+    predicted = pd.Series(np.asarray(class_names, dtype=object)[predictions], index=rows.index)
+    risk_level = predicted
+    target = pipeline.target_column
+    if target in rows.columns:
+        if pd.api.types.is_numeric_dtype(rows[target]):
+            labels = rows[target].map({0: 'Low', 1: 'High'}) if binary else None
+        else:
+            labels = rows[target].astype(str)
+        if labels is not None:
+            risk_level = labels.where(labels.isin(class_names), predicted)
+
+    rows['risk_level'] = risk_level
+    rows['risk_level_encoded'] = risk_level.map({name: code for code, name in enumerate(class_names)})
+    if binary:
+        # A binary 0/1 target doubles as the engagement score
+        engagement = risk_level.map({'Low': 0, 'High': 1})
+        if target in rows.columns and pd.api.types.is_numeric_dtype(rows[target]):
+            engagement = rows[target].where(rows[target].notnull(), engagement)
+        rows['engagement_score'] = engagement
+    else:
+        rows['engagement_score'] = risk_level.map({'Low': 85, 'Medium': 65, 'High': 35}).fillna(50)
+    return rows
+
+
+def _score_rows(state, df, hashes, top_k, approx):
+    scores = score_frame(df.reset_index(drop=True), top_k, approx, state=state)
+    scores['feature_hash'] = hashes
+    if 'department' in df.columns:
+        # Encoded, so raw and processed exports count into the same departments
+        values = df['department'].to_numpy()
+        if 'department' in state['pipeline'].categorical_classes:
+            values = state['pipeline'].encode_values('department', values)
+        scores['department'] = values
+    return scores
+
+
+def rescore_export(export_path, backend='pandas', csv_path=DEFAULT_CSV_PATH, db_path=DEFAULT_DB_PATH,
+                   state_dir=DEFAULT_STATE_DIR, top_k=DEFAULT_TOP_K, approx=False, full=False,
+                   model_dir='models'):
+    """Rescore the new or changed students of an export and write them back
+
+    export_path is a CSV, Parquet or Excel file with a student_id column,
+    in the raw training layout or the processed one. full rescores every
+    row of the export regardless of hashes (the old nightly behavior).
+    Returns a summary dict.
+    """
+    start = time.perf_counter()
+    state = load_scoring_state(model_dir)
+    version = state_version(state, top_k, approx)
+
+    scores, manifest = load_score_state(state_dir)
+    if manifest is not None and manifest.get('version') != version:
+        print("🔄 Model, feature pipeline or explanation settings changed; rescoring every student")
+        scores, manifest = None, None
+
+    if scores is None:
+        # First run: score everyone already in the store once, so later runs only see deltas
+        print(f"🧮 Building score state from {csv_path}...")
+        baseline = pd.concat(iter_chunks(csv_path), ignore_index=True).drop_duplicates('student_id')
+        scores = _score_rows(state, baseline, feature_hashes(state['pipeline'], baseline), top_k, approx)
+        manifest = {'version': version, 'aggregates': {}, 'runs': []}
+        _count_risk(manifest['aggregates'], scores, 1)
+
+    export = pd.concat(iter_chunks(export_path), ignore_index=True)
+    if 'student_id' not in export.columns:
+        raise ValueError("Export needs a student_id column to match students across runs")
+    export = export.drop_duplicates('student_id', keep='last').reset_index(drop=True)
+
+    hashes = feature_hashes(state['pipeline'], export)
+    positions = pd.Index(scores['student_id']).get_indexer(export['student_id'])
+    is_new = positions < 0
+    previous = np.zeros(len(export), dtype=np.uint64)
+    previous[~is_new] = scores['feature_hash'].to_numpy()[positions[~is_new]]
+    changed = np.ones(len(export), dtype=bool) if full else is_new | (previous != hashes)
+    n_changed = int(changed.sum())
+    print(f"🔍 {len(export)} students in export: {int(is_new.sum())} new, "
+          f"{n_changed - int(is_new.sum())} changed, {len(export) - n_changed} unchanged")
+
+    scoring_seconds = 0.0
+    if n_changed:
+        delta = export[changed].reset_index(drop=True)
+        scoring_start = time.perf_counter()
+        rescored = _score_rows(state, delta, hashes[changed], top_k, approx)
+        scoring_seconds = time.perf_counter() - scoring_start
+
+        replaced = scores.iloc[positions[changed & ~is_new]]
+        _count_risk(manifest['aggregates'], replaced, -1)
+        _count_risk(manifest['aggregates'], rescored, 1)
+
+        keep = np.ones(len(scores), dtype=bool)
+        keep[positions[changed & ~is_new]] = False
+        scores = pd.concat([scores[keep], rescored], ignore_index=True)
+
+        store = create_student_store(backend, csv_path, db_path)
+        store.upsert_students(processed_rows(state, delta, rescored['prediction'].to_numpy()))
+        save_export_rows(delta, state_dir)
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'export': export_path,
+        'export_rows': len(export),
+        'new': int(is_new.sum()),
+        'rescored': n_changed,
+        'rescored_fraction': n_changed / max(len(export), 1),
+        'scoring_seconds': scoring_seconds,
+        'seconds': elapsed,
+        'full': full,
+    }
+    manifest['runs'] = (manifest.get('runs', []) + [summary])[-20:]
+    save_score_state(scores, manifest, state_dir)
+
+    print(f"✅ Rescored {n_changed} of {len(export)} students "
+          f"({summary['rescored_fraction']:.1%}) in {elapsed:.1f}s")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rescore only the new or changed students of an export')
+    parser.add_argument('export', help='CSV/Parquet/Excel export with a student_id column')
+    parser.add_argument('--backend', choices=['pandas', 'sqlite'], default=os.environ.get('STUDENT_BACKEND', 'pandas'))
+    parser.add_argument('--csv-path', default=DEFAULT_CSV_PATH, help='Processed student CSV behind the store')
+    parser.add_argument('--db-path', default=DEFAULT_DB_PATH, help='SQLite store path with --backend sqlite')
+    parser.add_argument('--state-dir', default=DEFAULT_STATE_DIR)
+    parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K, help='Cached top contributions per student')
+    parser.add_argument('--approx-contribs', action='store_true',
+                        help='Cache fast approximate attributions instead of exact SHAP')
+    parser.add_argument('--full', action='store_true', help='Rescore every student in the export')
+    parser.add_argument('--model-dir', default='models')
+    args = parser.parse_args(argv)
+
+    rescore_export(args.export, args.backend, args.csv_path, args.db_path, args.state_dir,
+                   args.top_k, args.approx_contribs, args.full, args.model_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+Production entry point for the Student Engagement Prediction API.
+
+The master process preloads the model bundle, the SHAP explainer and the
+student store once, freezes them out of the garbage collector's reach and
+forks the workers, so every worker shares those pages copy-on-write instead
+of loading its own copy. Each worker then warms up (one store query, one
+inference through the interactive and full models, one explanation) before
+it starts accepting connections.
+
+Runs under gunicorn (gthread workers) when it is installed, otherwise under
+a built-in pre-fork server on top of werkzeug. app.py's probes report on
+each worker:
+
+* /healthz  liveness: 200 while the worker process is up
+* /readyz   readiness: 200 once this worker has a model and finished warm-up,
+            503 before that and while shutting down
+
+A bare `gunicorn app:app` also serves, but every worker loads its own model
+on its first request or probe, with nothing shared.
+
+Usage:
+    python serve.py                                  # workers = CPU count, 8 threads each
+    python serve.py --workers 8 --threads 8 --port 8000
+    WORKERS=4 THREADS=16 python serve.py --server builtin
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import ThreadedWSGIServer
+
+import app as app_module
+
+try:
+    import gunicorn.app.base
+    GUNICORN_AVAILABLE = True
+except ImportError:
+    GUNICORN_AVAILABLE = False
+
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 5000
+DEFAULT_THREADS = 8
+WORKER_TIMEOUT = 120
+LISTEN_BACKLOG = 2048
+
+def preload():
+    """Load everything workers share, in the master, before forking"""
+    start = time.perf_counter()
+    app_module.load_model()
+    store = app_module.get_student_store()
+    # Loads the pandas frame (or opens the SQLite database) once for everyone
+    store.risk_counts()
+    app_module.get_performance_report()
+    app_module.get_score_state()
+
+    # Objects that survive to here live for the whole process; moving them to
+    # the permanent generation keeps GC passes from touching (and so copying)
+    # their pages in every worker
+    gc.collect()
+    gc.freeze()
+    print(f"📦 Preloaded model and student store in {time.perf_counter() - start:.1f}s")
+
+
+class _WorkerServer(ThreadedWSGIServer):
+    """werkzeug's threaded server with at most `threads` requests in flight
+
+    Connections beyond that wait in the listen backlog, shared with the other
+    workers, and in-flight requests are finished on shutdown.
+    """
+
+    daemon_threads = False
+
+    def __init__(self, host, port, app, threads, fd):
+        super().__init__(host, port, app, fd=fd)
+        self._slots = threading.BoundedSemaphore(threads)
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+def _stop_worker(signum, frame):
+    app_module.serving_state['draining'] = True
+    raise KeyboardInterrupt
+
+
+def _run_worker(listener, host, port, threads):
+    signal.signal(signal.SIGTERM, _stop_worker)
+    signal.signal(signal.SIGINT, _stop_worker)
+    app_module.warm_up()
+    server = _WorkerServer(host, port, app_module.app, threads, listener.fileno())
+    # Returns on SIGTERM, after joining the threads still serving requests
+    server.serve_forever()
+
+
+def serve_builtin(host, port, workers, threads):
+    """Pre-fork server: preload, fork workers sharing one socket, restart any that die"""
+    listener = socket.create_server((host, port), backlog=LISTEN_BACKLOG)
+    preload()
+    print(f"🚀 Serving on http://{host}:{port} with {workers} workers x {threads} threads")
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(listener, host, port, threads)
+            except BaseException as e:
+                if not isinstance(e, KeyboardInterrupt):
+                    print(f"⚠️  Worker {os.getpid()} crashed: {e}")
+                    code = 1
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"⚠️  Worker {pid} exited (status {status}); starting a replacement")
+            spawn()
+    listener.close()
+    print("👋 All workers stopped")
+
+
+def serve_gunicorn(host, port, workers, threads):
+    """Run under gunicorn with the app preloaded in the arbiter and warmed in post_fork"""
+
+    class Application(gunicorn.app.base.BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': f'{host}:{port}',
+                'workers': workers,
+                'threads': threads,
+                'worker_class': 'gthread' if threads > 1 else 'sync',
+                'preload_app': True,
+                'timeout': WORKER_TIMEOUT,
+                'backlog': LISTEN_BACKLOG,
+                'post_fork': lambda server, worker: app_module.warm_up(),
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            preload()
+            return app_module.app
+
+    Application().run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the API with preloaded, pre-warmed workers')
+    parser.add_argument('--host', default=os.environ.get('HOST', DEFAULT_HOST))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', DEFAULT_PORT)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('THREADS', DEFAULT_THREADS)),
+                        help='Concurrent requests per worker')
+    parser.add_argument('--server', choices=['auto', 'gunicorn', 'builtin'], default='auto')
+    args = parser.parse_args(argv)
+
+    server = args.server
+    if server == 'auto':
+        server = 'gunicorn' if GUNICORN_AVAILABLE else 'builtin'
+    if server == 'gunicorn':
+        if not GUNICORN_AVAILABLE:
+            print("❌ gunicorn is not installed; use --server builtin or pip install gunicorn")
+            return 1
+        serve_gunicorn(args.host, args.port, args.workers, args.threads)
+    elif hasattr(os, 'fork'):
+        serve_builtin(args.host, args.port, args.workers, args.threads)
+    else:
+        # No fork (Windows): one preloaded process
+        preload()
+        app_module.warm_up()
+        app_module.app.run(host=args.host, port=args.port, threaded=True, debug=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
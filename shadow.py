@@ -0,0 +1,215 @@
+"""
+Shadow scoring: compare a candidate model bundle on live traffic.
+
+Requests are answered by the served model as usual. The inputs, with the
+served model's probabilities and timing, are put on a bounded queue; a
+background thread scores them with the candidate bundle (its own feature
+pipeline and model) and records how often the two disagree, how far apart
+their probabilities are and how long each took.
+
+The request path only does a non-blocking put: when the queue is full the
+sample is dropped and counted, never waited for. The candidate runs with
+one model thread so it takes as little CPU from requests as possible.
+
+Point SHADOW_MODEL_DIR at any bundle directory, e.g. a freshly trained one
+copied to models/candidate/ or an archived models/versions/<version>/. It is
+reloaded (and the statistics reset) when a new complete bundle lands there.
+"""
+
+import collections
+import queue
+import random
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from model_registry import ModelBundle, complete_version
+
+DEFAULT_QUEUE_SIZE = 1000
+LATENCY_WINDOW = 10000
+CHECK_INTERVAL = 5
+
+shadow_requests = metrics.registry.register(metrics.Counter(
+    'shadow_requests_total', 'Shadow samples by outcome (scored, dropped, error)', ('result',)))
+shadow_rows = metrics.registry.register(metrics.Counter(
+    'shadow_rows_total', 'Shadow-scored rows by agreement with the served model', ('result',)))
+shadow_latency = metrics.registry.register(metrics.Histogram(
+    'shadow_scoring_duration_seconds', 'Preprocess and predict time per sample, served vs candidate model',
+    ('model',)))
+
+
+def class_names(bundle):
+    encoders = bundle.label_encoders or {}
+    if 'risk_level' in encoders:
+        return [str(name) for name in encoders['risk_level'].classes_]
+    return [str(label) for label in getattr(bundle.model, 'classes_', [0, 1])]
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    array = np.asarray(values) * 1000
+    return {'p50_ms': float(np.percentile(array, 50)), 'p99_ms': float(np.percentile(array, 99)),
+            'mean_ms': float(array.mean())}
+
+
+class ShadowScorer:
+    """Background comparison of a candidate bundle against the served one"""
+
+    def __init__(self, candidate_dir, queue_size=DEFAULT_QUEUE_SIZE, sample_rate=1.0):
+        self.candidate_dir = candidate_dir
+        self.queue_size = queue_size
+        self.sample_rate = sample_rate
+        self.candidate = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+            self.counts = collections.Counter()
+            self.confusion = collections.Counter()
+            self.probability_diff = 0.0
+            self.latency = {'served': collections.deque(maxlen=LATENCY_WINDOW),
+                            'candidate': collections.deque(maxlen=LATENCY_WINDOW)}
+            self.served_version = None
+            self.last_error = None
+
+    def load_candidate(self):
+        version = complete_version(self.candidate_dir)
+        if version is None or (self.candidate is not None and self.candidate.version == version):
+            return False
+        bundle = ModelBundle.load(self.candidate_dir)
+        for model in (bundle.model, bundle.fast_model):
+            if model is not None and hasattr(model, 'n_jobs'):
+                model.set_params(n_jobs=1)
+        self.candidate = bundle
+        self.reset()
+        print(f"🕶️  Shadow scoring against candidate model {bundle.version}")
+        return True
+
+    def submit(self, records, probabilities, seconds, served_bundle, interactive=True, route=None):
+        """Queue one answered request for comparison; never blocks"""
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return False
+        try:
+            self._queue.put_nowait((records, probabilities, seconds, served_bundle, interactive, route))
+        except queue.Full:
+            shadow_requests.inc('dropped')
+            with self._lock:
+                self.counts['dropped'] += 1
+            return False
+        return True
+
+    def _score(self, item):
+        records, probabilities, seconds, served_bundle, interactive, route = item
+        candidate = self.candidate
+        start = time.perf_counter()
+        X = candidate.feature_pipeline.feature_matrix(records)
+        candidate_probabilities = candidate.interactive_model(interactive).predict_proba(X)
+        candidate_seconds = time.perf_counter() - start
+
+        # Compared by class name, in case the two bundles encode classes differently
+        served = np.asarray(probabilities)
+        served_names = np.asarray(class_names(served_bundle), dtype=object)
+        candidate_names = np.asarray(class_names(candidate), dtype=object)
+        served_labels = served_names[served.argmax(axis=1)]
+        candidate_labels = candidate_names[candidate_probabilities.argmax(axis=1)]
+        agree = served_labels == candidate_labels
+
+        # Absolute difference in the probability of the served model's predicted class
+        columns = {name: i for i, name in enumerate(candidate_names)}
+        candidate_columns = np.array([columns.get(label, 0) for label in served_labels])
+        rows = np.arange(len(served))
+        diff = np.abs(served[rows, served.argmax(axis=1)] - candidate_probabilities[rows, candidate_columns])
+
+        shadow_latency.observe(seconds, 'served')
+        shadow_latency.observe(candidate_seconds, 'candidate')
+        shadow_rows.inc('agree', amount=int(agree.sum()))
+        shadow_rows.inc('disagree', amount=int((~agree).sum()))
+        with self._lock:
+            self.counts['samples'] += 1
+            self.counts['rows'] += len(agree)
+            self.counts['agree'] += int(agree.sum())
+            self.counts[f'route:{route}'] += 1
+            self.confusion.update(zip(served_labels, candidate_labels))
+            self.probability_diff += float(diff.sum())
+            self.latency['served'].append(seconds)
+            self.latency['candidate'].append(candidate_seconds)
+            self.served_version = served_bundle.version
+
+    def _run(self):
+        last_check = 0.0
+        while not self._stop.is_set():
+            if time.time() - last_check >= CHECK_INTERVAL:
+                last_check = time.time()
+                try:
+                    self.load_candidate()
+                except Exception as e:
+                    self.last_error = f'loading candidate: {e}'
+            try:
+                item = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            if self.candidate is None:
+                continue
+            try:
+                self._score(item)
+                shadow_requests.inc('scored')
+            except Exception as e:
+                shadow_requests.inc('error')
+                with self._lock:
+                    self.counts['errors'] += 1
+                    self.last_error = str(e)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='shadow-scorer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def after_fork(self):
+        """Threads and held locks don't survive fork: start over in the child"""
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self.reset()
+        self.start()
+
+    def summary(self):
+        with self._lock:
+            counts = dict(self.counts)
+            confusion = [{'served': served, 'candidate': candidate, 'rows': n}
+                         for (served, candidate), n in sorted(self.confusion.items())]
+            latency = {model: _percentiles(list(values)) for model, values in self.latency.items()}
+            probability_diff = self.probability_diff
+        rows = counts.get('rows', 0)
+        return {
+            'enabled': True,
+            'candidate': self.candidate.describe() if self.candidate is not None else None,
+            'served_version': self.served_version,
+            'since': self.started_at,
+            'samples': counts.get('samples', 0),
+            'rows': rows,
+            'agreement_rate': counts.get('agree', 0) / rows if rows else None,
+            'disagreement_rate': 1 - counts.get('agree', 0) / rows if rows else None,
+            'mean_probability_diff': probability_diff / rows if rows else None,
+            'confusion': confusion,
+            'latency': latency,
+            'dropped': counts.get('dropped', 0),
+            'errors': counts.get('errors', 0),
+            'queue_depth': self._queue.qsize(),
+            'queue_size': self.queue_size,
+            'routes': {key.split(':', 1)[1]: n for key, n in counts.items() if key.startswith('route:')},
+            'last_error': self.last_error,
+        }
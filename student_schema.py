@@ -0,0 +1,107 @@
+"""
+Compact in-memory layout for the processed student table.
+
+pandas loads the processed CSV as int64/float64/object columns even though
+most of them are small codes. STUDENT_SCHEMA declares the narrowest dtype each
+column can use; compact_frame() applies it, but only where the data allows
+(whole numbers in range), so every stored value stays exactly the same.
+
+Float columns stay float64: the feature pipeline reads them (directly or as
+sources of engineered features), and float32 storage would change the model's
+inputs, and so some predictions, even where the printed value looks the same.
+"""
+
+import numpy as np
+import pandas as pd
+
+STUDENT_SCHEMA = {
+    'student_id': 'int32',
+    'gender': 'int8',
+    'department': 'int8',
+    'scholarship': 'int8',
+    'parental_education': 'int8',
+    'extra_curricular': 'int8',
+    'age': 'float64',
+    'cgpa': 'float64',
+    'attendance_rate': 'float64',
+    'family_income': 'int32',
+    'past_failures': 'float64',
+    'study_hours_per_week': 'float64',
+    'assignments_submitted': 'int16',
+    'projects_completed': 'int8',
+    'total_activities': 'int8',
+    'sports_participation': 'int8',
+    'dropout': 'int8',
+    'risk_level': 'category',
+    'risk_level_encoded': 'int8',
+    'engagement_score': 'int8',
+    'academic_performance': 'float64',
+    'study_intensity': 'float64',
+    'assignment_completion': 'int16',
+    'activity_participation': 'int8',
+    'attendance_performance_interaction': 'float64',
+    'study_assignment_interaction': 'float64',
+    'failure_risk': 'bool',
+}
+
+
+def _fits_integer(series, dtype):
+    """True if every value is a whole number inside the dtype's range"""
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return False
+    if series.isnull().any():
+        return False
+    values = series.to_numpy()
+    if pd.api.types.is_float_dtype(series) and not np.array_equal(values, np.floor(values)):
+        return False
+    info = np.iinfo(dtype)
+    return bool(len(values) == 0 or (values.min() >= info.min and values.max() <= info.max))
+
+
+def _compact_column(series, target):
+    if target == 'category':
+        if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            return series.astype('category')
+        return series
+
+    if target == 'bool':
+        if pd.api.types.is_bool_dtype(series):
+            return series
+        if not series.isnull().any() and series.isin([0, 1, True, False]).all():
+            return series.astype(bool)
+        return series
+
+    if target == 'float64':
+        return series
+
+    if series.dtype != np.dtype(target) and _fits_integer(series, target):
+        return series.astype(target)
+    return series
+
+
+def compact_frame(df, schema=None):
+    """Return a copy of df with columns narrowed according to the schema
+
+    Columns the schema doesn't mention, or whose values don't fit the
+    declared dtype, keep their original dtype.
+    """
+    schema = STUDENT_SCHEMA if schema is None else schema
+    compacted = {}
+    for col in df.columns:
+        target = schema.get(col)
+        compacted[col] = _compact_column(df[col], target) if target else df[col]
+    return pd.DataFrame(compacted, index=df.index)
+
+
+def memory_report(df):
+    """Per-column dtype and memory usage in bytes, largest first"""
+    usage = df.memory_usage(deep=True, index=False)
+    return pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': usage
+    }).sort_values('bytes', ascending=False)
+
+
+def to_records(df):
+    """Convert rows to JSON-ready dicts"""
+    return df.to_dict('records')
@@ -0,0 +1,468 @@
+"""
+Student data access layer for the Student Engagement Prediction System.
+
+Two interchangeable backends serve the processed student table:
+
+* ``pandas`` - the processed CSV held as one in-memory DataFrame (default)
+* ``sqlite`` - an indexed SQLite copy of the same table; filters, sort order,
+  pagination and aggregates are pushed down into SQL
+
+Both backends hold data in the compact layout from student_schema and return
+the same records, so routes don't care which one is active.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from student_schema import compact_frame, memory_report, to_records
+
+DEFAULT_CSV_PATH = 'data/processed_data.csv'
+DEFAULT_DB_PATH = 'data/students.db'
+
+TABLE_NAME = 'students'
+META_TABLE_NAME = 'students_meta'
+INDEXED_COLUMNS = ['student_id', 'risk_level', 'department', 'engagement_score']
+
+
+def _dtype_to_json(dtype):
+    if isinstance(dtype, pd.CategoricalDtype):
+        return {'dtype': 'category', 'categories': dtype.categories.tolist()}
+    if dtype == object or pd.api.types.is_string_dtype(dtype):
+        return 'object'
+    return str(dtype)
+
+
+def _dtype_from_json(value):
+    if isinstance(value, dict):
+        return pd.CategoricalDtype(value['categories'])
+    return object if value == 'object' else np.dtype(value)
+
+
+def load_student_frame(csv_path=DEFAULT_CSV_PATH, verbose=True):
+    """Read the processed CSV and narrow it to the compact student layout"""
+    raw = pd.read_csv(csv_path)
+    df = compact_frame(raw)
+    if verbose:
+        before, after = memory_report(raw), memory_report(df)
+        print(f"📦 Student frame loaded: {len(df)} rows, {before['bytes'].sum() / 1024 ** 2:.1f} MB "
+              f"-> {after['bytes'].sum() / 1024 ** 2:.1f} MB")
+        for col, row in after.iterrows():
+            print(f"   {col:<36} {before.at[col, 'dtype']:>8} -> {row['dtype']:<8} "
+                  f"{before.at[col, 'bytes'] / 1024:9.1f} KB -> {row['bytes'] / 1024:9.1f} KB")
+    return df
+
+
+def _coerce_key(value, dtype):
+    """Convert a request string to the column's type, or None if it can't match.
+
+    The pandas path compares ``column.astype(str) == value``, so a value only
+    matches when it round-trips to the same string representation.
+    """
+    value = str(value)
+    try:
+        if pd.api.types.is_bool_dtype(dtype):
+            return None
+        if pd.api.types.is_integer_dtype(dtype):
+            typed = int(value)
+        elif pd.api.types.is_float_dtype(dtype):
+            typed = float(value)
+        else:
+            return value
+    except ValueError:
+        return None
+    return typed if str(np.array([typed]).astype(dtype)[0]) == value else None
+
+
+class PandasStudentStore:
+    """Serve student queries from a single in-memory DataFrame"""
+
+    backend = 'pandas'
+
+    def __init__(self, csv_path=DEFAULT_CSV_PATH):
+        self.csv_path = csv_path
+        self._df = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    @metrics.timed('load')
+    def frame(self, columns=None):
+        """Return the student table, reloading it when the CSV changes"""
+        mtime = os.path.getmtime(self.csv_path)
+        hit = self._df is not None and mtime == self._mtime
+        if not hit:
+            with self._lock:
+                if self._df is None or mtime != self._mtime:
+                    self._df = load_student_frame(self.csv_path)
+                    self._mtime = mtime
+        metrics.record_cache('student_frame', hit)
+        return self._df if columns is None else self._df[list(columns)]
+
+    def iter_frames(self, chunk_rows=50000, columns=None):
+        """Yield the student table in order, chunk_rows rows at a time"""
+        df = self.frame(columns)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+    def upsert_students(self, rows):
+        """Replace the stored rows of each student in rows and append new students"""
+        with self._lock:
+            upsert_csv(self.csv_path, rows)
+            self._df = None
+
+    def dtypes(self):
+        return self.frame().dtypes
+
+    @metrics.timed('load')
+    def query_students(self, search='', risk='', department='', sort_by=None,
+                       ascending=True, offset=0, limit=20):
+        """Filter, sort and paginate students; return (records, total_matches)"""
+        df = self.frame()
+
+        if search:
+            df = df[df['student_id'].astype(str).str.contains(search, case=False, na=False, regex=False)]
+
+        if risk:
+            df = df[df['risk_level'].str.lower() == risk.lower()]
+
+        if department:
+            df = df[df['department'].astype(str) == str(department)]
+
+        if sort_by:
+            df = df.sort_values(sort_by, ascending=ascending, kind='mergesort', na_position='last')
+
+        return to_records(df.iloc[offset:offset + limit]), len(df)
+
+    @metrics.timed('load')
+    def get_student(self, student_id):
+        """Return a one-row DataFrame for the student (empty if not found)"""
+        df = self.frame()
+        return df[df['student_id'].astype(str) == str(student_id)].head(1)
+
+    @metrics.timed('load')
+    def risk_counts(self):
+        """Number of students per risk level, largest first"""
+        return self.frame()['risk_level'].value_counts()
+
+    @metrics.timed('load')
+    def column_mean(self, column):
+        return self.frame()[column].mean()
+
+    @metrics.timed('load')
+    def department_risk_counts(self):
+        """Student counts indexed by (department, risk_level)"""
+        counts = self.frame().groupby('department', observed=True)['risk_level'].value_counts()
+        # Categorical risk levels report every category; keep only observed pairs
+        return counts[counts > 0]
+
+    @metrics.timed('load')
+    def department_performance(self):
+        """Mean engagement, attendance and high-risk percentage per department"""
+        return self.frame().groupby('department', observed=True).agg({
+            'engagement_score': 'mean',
+            'attendance_rate': 'mean',
+            'risk_level': lambda x: (x == 'High').mean() * 100
+        })
+
+
+class SQLiteStudentStore:
+    """Serve student queries from an indexed SQLite table
+
+    Connections are opened read-only and pooled per worker process; a forked
+    worker never reuses its parent's connections.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, csv_path=DEFAULT_CSV_PATH, pool_size=4):
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self.pool_size = pool_size
+        self._pool = None
+        self._pool_pid = None
+        self._dtypes = None
+        self._lock = threading.Lock()
+
+        if csv_path and os.path.exists(csv_path):
+            if not os.path.exists(db_path) or os.path.getmtime(db_path) < os.path.getmtime(csv_path):
+                build_sqlite_store(csv_path, db_path)
+
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection for the current process"""
+        pid = os.getpid()
+        if self._pool_pid != pid:
+            with self._lock:
+                if self._pool_pid != pid:
+                    self._pool = queue.LifoQueue(maxsize=self.pool_size)
+                    self._pool_pid = pid
+        pool = self._pool
+
+        try:
+            conn = pool.get_nowait()
+        except queue.Empty:
+            conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, check_same_thread=False)
+            conn.execute('PRAGMA query_only = ON')
+
+        try:
+            yield conn
+        finally:
+            try:
+                pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def _read(self, sql, params=()):
+        with self._connection() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def _restore_dtypes(self, df):
+        """Cast SQL results back to the dtypes of the source frame"""
+        dtypes = self.dtypes()
+        for col in df.columns:
+            if col in dtypes.index and df[col].dtype != dtypes[col]:
+                if df[col].isnull().any() and pd.api.types.is_integer_dtype(dtypes[col]):
+                    continue
+                df[col] = df[col].astype(dtypes[col])
+        return df
+
+    def dtypes(self):
+        if self._dtypes is None:
+            meta = self._read(f'SELECT value FROM {META_TABLE_NAME} WHERE key = ?', ('dtypes',))
+            self._dtypes = pd.Series(
+                {col: _dtype_from_json(value) for col, value in json.loads(meta['value'].iloc[0]).items()},
+                dtype=object
+            )
+        return self._dtypes
+
+    def _columns(self, columns):
+        """Validate column names before they are interpolated into SQL"""
+        known = self.dtypes().index
+        missing = [col for col in columns if col not in known]
+        if missing:
+            raise KeyError(f"{missing} not in index")
+        return ', '.join(f'"{col}"' for col in columns)
+
+    @metrics.timed('load')
+    def frame(self, columns=None):
+        """Return the student table (or just the requested columns)"""
+        columns = list(self.dtypes().index) if columns is None else list(columns)
+        df = self._read(f'SELECT {self._columns(columns)} FROM {TABLE_NAME} ORDER BY rowid')
+        return self._restore_dtypes(df)
+
+    def iter_frames(self, chunk_rows=50000, columns=None):
+        """Yield the table in rowid order, chunk_rows rows at a time
+
+        Pages by rowid rather than OFFSET, so each chunk is an index range
+        scan and only one chunk is in memory.
+        """
+        columns = list(self.dtypes().index) if columns is None else list(columns)
+        sql = (f'SELECT rowid AS _rowid, {self._columns(columns)} FROM {TABLE_NAME} '
+               f'WHERE rowid > ? ORDER BY rowid LIMIT ?')
+        last_rowid = 0
+        while True:
+            df = self._read(sql, (last_rowid, chunk_rows))
+            if df.empty:
+                return
+            last_rowid = int(df['_rowid'].iloc[-1])
+            yield self._restore_dtypes(df.drop(columns='_rowid'))
+
+    def upsert_students(self, rows):
+        """Replace the stored rows of each student in rows and append new students
+
+        Columns rows doesn't have keep their stored values. Updates the
+        table in place (rowid order is kept) rather than rebuilding it, after
+        bringing the source CSV up to date so the database stays the newer of
+        the two.
+        """
+        upsert_csv(self.csv_path, rows)
+
+        dtypes = self.dtypes()
+        rows = compact_frame(rows.drop_duplicates('student_id', keep='last')
+                             .reindex(columns=[col for col in dtypes.index if col in rows.columns]))
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            stored = set(pd.read_sql_query(f'SELECT DISTINCT student_id FROM {TABLE_NAME}', conn)['student_id'])
+            existing = rows['student_id'].isin(stored)
+
+            columns = [col for col in rows.columns if col != 'student_id']
+            assignments = ', '.join(f'"{col}" = ?' for col in columns)
+            conn.executemany(
+                f'UPDATE {TABLE_NAME} SET {assignments} WHERE student_id = ?',
+                [[record[col] for col in columns] + [record['student_id']]
+                 for record in rows[existing].to_dict('records')]
+            )
+            rows[~existing].to_sql(TABLE_NAME, conn, if_exists='append', index=False)
+
+            # New category values must survive _restore_dtypes()
+            meta = dict(dtypes)
+            for col in rows.columns:
+                if isinstance(meta[col], pd.CategoricalDtype):
+                    seen = rows[col].dropna().astype(str).unique().tolist()
+                    meta[col] = pd.CategoricalDtype(list(meta[col].categories)
+                                                    + sorted(set(seen) - set(meta[col].categories)))
+            conn.execute(f'UPDATE {META_TABLE_NAME} SET value = ? WHERE key = ?',
+                         (json.dumps({col: _dtype_to_json(dtype) for col, dtype in meta.items()}), 'dtypes'))
+            conn.commit()
+        finally:
+            conn.close()
+        self._dtypes = None
+
+    @metrics.timed('load')
+    def query_students(self, search='', risk='', department='', sort_by=None,
+                       ascending=True, offset=0, limit=20):
+        """Filter, sort and paginate students in SQL; return (records, total_matches)"""
+        clauses = []
+        params = []
+
+        if search:
+            escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            clauses.append("CAST(student_id AS TEXT) LIKE ? ESCAPE '\\'")
+            params.append(f'%{escaped}%')
+
+        if risk:
+            clauses.append('risk_level = ? COLLATE NOCASE')
+            params.append(risk)
+
+        if department:
+            key = _coerce_key(department, self.dtypes()['department'])
+            if key is None:
+                return [], 0
+            clauses.append('department = ?')
+            params.append(key)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        total = int(self._read(f'SELECT COUNT(*) AS n FROM {TABLE_NAME} {where}', params)['n'].iloc[0])
+
+        order = 'rowid'
+        if sort_by:
+            col = self._columns([sort_by])
+            direction = 'ASC' if ascending else 'DESC'
+            order = f'{col} IS NULL, {col} {direction}, rowid'
+
+        df = self._read(
+            f'SELECT * FROM {TABLE_NAME} {where} ORDER BY {order} LIMIT ? OFFSET ?',
+            params + [int(limit), int(offset)]
+        )
+        return to_records(self._restore_dtypes(df)), total
+
+    @metrics.timed('load')
+    def get_student(self, student_id):
+        """Return a one-row DataFrame for the student (empty if not found)"""
+        key = _coerce_key(student_id, self.dtypes()['student_id'])
+        if key is None:
+            return self._restore_dtypes(self._read(f'SELECT * FROM {TABLE_NAME} LIMIT 0'))
+        df = self._read(f'SELECT * FROM {TABLE_NAME} WHERE student_id = ? ORDER BY rowid LIMIT 1', (key,))
+        return self._restore_dtypes(df)
+
+    @metrics.timed('load')
+    def risk_counts(self):
+        """Number of students per risk level, largest first"""
+        df = self._read(
+            f'SELECT risk_level, COUNT(*) AS count FROM {TABLE_NAME} '
+            f'WHERE risk_level IS NOT NULL GROUP BY risk_level ORDER BY count DESC'
+        )
+        return df.set_index('risk_level')['count'].rename('count')
+
+    @metrics.timed('load')
+    def column_mean(self, column):
+        df = self._read(f'SELECT AVG({self._columns([column])}) AS mean FROM {TABLE_NAME}')
+        return df['mean'].iloc[0]
+
+    @metrics.timed('load')
+    def department_risk_counts(self):
+        """Student counts indexed by (department, risk_level)"""
+        df = self._read(
+            f'SELECT department, risk_level, COUNT(*) AS count FROM {TABLE_NAME} '
+            f'WHERE department IS NOT NULL AND risk_level IS NOT NULL '
+            f'GROUP BY department, risk_level ORDER BY department, count DESC'
+        )
+        return df.set_index(['department', 'risk_level'])['count']
+
+    @metrics.timed('load')
+    def department_performance(self):
+        """Mean engagement, attendance and high-risk percentage per department"""
+        df = self._read(
+            f"SELECT department, AVG(engagement_score) AS engagement_score, "
+            f"AVG(attendance_rate) AS attendance_rate, "
+            f"AVG(CASE WHEN risk_level = 'High' THEN 1.0 ELSE 0.0 END) * 100 AS risk_level "
+            f"FROM {TABLE_NAME} WHERE department IS NOT NULL GROUP BY department ORDER BY department"
+        )
+        return df.set_index('department')
+
+
+def upsert_csv(csv_path, rows):
+    """Write rows into the processed CSV keyed on student_id
+
+    Every stored row of a student in rows is updated in place (columns rows
+    doesn't have keep their stored values); students not in the CSV yet are
+    appended. Columns the CSV doesn't have are dropped. The file is swapped
+    in atomically.
+    """
+    df = pd.read_csv(csv_path)
+    rows = rows.drop_duplicates('student_id', keep='last')
+    columns = [col for col in df.columns if col in rows.columns]
+
+    positions = pd.Index(rows['student_id']).get_indexer(df['student_id'])
+    matched = positions >= 0
+    updated = df[matched].copy()
+    for col in columns:
+        updated[col] = rows[col].to_numpy()[positions[matched]]
+    added = rows[~rows['student_id'].isin(df['student_id'])].reindex(columns=df.columns)
+    df = pd.concat([pd.concat([df[~matched], updated]).sort_index(), added], ignore_index=True)
+
+    tmp_path = f'{csv_path}.{os.getpid()}.tmp'
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, csv_path)
+    return len(updated), len(added)
+
+
+def build_sqlite_store(csv_path=DEFAULT_CSV_PATH, db_path=DEFAULT_DB_PATH):
+    """Load the processed CSV into an indexed SQLite database
+
+    The database is written next to its final location and swapped in with
+    os.replace so running workers never see a half-built file.
+    """
+    print(f"🗄️  Building SQLite student store: {db_path}")
+    df = load_student_frame(csv_path, verbose=False)
+
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    tmp_path = f'{db_path}.{os.getpid()}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        df.to_sql(TABLE_NAME, conn, index=False)
+        for col in INDEXED_COLUMNS:
+            if col in df.columns:
+                collate = ' COLLATE NOCASE' if col == 'risk_level' else ''
+                conn.execute(f'CREATE INDEX idx_{TABLE_NAME}_{col} ON {TABLE_NAME} ("{col}"{collate})')
+        dtypes = {col: _dtype_to_json(dtype) for col, dtype in df.dtypes.items()}
+        conn.execute(f'CREATE TABLE {META_TABLE_NAME} (key TEXT PRIMARY KEY, value TEXT)')
+        conn.execute(f'INSERT INTO {META_TABLE_NAME} VALUES (?, ?)', ('dtypes', json.dumps(dtypes)))
+        conn.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    print(f"✅ SQLite student store ready ({len(df)} rows)")
+
+
+def create_student_store(backend='pandas', csv_path=DEFAULT_CSV_PATH, db_path=DEFAULT_DB_PATH):
+    """Create the configured student store backend"""
+    backend = (backend or 'pandas').lower()
+    if backend == 'pandas':
+        return PandasStudentStore(csv_path)
+    if backend == 'sqlite':
+        return SQLiteStudentStore(db_path, csv_path)
+    raise ValueError(f"Unknown student store backend: {backend}")
@@ -0,0 +1,286 @@
+"""
+Synthetic student datasets with the schema and statistics of Dataset.xlsx.
+
+SyntheticStudentGenerator.fit() learns, per column, the marginal distribution
+(an empirical quantile grid for numeric columns, level frequencies for
+categorical ones), the missing-value rate and the column dtype, plus the rank
+correlations between all columns, target included (a Gaussian copula).
+generate_chunks() then draws any number of rows chunk by chunk, so a
+10M-row dataset needs no more memory than one chunk.
+
+Output has the source's columns, names, dtypes and messy categorical levels,
+so train_model.py, chunked training and the benchmarks accept it unchanged.
+
+Usage:
+    python synthetic_data.py --rows 1000000 --output data/synthetic_1m.csv
+    python synthetic_data.py --rows 5000000 --output data/synthetic_5m.parquet --seed 7
+    python synthetic_data.py --rows 50000 --output data/synthetic.xlsx
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+from scipy.stats import norm
+
+from dataset_cache import PARQUET_AVAILABLE, read_excel_cached
+
+DEFAULT_SOURCE = 'Dataset.xlsx'
+DEFAULT_CHUNK_ROWS = 100000
+ID_COLUMN = 'student_id'
+TARGET_COLUMN = 'dropout'
+
+QUANTILE_POINTS = 2001
+# Numeric columns with at most this many distinct values are sampled from the
+# observed values only (age, past_failures, counts), never interpolated
+MAX_DISCRETE_VALUES = 50
+EXCEL_MAX_ROWS = 1048575
+
+
+def _normal_scores(values, valid):
+    """Normal scores of the ranks of values; NaN where not valid"""
+    scores = np.full(len(values), np.nan)
+    ranks = pd.Series(values[valid]).rank(method='average').to_numpy()
+    scores[valid] = ndtri(ranks / (valid.sum() + 1))
+    return scores
+
+
+def _score_reliability(cumulative):
+    """Correlation between a latent normal and its normal scores once cut into bands
+
+    Discrete columns (the target, categoricals, small counts) only carry part
+    of their latent variable's correlation; dividing by this undoes that.
+    """
+    bounds = ndtri(np.concatenate([[0.0], cumulative]))
+    probabilities = np.diff(np.concatenate([[0.0], cumulative]))
+    scores = ndtri(np.concatenate([[0.0], cumulative])[:-1] + probabilities / 2)
+    covariance = np.sum(scores * (norm.pdf(bounds[:-1]) - norm.pdf(bounds[1:])))
+    variance = np.sum(probabilities * scores ** 2) - np.sum(probabilities * scores) ** 2
+    return covariance / np.sqrt(variance) if variance > 0 else 1.0
+
+
+def _nearest_correlation(corr):
+    """Clip negative eigenvalues so the pairwise correlation matrix is usable"""
+    eigenvalues, eigenvectors = np.linalg.eigh(corr)
+    fixed = eigenvectors @ np.diag(np.clip(eigenvalues, 1e-6, None)) @ eigenvectors.T
+    scale = np.sqrt(np.diag(fixed))
+    return fixed / np.outer(scale, scale)
+
+
+class SyntheticStudentGenerator:
+    """Gaussian-copula model of a student table"""
+
+    def __init__(self):
+        self.columns = []
+        self.id_start = 1
+        self.marginals = {}
+        self.correlation = None
+        self._cholesky = None
+
+    def fit(self, df, target_column=TARGET_COLUMN):
+        """Learn marginals, missing rates and rank correlations from df"""
+        self.columns = list(df.columns)
+        if ID_COLUMN in df.columns:
+            self.id_start = int(pd.to_numeric(df[ID_COLUMN], errors='coerce').max()) + 1
+
+        target = df[target_column] if target_column in df.columns else None
+        modeled = [col for col in self.columns if col != ID_COLUMN]
+        scores = {}
+        for col in modeled:
+            series = df[col]
+            if pd.api.types.is_numeric_dtype(series):
+                self.marginals[col], scores[col] = self._fit_numeric(series)
+            else:
+                self.marginals[col], scores[col] = self._fit_categorical(series, target)
+
+        # Pairwise-complete correlations of the normal scores, scaled back up to
+        # the latent variables for discrete columns
+        corr = pd.DataFrame(scores, columns=modeled).corr().fillna(0.0).to_numpy(copy=True)
+        reliability = np.array([self.marginals[col].get('reliability', 1.0) for col in modeled])
+        corr = np.clip(corr / np.outer(reliability, reliability), -0.99, 0.99)
+        np.fill_diagonal(corr, 1.0)
+        self.correlation = pd.DataFrame(_nearest_correlation(corr), index=modeled, columns=modeled)
+        self._cholesky = np.linalg.cholesky(self.correlation.to_numpy())
+        return self
+
+    def _fit_numeric(self, series):
+        values = series.to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        observed = values[valid]
+        marginal = {
+            'kind': 'numeric',
+            'missing_rate': 1 - valid.mean(),
+            'integer': pd.api.types.is_integer_dtype(series),
+        }
+        unique, counts = np.unique(observed, return_counts=True)
+        if len(unique) <= MAX_DISCRETE_VALUES:
+            marginal['values'] = unique
+            marginal['cumulative'] = np.cumsum(counts) / counts.sum()
+            marginal['reliability'] = _score_reliability(marginal['cumulative'])
+        else:
+            marginal['probabilities'] = np.linspace(0, 1, QUANTILE_POINTS)
+            marginal['quantiles'] = np.quantile(observed, marginal['probabilities'])
+        return marginal, _normal_scores(values, valid)
+
+    def _fit_categorical(self, series, target):
+        # Missing is kept as a level of its own, at its observed rate
+        codes, levels = pd.factorize(series.astype(object), use_na_sentinel=False)
+        frequencies = np.bincount(codes, minlength=len(levels)).astype(float)
+        order = np.arange(len(levels))
+        if target is not None:
+            # Order levels by target rate so the copula can carry their link to the target
+            rates = pd.Series(target.to_numpy(dtype=float)).groupby(codes).mean()
+            order = np.argsort(rates.reindex(order).fillna(0.0).to_numpy(), kind='stable')
+        position = np.empty(len(levels), dtype=int)
+        position[order] = np.arange(len(levels))
+
+        cumulative = np.cumsum(frequencies[order]) / frequencies.sum()
+        marginal = {
+            'kind': 'categorical',
+            'levels': np.asarray(levels, dtype=object)[order],
+            'cumulative': cumulative,
+            'reliability': _score_reliability(cumulative),
+        }
+        # Each level maps to the middle of its band of the uniform scale
+        midpoints = cumulative - frequencies[order] / frequencies.sum() / 2
+        return marginal, ndtri(midpoints[position[codes]])
+
+    def _draw_column(self, marginal, u, rng):
+        if marginal['kind'] == 'categorical':
+            index = np.minimum(np.searchsorted(marginal['cumulative'], u), len(marginal['levels']) - 1)
+            return marginal['levels'][index]
+
+        if 'values' in marginal:
+            index = np.minimum(np.searchsorted(marginal['cumulative'], u), len(marginal['values']) - 1)
+            values = marginal['values'][index]
+        else:
+            values = np.interp(u, marginal['probabilities'], marginal['quantiles'])
+        if marginal['integer']:
+            values = np.round(values)
+
+        if marginal['missing_rate'] > 0:
+            values = values.astype(float)
+            values[rng.random(len(values)) < marginal['missing_rate']] = np.nan
+        elif marginal['integer']:
+            values = values.astype(np.int64)
+        return values
+
+    def sample(self, n_rows, rng, id_start=None):
+        """DataFrame of n_rows synthetic students"""
+        if self._cholesky is None:
+            raise ValueError("Call fit() before generating data")
+        modeled = list(self.correlation.columns)
+        z = rng.standard_normal((n_rows, len(modeled))) @ self._cholesky.T
+        u = ndtr(z)
+
+        data = {}
+        for col in self.columns:
+            if col == ID_COLUMN:
+                start = self.id_start if id_start is None else id_start
+                data[col] = np.arange(start, start + n_rows, dtype=np.int64)
+            else:
+                data[col] = self._draw_column(self.marginals[col], u[:, modeled.index(col)], rng)
+        return pd.DataFrame(data, columns=self.columns)
+
+    def generate_chunks(self, n_rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=42):
+        """Yield n_rows synthetic students as DataFrames of at most chunk_rows rows
+
+        Each chunk has its own generator seeded from (seed, chunk index), so
+        a given seed and chunk size always reproduce the same dataset.
+        """
+        for index, start in enumerate(range(0, n_rows, chunk_rows)):
+            size = min(chunk_rows, n_rows - start)
+            rng = np.random.default_rng([seed, index])
+            yield self.sample(size, rng, id_start=self.id_start + start)
+
+
+def _write_excel(chunks, path, columns):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    for chunk in chunks:
+        for row in chunk.astype(object).where(chunk.notnull(), None).itertuples(index=False):
+            sheet.append(list(row))
+    workbook.save(path)
+
+
+def _write_parquet(chunks, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.Table.from_pandas(chunk, preserve_index=False).schema
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_dataset(generator, n_rows, output, chunk_rows=DEFAULT_CHUNK_ROWS, seed=42):
+    """Generate n_rows students into output (.csv, .parquet/.pq or .xlsx), atomically"""
+    extension = os.path.splitext(output)[1].lower()
+    if extension in ('.parquet', '.pq') and not PARQUET_AVAILABLE:
+        raise ValueError("Parquet output needs pyarrow or fastparquet installed")
+    if extension == '.xlsx' and n_rows > EXCEL_MAX_ROWS:
+        raise ValueError(f"Excel sheets hold at most {EXCEL_MAX_ROWS} rows; use .csv or .parquet")
+    if extension not in ('.csv', '.parquet', '.pq', '.xlsx'):
+        raise ValueError(f"Unsupported output format: {output}")
+
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    tmp_path = f'{output}.{os.getpid()}.tmp'
+    chunks = generator.generate_chunks(n_rows, chunk_rows, seed)
+    try:
+        if extension == '.csv':
+            for index, chunk in enumerate(chunks):
+                chunk.to_csv(tmp_path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+        elif extension == '.xlsx':
+            _write_excel(chunks, tmp_path, generator.columns)
+        else:
+            _write_parquet(chunks, tmp_path)
+        os.replace(tmp_path, output)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output
+
+
+def fit_generator(source=DEFAULT_SOURCE, target_column=TARGET_COLUMN):
+    """Generator fitted to a source dataset (Excel via the parquet cache, Parquet or CSV)"""
+    if source.endswith(('.xlsx', '.xls')):
+        df = read_excel_cached(source)
+    elif source.endswith(('.parquet', '.pq')):
+        df = pd.read_parquet(source)
+    else:
+        df = pd.read_csv(source)
+    return SyntheticStudentGenerator().fit(df, target_column)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic student dataset shaped like the real one')
+    parser.add_argument('--rows', type=int, required=True, help='Number of students to generate')
+    parser.add_argument('--output', required=True, help='Output path: .csv, .parquet/.pq or .xlsx')
+    parser.add_argument('--source', default=DEFAULT_SOURCE, help='Dataset to learn the distributions from')
+    parser.add_argument('--target', default=TARGET_COLUMN)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    print(f"📊 Learning distributions from {args.source}...")
+    generator = fit_generator(args.source, args.target)
+    print(f"🧬 Generating {args.rows} students (seed {args.seed})...")
+    write_dataset(generator, args.rows, args.output, args.chunk_rows, args.seed)
+    print(f"✅ Wrote {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Limiter admission: 429 for a full queue, 503 when no slot frees up in time"""
+
+import threading
+import time
+
+import pytest
+
+from admission import Limiter, Rejected, instrument_app, merge_limits
+
+
+def test_acquire_admits_up_to_concurrency():
+    limiter = Limiter('test', concurrency=2)
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == 0.0
+    assert limiter.active == 2
+
+
+def test_full_queue_is_rejected_with_429():
+    limiter = Limiter('test', concurrency=1, queue=0, wait=1.0)
+    limiter.acquire()
+    with pytest.raises(Rejected) as rejected:
+        limiter.acquire()
+    assert rejected.value.status == 429
+    assert rejected.value.reason == 'queue full'
+    assert rejected.value.retry_after >= 1
+
+
+def test_wait_timeout_is_rejected_with_503():
+    limiter = Limiter('test', concurrency=1, queue=1, wait=0.05)
+    limiter.acquire()
+    with pytest.raises(Rejected) as rejected:
+        limiter.acquire()
+    assert rejected.value.status == 503
+    assert rejected.value.reason == 'wait timeout'
+    assert limiter.waiting == 0
+
+
+def test_queue_full_while_another_request_waits():
+    limiter = Limiter('test', concurrency=1, queue=1, wait=2.0)
+    limiter.acquire()
+    waited = []
+    waiter = threading.Thread(target=lambda: waited.append(limiter.acquire()))
+    waiter.start()
+    while limiter.waiting == 0:
+        time.sleep(0.001)
+
+    with pytest.raises(Rejected) as rejected:
+        limiter.acquire()
+    assert rejected.value.status == 429
+    limiter.release(0.0)
+    waiter.join()
+    assert len(waited) == 1
+
+
+def test_release_admits_a_waiting_request():
+    limiter = Limiter('test', concurrency=1, queue=1, wait=2.0)
+    limiter.acquire()
+    waited = []
+    waiter = threading.Thread(target=lambda: waited.append(limiter.acquire()))
+    waiter.start()
+    while limiter.waiting == 0:
+        time.sleep(0.001)
+
+    limiter.release(0.5)
+    waiter.join()
+    assert len(waited) == 1 and waited[0] > 0
+    assert limiter.active == 1
+    assert limiter.service_seconds == pytest.approx(0.9)
+
+
+def test_merge_limits_overrides_and_drops_classes():
+    limits = merge_limits('{"explain": {"queue": 4}, "heavy": null, "reports": {"wait": 2}}')
+    assert limits['explain']['queue'] == 4
+    assert limits['explain']['concurrency'] == 1
+    assert 'heavy' not in limits
+    assert limits['reports'] == {'concurrency': 1, 'wait': 2}
+
+
+def test_rejected_request_gets_status_and_retry_after():
+    from flask import Flask
+
+    app = Flask(__name__)
+    app.config['ADMISSION_CLASSES'] = {'slow': 'heavy'}
+    app.config['ADMISSION_LIMITS'] = {'heavy': {'concurrency': 0, 'queue': 0}}
+
+    @app.route('/slow')
+    def slow():
+        return 'done'
+
+    instrument_app(app)
+    response = app.test_client().get('/slow')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
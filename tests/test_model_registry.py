@@ -0,0 +1,101 @@
+"""Bundle completeness checks, hot swap and rollback of model_registry"""
+
+import os
+import time
+
+import joblib
+import pytest
+
+import model_registry
+from model_registry import FAST_MODEL_FILE, MODEL_FILE, ModelRegistry, complete_version, write_bundle_manifest
+
+
+def write_bundle(model_dir, name, fast=False):
+    """Minimal bundle whose model is just a labeled dict (a distinct version per name)"""
+    os.makedirs(model_dir, exist_ok=True)
+    joblib.dump({'model': name}, os.path.join(model_dir, MODEL_FILE))
+    for artifact in ['feature_columns.pkl', 'scaler.pkl', 'label_encoders.pkl', 'feature_pipeline.pkl']:
+        joblib.dump({'artifact': artifact}, os.path.join(model_dir, artifact))
+    fast_path = os.path.join(model_dir, FAST_MODEL_FILE)
+    if fast:
+        joblib.dump({'fast_model': name}, fast_path)
+    elif os.path.exists(fast_path):
+        os.remove(fast_path)
+    return write_bundle_manifest(model_dir)['version']
+
+
+def test_complete_version_follows_the_manifest(tmp_path):
+    model_dir = str(tmp_path)
+    assert complete_version(model_dir) is None
+
+    version = write_bundle(model_dir, 'v1')
+    assert complete_version(model_dir) == version
+
+    # A new model file without its manifest is a bundle still being written
+    joblib.dump({'model': 'v2'}, os.path.join(model_dir, MODEL_FILE))
+    assert complete_version(model_dir) is None
+
+
+def test_complete_version_without_manifest_waits_for_the_model_to_settle(tmp_path):
+    model_dir = str(tmp_path)
+    write_bundle(model_dir, 'v1')
+    os.remove(os.path.join(model_dir, model_registry.MANIFEST_NAME))
+    model_path = os.path.join(model_dir, MODEL_FILE)
+    assert complete_version(model_dir) is None
+
+    settled = time.time() - model_registry.SETTLE_SECONDS - 1
+    os.utime(model_path, (settled, settled))
+    assert complete_version(model_dir) == model_registry.model_report.file_version(model_path)
+
+
+def test_check_swaps_and_rollback_restores_the_previous_bundle(tmp_path):
+    model_dir = str(tmp_path)
+    v1 = write_bundle(model_dir, 'v1')
+    registry = ModelRegistry(model_dir)
+    swaps = []
+    registry.on_swap(lambda new, old: swaps.append((new.version, old.version if old else None)))
+    registry.load()
+    assert registry.version == v1
+    assert not registry.check()
+
+    v2 = write_bundle(model_dir, 'v2', fast=True)
+    assert registry.check()
+    assert registry.version == v2
+    assert registry.current.fast_model == {'fast_model': 'v2'}
+    assert registry.previous.version == v1
+
+    bundle = registry.rollback()
+    assert bundle.version == v1
+    assert registry.version == v1
+    assert swaps == [(v1, None), (v2, v1), (v1, v2)]
+    # Files are restored too, so other workers follow, and v1 had no fast model
+    assert complete_version(model_dir) == v1
+    assert not os.path.exists(os.path.join(model_dir, FAST_MODEL_FILE))
+    assert {v['version'] for v in registry.archived_versions()} == {v1, v2}
+
+
+def test_rollback_loads_an_archived_version_in_a_fresh_registry(tmp_path):
+    model_dir = str(tmp_path)
+    v1 = write_bundle(model_dir, 'v1')
+    ModelRegistry(model_dir).load()
+    v2 = write_bundle(model_dir, 'v2')
+
+    registry = ModelRegistry(model_dir)
+    registry.load()
+    assert registry.previous is None
+    assert registry.rollback().version == v1
+    assert registry.current.model == {'model': 'v1'}
+    assert complete_version(model_dir) == v1
+    assert registry.rollback(v2).version == v2
+
+
+def test_rollback_rejects_unknown_versions(tmp_path):
+    model_dir = str(tmp_path)
+    write_bundle(model_dir, 'v1')
+    registry = ModelRegistry(model_dir)
+    registry.load()
+
+    with pytest.raises(ValueError, match='No earlier model version'):
+        registry.rollback()
+    with pytest.raises(ValueError, match='not archived'):
+        registry.rollback('0123456789ab')
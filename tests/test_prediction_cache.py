@@ -0,0 +1,92 @@
+"""PredictionCache hits, LRU eviction and invalidation"""
+
+import numpy as np
+
+from prediction_cache import PredictionCache
+
+
+class CountingModel:
+    """Probabilities derived from the first feature; records how many rows it scored"""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict_proba(self, X):
+        self.calls.append(len(X))
+        return np.column_stack([1 - X[:, 0], X[:, 0]])
+
+
+def rows(*values):
+    return np.array([[value, 1.0] for value in values])
+
+
+def test_cached_rows_skip_the_model():
+    cache, model = PredictionCache(), CountingModel()
+    first = cache.predict_proba(model, rows(0.1, 0.2), 'v1', 'full')
+    second = cache.predict_proba(model, rows(0.2, 0.3, 0.1), 'v1', 'full')
+
+    assert model.calls == [2, 1]
+    np.testing.assert_allclose(second, model.predict_proba(rows(0.2, 0.3, 0.1)))
+    np.testing.assert_allclose(first[1], second[0])
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def test_entries_are_keyed_by_version_and_model():
+    cache, model = PredictionCache(), CountingModel()
+    cache.predict_proba(model, rows(0.1), 'v1', 'full')
+    cache.predict_proba(model, rows(0.1), 'v2', 'full')
+    cache.predict_proba(model, rows(0.1), 'v2', 'fast')
+    assert model.calls == [1, 1, 1]
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache, model = PredictionCache(max_entries=2), CountingModel()
+    cache.predict_proba(model, rows(0.1), 'v1', 'full')
+    cache.predict_proba(model, rows(0.2), 'v1', 'full')
+    cache.predict_proba(model, rows(0.1), 'v1', 'full')  # 0.1 is now the most recent
+    cache.predict_proba(model, rows(0.3), 'v1', 'full')  # evicts 0.2
+
+    assert cache.stats()['entries'] == 2
+    assert cache.evictions == 1
+    model.calls.clear()
+    cache.predict_proba(model, rows(0.1, 0.3), 'v1', 'full')
+    assert model.calls == []
+    cache.predict_proba(model, rows(0.2), 'v1', 'full')
+    assert model.calls == [1]
+
+
+def test_clear_invalidates_every_entry():
+    cache, model = PredictionCache(), CountingModel()
+    cache.predict_proba(model, rows(0.1, 0.2), 'v1', 'full')
+    cache.clear()
+
+    assert cache.stats()['entries'] == 0
+    assert cache.invalidations == 1
+    cache.predict_proba(model, rows(0.1, 0.2), 'v1', 'full')
+    assert model.calls == [2, 2]
+
+
+def test_lookup_only_calls_read_but_never_fill_the_cache():
+    cache, model = PredictionCache(), CountingModel()
+    cache.predict_proba(model, rows(0.1), 'v1', 'full')
+    result = cache.predict_proba(model, rows(0.1, 0.2), 'v1', 'full', store=False)
+
+    assert model.calls == [1, 1]
+    np.testing.assert_allclose(result, model.predict_proba(rows(0.1, 0.2)))
+    assert cache.stats()['entries'] == 1
+
+
+def test_cached_rows_are_copies():
+    cache, model = PredictionCache(), CountingModel()
+    result = cache.predict_proba(model, rows(0.1), 'v1', 'full')
+    result[0, 0] = 42.0
+    assert cache.predict_proba(model, rows(0.1), 'v1', 'full')[0, 0] == 0.9
+
+
+def test_disabled_cache_always_calls_the_model():
+    cache, model = PredictionCache(max_entries=0), CountingModel()
+    cache.predict_proba(model, rows(0.1), 'v1', 'full')
+    cache.predict_proba(model, rows(0.1), 'v1', 'full')
+    cache.predict_proba(model, rows(0.1), None, 'full')
+    assert model.calls == [1, 1, 1]
+    assert cache.stats()['entries'] == 0
@@ -0,0 +1,45 @@
+"""Rescored students must survive a retrain and an artifact cache restore"""
+
+import os
+import shutil
+
+import pandas as pd
+
+import rescoring
+import train_model
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def stored_students(ids):
+    df = pd.read_csv('data/processed_data.csv')
+    return df[df['student_id'].isin(ids)].set_index('student_id')
+
+
+def test_rescored_students_survive_retraining(tmp_path, monkeypatch):
+    shutil.copy(os.path.join(REPO_DIR, 'Dataset.xlsx'), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    train = dict(fast=True, distill=False, prune=False)
+    assert train_model.run_training('Dataset.xlsx', **train) is not None
+
+    # Three new students and one existing student with a changed grade
+    export = pd.read_excel('Dataset.xlsx').head(4).copy()
+    changed_id = export['student_id'].iloc[3]
+    export['student_id'] = [900000001, 900000002, 900000003, changed_id]
+    export.loc[3, 'cgpa'] = 9.87
+    export.to_csv('export.csv', index=False)
+    rescoring.rescore_export('export.csv')
+    ids = list(export['student_id'])
+    assert len(stored_students(ids)) == 4
+
+    # Cache hit: the restored bundle's CSV predates the rescoring run
+    assert train_model.run_training('Dataset.xlsx', **train) is not None
+    rows = stored_students(ids)
+    assert len(rows) == 4
+    assert rows.loc[changed_id, 'cgpa'] == 9.87
+
+    # Full retrain: training rewrites the CSV from the dataset
+    assert train_model.run_training('Dataset.xlsx', use_cache=False, **train) is not None
+    rows = stored_students(ids)
+    assert len(rows) == 4
+    assert rows.loc[changed_id, 'cgpa'] == 9.87
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.base import clone
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
@@ -8,13 +9,140 @@ from sklearn.feature_selection import SelectFromModel
 import xgboost as xgb
 import joblib
 import os
+import time
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import warnings
-import shap
-import matplotlib.pyplot as plt
-import seaborn as sns
+from dataset_cache import read_excel_cached, file_sha256
+from features import (FeaturePipeline, PIPELINE_PATH, DERIVED_FEATURES, INTERACTION_FEATURES,
+                      FAILURE_RISK_FEATURE, TARGET_DERIVED_COLUMNS)
+from chunked_training import (DEFAULT_CHUNK_ROWS, BatchIter, expand_sources, external_memory_matrix,
+                              holdout_mask, iter_chunks, sample_rows, subset_scaler, SAMPLE_KEY)
+import model_registry
+import model_report
+import diagnostics
+import artifact_cache
+import rescoring
 warnings.filterwarnings('ignore')
 
+# Default XGBoost settings used when no tuned parameters are supplied
+XGBOOST_DEFAULT_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 6,
+    'learning_rate': 0.1,
+}
+
+# Search space for tune_hyperparameters()
+TUNING_SPACE = {
+    'max_depth': [3, 4, 5, 6, 8],
+    'learning_rate': (0.02, 0.3),  # sampled log-uniformly
+    'subsample': [0.6, 0.8, 1.0],
+    'colsample_bytree': [0.6, 0.8, 1.0],
+    'min_child_weight': [1, 3, 5],
+}
+
+# Student model fitted to the full model's probabilities for low-latency serving
+DISTILL_DEFAULT_PARAMS = {
+    'n_estimators': 20,
+    'max_depth': 3,
+    'learning_rate': 0.3,
+}
+# A student is only saved when it agrees with the full model often enough
+# (fidelity, % of held-out rows) and answers a single row enough faster
+DISTILL_GATES = {
+    'min_fidelity': 97.0,
+    'min_speedup': 1.5,
+}
+
+FAST_MODEL_PATH = 'models/student_engagement_model_fast.pkl'
+
+# Feature pruning: near-duplicate correlation and SelectFromModel importance cut-off
+PRUNING_DEFAULTS = {
+    'correlation_threshold': 0.95,
+    'importance_threshold': '0.5*mean',
+    'tolerance': 0.5,  # largest validation accuracy drop (percentage points) accepted
+    'validation_size': 0.2,  # share of the training rows held back to judge pruning
+}
+
+# Booster settings that re-fit the leaf values of existing trees without growing new ones
+LEAF_REFRESH_PARAMS = {
+    'process_type': 'update',
+    'updater': 'refresh',
+    'refresh_leaf': True,
+    'tree_method': 'exact',  # the refresh updater can't run on the hist QuantileDMatrix
+}
+
+INCREMENTAL_MODES = ['continue', 'refresh']
+
+# Per-process state for tuning workers (set once by the pool initializer)
+_tuning_data = {}
+
+
+def _init_tuning_worker(X, y, folds, threads):
+    """Give each tuning worker its copy of the data and a thread budget"""
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    _tuning_data.update(X=X, y=y, folds=folds, threads=threads)
+
+
+def _run_tuning_trial(trial_id, params, fold, max_rounds, early_stopping_rounds):
+    """Fit one configuration on one fold with early stopping and time it"""
+    X, y = _tuning_data['X'], _tuning_data['y']
+    train_idx, valid_idx = _tuning_data['folds'][fold]
+    y_train = y[train_idx]
+
+    positives = max(int((y_train == 1).sum()), 1)
+    negatives = max(int((y_train == 0).sum()), 1)
+
+    model = xgb.XGBClassifier(
+        n_estimators=max_rounds,
+        random_state=42,
+        eval_metric='logloss',
+        early_stopping_rounds=early_stopping_rounds,
+        scale_pos_weight=negatives / positives,
+        n_jobs=_tuning_data['threads'],
+        **params
+    )
+
+    start = time.perf_counter()
+    model.fit(X[train_idx], y_train, eval_set=[(X[valid_idx], y[valid_idx])], verbose=False)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predictions = model.predict(X[valid_idx])
+    predict_seconds = time.perf_counter() - start
+
+    return {
+        'trial_id': trial_id,
+        'fold': fold,
+        'accuracy': float((predictions == y[valid_idx]).mean()),
+        'best_iteration': int(model.best_iteration),
+        'fit_seconds': fit_seconds,
+        'predict_us_per_row': predict_seconds / len(valid_idx) * 1e6,
+    }
+
+def _predict_latency_us(model, X, single_rows=200):
+    """Per-row predict_proba latency one row at a time (interactive) and in one batch"""
+    rows = X[:single_rows]
+    start = time.perf_counter()
+    for i in range(len(rows)):
+        model.predict_proba(rows[i:i + 1])
+    single = (time.perf_counter() - start) / max(len(rows), 1) * 1e6
+
+    start = time.perf_counter()
+    model.predict_proba(X)
+    batch = (time.perf_counter() - start) / max(len(X), 1) * 1e6
+    return {'single_row': single, 'batch_per_row': batch}
+
+def read_dataset(path):
+    """Read a student dataset from Excel (via the parquet cache), Parquet or CSV"""
+    if path.endswith(('.xlsx', '.xls')):
+        return read_excel_cached(path)
+    if path.endswith(('.parquet', '.pq')):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
 class StudentEngagementPredictor:
     def __init__(self, data_path='Dataset.xlsx'):
         self.data_path = data_path
@@ -22,14 +150,18 @@ class StudentEngagementPredictor:
         self.scaler = None
         self.feature_columns = None
         self.label_encoders = {}
+        self.feature_pipeline = None
         self.target_column = None
         self.explainer = None
+        self.fast_model = None
+        self.distillation = None
         self.training_history = {}
+        self.evaluation_data = None
 
     def load_and_analyze_data(self):
         """Load and perform initial analysis of the dataset"""
         print("🔍 Loading dataset...")
-        df = pd.read_excel(self.data_path)
+        df = read_dataset(self.data_path)
 
         print(f"📊 Dataset shape: {df.shape}")
         print("\n📋 Column information:")
@@ -40,51 +172,53 @@ class StudentEngagementPredictor:
 
         print("📈 Missing values:", df.isnull().sum()[df.isnull().sum() > 0])
 
-        print("🎯 Identifying target variable..." )       # Look for potential target variables
+        print("🎯 Identifying target variable..." )
+        self.target_column = self.find_target_column(df.columns)
+        if self.target_column is None:
+            print("No obvious target variable found. Available columns:", list(df.columns))
+            return None
+
+        return df
+
+    def find_target_column(self, columns):
+        """Pick the target column by name, or None if nothing looks like one"""
+        # Look for potential target variables
         potential_targets = []
-        for col in df.columns:
+        for col in columns:
             if any(word in col.lower() for word in
                    ['engage', 'drop', 'risk', 'performance', 'gpa', 'grade', 'status', 'complete', 'disengage', 'dropout', 'fail']):
                 potential_targets.append(col)
 
         # Check for dropout column specifically (common in student datasets)
-        if 'dropout' in df.columns:
-            self.target_column = 'dropout'
-        elif potential_targets:
+        if 'dropout' in columns:
+            return 'dropout'
+        if potential_targets:
             print(f"Potential target variables: {potential_targets}")
             # Assume first match is target (can be modified)
-            self.target_column = potential_targets[0]
-        else:
-            print("No obvious target variable found. Available columns:", list(df.columns))
-            return None
-
-        return df
+            return potential_targets[0]
+        return None
 
     def preprocess_data(self, df):
         """Clean and preprocess the data"""
         print("🧹 Preprocessing data...")
 
-        # Handle missing values
-        for col in df.columns:
-            if df[col].isnull().sum() > 0:
-                if df[col].dtype in ['int64', 'float64']:
-                    # Fill numerical with median
-                    df[col].fillna(df[col].median(), inplace=True)
-                else:
-                    # Fill categorical with mode
-                    df[col].fillna(df[col].mode()[0], inplace=True)
-
-        # Encode categorical variables
-        categorical_cols = df.select_dtypes(include=['object']).columns.tolist()
-
-        # Remove target if it's categorical
-        if self.target_column in categorical_cols:
-            categorical_cols.remove(self.target_column)
-
-        for col in categorical_cols:
-            if col not in self.label_encoders:
-                self.label_encoders[col] = LabelEncoder()
-            df[col] = self.label_encoders[col].fit_transform(df[col].astype(str))
+        # Fit imputation values, label-encoder lookup tables and feature
+        # sources once; serving reuses the same fitted pipeline
+        self.feature_pipeline = FeaturePipeline().fit(df, self.target_column)
+
+        # Handle missing values and encode categorical variables
+        df = self.feature_pipeline.encode(df)
+
+        if df[self.target_column].isnull().sum() > 0:
+            if df[self.target_column].dtype in ['int64', 'float64']:
+                df[self.target_column] = df[self.target_column].fillna(df[self.target_column].median())
+            else:
+                df[self.target_column] = df[self.target_column].fillna(df[self.target_column].mode()[0])
+
+        # Keep LabelEncoder objects in sync for consumers of label_encoders.pkl
+        for col, classes in self.feature_pipeline.categorical_classes.items():
+            self.label_encoders[col] = LabelEncoder()
+            self.label_encoders[col].classes_ = np.array(classes)
 
         # Create risk levels from target variable
         print(f"🎯 Target variable: {self.target_column}")
@@ -130,63 +264,40 @@ class StudentEngagementPredictor:
         return df
 
     def create_features(self, df):
-        """Create additional features for better prediction"""
-        print("🔧 Creating features...")
-
-        # Performance indicators
-        numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+        """Create additional features for better prediction
 
-        # Attendance-related features
-        attendance_cols = [col for col in numerical_cols if 'attend' in col.lower()]
-        if attendance_cols:
-            df['attendance_rate'] = df[attendance_cols[0]]
-
-        # Academic performance features
-        grade_cols = [col for col in numerical_cols if any(word in col.lower()
-                     for word in ['gpa', 'grade', 'mark', 'score', 'cgpa'])]
-        if grade_cols:
-            df['academic_performance'] = df[grade_cols[0]]
-
-        # Study behavior features
-        study_cols = [col for col in numerical_cols if any(word in col.lower()
-                     for word in ['study', 'hour', 'time'])]
-        if study_cols:
-            df['study_intensity'] = df[study_cols[0]]
-
-        # Assignment/project features
-        assignment_cols = [col for col in numerical_cols if any(word in col.lower()
-                          for word in ['assignment', 'project', 'submit'])]
-        if assignment_cols:
-            df['assignment_completion'] = df[assignment_cols[0]]
-
-        # Activity features
-        activity_cols = [col for col in numerical_cols if 'activit' in col.lower()]
-        if activity_cols:
-            df['activity_participation'] = df[activity_cols[0]]
+        Source columns for attendance, academic performance, study, assignment
+        and activity features (plus their interactions and failure risk) were
+        resolved when the feature pipeline was fitted.
+        """
+        print("🔧 Creating features...")
+        return self.feature_pipeline.add_features(df)
 
-        # Create interaction features
-        if 'attendance_rate' in df.columns and 'academic_performance' in df.columns:
-            df['attendance_performance_interaction'] = df['attendance_rate'] * df['academic_performance']
+    def candidate_feature_columns(self, columns):
+        """Everything except ids and target columns"""
+        return [col for col in columns if col not in
+                ['risk_level', 'risk_level_encoded', self.target_column, 'engagement_score', 'student_id', 'name']]
 
-        if 'study_intensity' in df.columns and 'assignment_completion' in df.columns:
-            df['study_assignment_interaction'] = df['study_intensity'] * df['assignment_completion']
+    def select_feature_columns(self, df):
+        """Candidate model inputs: everything except ids and target columns, minus constants"""
+        feature_cols = self.candidate_feature_columns(df.columns)
 
-        # Risk indicators
-        if 'past_failures' in df.columns:
-            df['failure_risk'] = df['past_failures'] > 0
+        # Remove columns with low variance
+        return [col for col in feature_cols if df[col].std() > 0.01]
 
-        return df
+    def train_model(self, df, model_type='xgboost', model_params=None, fast=False, prune=False):
+        """Train the machine learning model
 
-    def train_model(self, df, model_type='xgboost'):
-        """Train the machine learning model"""
+        model_params overrides the default XGBoost settings, e.g. with the
+        result of tune_hyperparameters(). prune runs prune_features() before
+        any diagnostics, so they describe the final model. fast skips
+        cross-validation, plots and SHAP; run diagnostics.py afterwards if
+        those are needed.
+        """
         print(f"🤖 Training {model_type} model...")
 
         # Prepare features and target
-        feature_cols = [col for col in df.columns if col not in
-                       ['risk_level', 'risk_level_encoded', self.target_column, 'engagement_score', 'student_id', 'name']]
-
-        # Remove columns with low variance
-        feature_cols = [col for col in feature_cols if df[col].std() > 0.01]
+        feature_cols = self.select_feature_columns(df)
 
         self.feature_columns = feature_cols
         X = df[feature_cols]
@@ -204,6 +315,7 @@ class StudentEngagementPredictor:
         self.scaler = StandardScaler()
         X_train_scaled = self.scaler.fit_transform(X_train)
         X_test_scaled = self.scaler.transform(X_test)
+        self.feature_pipeline.set_feature_columns(feature_cols, self.scaler)
 
         # Train model
         if model_type.lower() == 'xgboost':
@@ -212,13 +324,12 @@ class StudentEngagementPredictor:
             total_samples = len(y_train)
             class_weights = total_samples / (len(class_counts) * class_counts)
 
+            params = {**XGBOOST_DEFAULT_PARAMS, **(model_params or {})}
             self.model = xgb.XGBClassifier(
-                n_estimators=100,
-                max_depth=6,
-                learning_rate=0.1,
                 random_state=42,
                 eval_metric='logloss',
-                scale_pos_weight=class_weights[1] / class_weights[0]  # Weight for positive class
+                scale_pos_weight=class_weights[1] / class_weights[0],  # Weight for positive class
+                **params
             )
         elif model_type.lower() == 'randomforest':
             # Calculate class weights for Random Forest
@@ -244,55 +355,486 @@ class StudentEngagementPredictor:
 
         print(f"📊 Training accuracy: {train_score:.3f}")
         print(f"📊 Test accuracy: {test_score:.3f}")
-        # Cross-validation
-        cv_scores = cross_val_score(self.model, X_train_scaled, y_train, cv=5)
-        print(f"🔍 Cross-validation scores: {cv_scores.mean():.3f} (+/- {cv_scores.std() * 2:.3f})")
-
-        # Feature importance
-        self.plot_feature_importance()
-
-        # Create SHAP explainer
-        self.create_shap_explainer(X_train_scaled, feature_cols)
 
         # Save processed data
         df.to_csv('data/processed_data.csv', index=False)
 
-        return X_test_scaled, y_test, feature_cols
+        # Keep the splits for pruning, distillation and the performance report
+        self.evaluation_data = {
+            'train': (X_train_scaled, y_train),
+            'held_out': (X_test_scaled, y_test),
+            'full_data': (self.scaler.transform(X), y)
+        }
+
+        if prune:
+            self.prune_features()
+        X_train_scaled, y_train = self.evaluation_data['train']
+        X_test_scaled, y_test = self.evaluation_data['held_out']
+
+        if fast:
+            print("⚡ Fast mode: skipping cross-validation, plots and SHAP")
+        else:
+            # Cross-validation
+            cv_scores = cross_val_score(self.model, X_train_scaled, y_train, cv=5)
+            print(f"🔍 Cross-validation scores: {cv_scores.mean():.3f} (+/- {cv_scores.std() * 2:.3f})")
+
+            # Feature importance
+            self.plot_feature_importance()
+
+            # Create SHAP explainer
+            self.create_shap_explainer(X_train_scaled, self.feature_columns)
+
+        return X_test_scaled, y_test, self.feature_columns
+
+    def tune_hyperparameters(self, df, n_trials=18, eta=3, min_rounds=50, max_rounds=450,
+                             n_folds=3, early_stopping_rounds=20, n_jobs=None,
+                             accuracy_tolerance=0.005, random_state=42):
+        """Search XGBoost settings with successive halving across a process pool
+
+        n_trials random configurations start with min_rounds boosting rounds;
+        after each rung only the best 1/eta survive and get eta times more
+        rounds, up to max_rounds. Every (trial, fold) fit runs in its own
+        worker with early stopping on the fold's validation split and an even
+        share of the CPU threads. Only the training split is used, so the
+        held-out test set stays untouched.
+
+        Returns the chosen parameters (with n_estimators set from the early
+        stopping point). Among configurations within accuracy_tolerance of the
+        best, the one with the lowest prediction latency wins.
+        """
+        from sklearn.model_selection import StratifiedKFold
+
+        print(f"🎛️  Tuning hyperparameters ({n_trials} trials, {n_folds} folds)...")
+        search_start = time.perf_counter()
+
+        feature_cols = self.select_feature_columns(df)
+        X = df[feature_cols].to_numpy(dtype=np.float32)
+        y = df['risk_level_encoded'].to_numpy()
+
+        # Same split as train_model(); tune on the training part only
+        train_idx, _ = train_test_split(
+            np.arange(len(y)), test_size=0.2, random_state=42, stratify=y
+        )
+        X, y = X[train_idx], y[train_idx]
+        folds = list(StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=random_state).split(X, y))
+
+        rng = np.random.RandomState(random_state)
+        low, high = TUNING_SPACE['learning_rate']
+        trials = {}
+        for trial_id in range(n_trials):
+            trials[trial_id] = {
+                'max_depth': int(rng.choice(TUNING_SPACE['max_depth'])),
+                'learning_rate': float(np.exp(rng.uniform(np.log(low), np.log(high)))),
+                'subsample': float(rng.choice(TUNING_SPACE['subsample'])),
+                'colsample_bytree': float(rng.choice(TUNING_SPACE['colsample_bytree'])),
+                'min_child_weight': int(rng.choice(TUNING_SPACE['min_child_weight'])),
+            }
+
+        cpu_count = os.cpu_count() or 1
+        workers = n_jobs or min(cpu_count, n_trials * n_folds)
+        threads = max(1, cpu_count // workers)
+
+        leaderboard = []
+        survivors = list(trials)
+        rounds = min_rounds
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_tuning_worker,
+                                 initargs=(X, y, folds, threads)) as pool:
+            while survivors:
+                futures = [pool.submit(_run_tuning_trial, trial_id, trials[trial_id], fold,
+                                       rounds, early_stopping_rounds)
+                           for trial_id in survivors for fold in range(n_folds)]
+                results = [future.result() for future in futures]
+
+                rung = []
+                for trial_id in survivors:
+                    fold_results = [r for r in results if r['trial_id'] == trial_id]
+                    rung.append({
+                        'trial_id': trial_id,
+                        'rounds_budget': rounds,
+                        'params': trials[trial_id],
+                        'accuracy': float(np.mean([r['accuracy'] for r in fold_results])),
+                        'accuracy_std': float(np.std([r['accuracy'] for r in fold_results])),
+                        'n_estimators': int(np.mean([r['best_iteration'] for r in fold_results])) + 1,
+                        'fit_seconds': float(np.mean([r['fit_seconds'] for r in fold_results])),
+                        'predict_us_per_row': float(np.mean([r['predict_us_per_row'] for r in fold_results])),
+                    })
+                rung.sort(key=lambda r: r['accuracy'], reverse=True)
+                leaderboard.extend(rung)
+
+                print(f"   Rung with {rounds} rounds: {len(rung)} trials, "
+                      f"best accuracy {rung[0]['accuracy']:.3f}")
+
+                if rounds >= max_rounds or len(rung) == 1:
+                    break
+                survivors = [r['trial_id'] for r in rung[:max(1, len(rung) // eta)]]
+                rounds = min(rounds * eta, max_rounds)
+
+        final_rung = [r for r in leaderboard if r['rounds_budget'] == rounds]
+        best_accuracy = max(r['accuracy'] for r in final_rung)
+        contenders = [r for r in final_rung if r['accuracy'] >= best_accuracy - accuracy_tolerance]
+        best = min(contenders, key=lambda r: r['predict_us_per_row'])
+
+        elapsed = time.perf_counter() - search_start
+        print(f"\n{'trial':>5} {'rounds':>6} {'trees':>5} {'accuracy':>8} {'fit s':>7} {'us/row':>7}")
+        for r in sorted(leaderboard, key=lambda r: (-r['rounds_budget'], -r['accuracy'])):
+            print(f"{r['trial_id']:>5} {r['rounds_budget']:>6} {r['n_estimators']:>5} "
+                  f"{r['accuracy']:>8.3f} {r['fit_seconds']:>7.2f} {r['predict_us_per_row']:>7.2f}")
+
+        best_params = {**best['params'], 'n_estimators': best['n_estimators']}
+        print(f"\n🏆 Selected trial {best['trial_id']}: accuracy {best['accuracy']:.3f}, "
+              f"{best['predict_us_per_row']:.2f} us/row, params {best_params}")
+        print(f"⏱️  Search took {elapsed:.1f}s with {workers} workers x {threads} threads")
+
+        self.training_history['tuning'] = {
+            'best_params': best_params,
+            'search_seconds': elapsed,
+            'leaderboard': leaderboard,
+        }
+        return best_params
+
+    def train_chunked(self, sources, chunk_rows=DEFAULT_CHUNK_ROWS, model_params=None, sample_size=100000,
+                      test_size=0.2, max_eval_rows=200000, processed_path='data/processed_data.csv',
+                      random_state=42):
+        """Out-of-core training for datasets larger than memory
+
+        sources is a data file (Parquet, CSV or Excel), a directory of them or
+        a list. Nothing ever holds more than one chunk of the full dataset:
+
+        1. A first pass collects category values and target labels and keeps
+           a uniform sample of sample_size rows to fit imputation values.
+        2. A second pass writes processed_data.csv chunk by chunk, fits the
+           StandardScaler with partial_fit on the training rows and keeps up
+           to max_eval_rows held-out rows for evaluation.
+        3. XGBoost trains from an ExtMemQuantileDMatrix that re-reads the
+           chunks and pages its quantized data to a temporary directory.
+
+        Constant features are dropped using the streamed variance. Returns
+        (X_test_scaled, y_test, feature_cols) like train_model().
+        """
+        start = time.perf_counter()
+        sources = expand_sources(sources)
+        print(f"🌊 Chunked training on {len(sources)} file(s), {chunk_rows} rows per chunk...")
+
+        # Pass 1: categories and labels over every row, plus a bounded sample
+        rng = np.random.default_rng(random_state)
+        sample, categories, targets, total_rows = None, {}, set(), 0
+        for chunk in iter_chunks(sources, chunk_rows):
+            if self.target_column is None:
+                self.target_column = self.find_target_column(chunk.columns)
+                if self.target_column is None:
+                    raise ValueError(f"No target column found in {list(chunk.columns)}")
+            total_rows += len(chunk)
+            targets.update(chunk[self.target_column].dropna().unique().tolist())
+            for col in self.candidate_feature_columns(chunk.columns):
+                if not pd.api.types.is_numeric_dtype(chunk[col]):
+                    categories.setdefault(col, set()).update(chunk[col].dropna().astype(str).unique())
+            sample = sample_rows(sample, chunk, sample_size, rng)
+        sample = sample.drop(columns=SAMPLE_KEY)
+        print(f"📊 {total_rows} rows; fitting imputation values on a {len(sample)}-row sample")
+
+        self.feature_pipeline = FeaturePipeline().fit(sample, self.target_column)
+        self.feature_pipeline.add_categories(categories)
+        for col, classes in self.feature_pipeline.categorical_classes.items():
+            self.label_encoders[col] = LabelEncoder()
+            self.label_encoders[col].classes_ = np.array(classes)
+
+        # Risk levels follow preprocess_data(); quantile bins would need every row at once
+        numeric_target = pd.api.types.is_numeric_dtype(sample[self.target_column])
+        if numeric_target:
+            if not targets <= {0, 1}:
+                raise ValueError("Chunked training supports binary or categorical targets; "
+                                 "use the in-memory path for multi-valued numeric targets")
+            label_map = {0: 'Low', 1: 'High'}
+        else:
+            label_map = {value: str(value) for value in targets}
+        target_fill = sample[self.target_column].mode()[0]
+
+        self.label_encoders['risk_level'] = LabelEncoder()
+        self.label_encoders['risk_level'].classes_ = np.array(sorted(set(label_map.values())))
+        risk_codes = {label: code for code, label in enumerate(self.label_encoders['risk_level'].classes_)}
+
+        def label(chunk):
+            target = chunk[self.target_column].fillna(target_fill)
+            risk_level = target.map(label_map)
+            return target, risk_level, risk_level.map(risk_codes).to_numpy(dtype=np.int64)
+
+        # Pass 2: processed data, scaler statistics and the held-out rows
+        candidates = None
+        scaler = StandardScaler()
+        label_counts = np.zeros(len(risk_codes), dtype=np.int64)
+        eval_X, eval_y, eval_rows = [], [], 0
+        tmp_path = f'{processed_path}.{os.getpid()}.tmp' if processed_path else None
+
+        for index, chunk in enumerate(iter_chunks(sources, chunk_rows)):
+            target, risk_level, y = label(chunk)
+
+            if tmp_path:
+                processed = self.feature_pipeline.encode(chunk)
+                processed[self.target_column] = target
+                processed['risk_level'] = risk_level
+                processed['risk_level_encoded'] = y
+                processed['engagement_score'] = (target if numeric_target else
+                                                 risk_level.map({'Low': 85, 'Medium': 65, 'High': 35}).fillna(50))
+                processed = self.feature_pipeline.add_features(processed)
+                processed.to_csv(tmp_path, mode='a' if index else 'w', header=not index, index=False)
+
+            if candidates is None:
+                columns = self.feature_pipeline.add_features(self.feature_pipeline.encode(chunk.head(1))).columns
+                candidates = self.candidate_feature_columns(columns)
+                self.feature_pipeline.set_feature_columns(candidates)
+
+            X = self.feature_pipeline.feature_matrix(chunk, scale=False)
+            mask = holdout_mask(index, len(chunk), test_size, random_state)
+            if (~mask).any():
+                scaler.partial_fit(X[~mask])
+                label_counts += np.bincount(y[~mask], minlength=len(label_counts))
+            if mask.any() and eval_rows < max_eval_rows:
+                eval_X.append(X[mask][:max_eval_rows - eval_rows])
+                eval_y.append(y[mask][:max_eval_rows - eval_rows])
+                eval_rows += len(eval_y[-1])
+
+        if tmp_path:
+            os.replace(tmp_path, processed_path)
+
+        # Remove columns with low variance
+        keep = [i for i, col in enumerate(candidates) if np.sqrt(scaler.var_[i]) > 0.01]
+        self.feature_columns = [candidates[i] for i in keep]
+        self.scaler = subset_scaler(scaler, keep)
+        self.feature_pipeline.set_feature_columns(self.feature_columns, self.scaler)
+        print(f"🎯 Using {len(self.feature_columns)} features for training")
+        print(f"📊 Target distribution: {dict(zip(self.label_encoders['risk_level'].classes_.tolist(), label_counts.tolist()))}")
+
+        # Pass 3+: XGBoost streams the training rows into its external-memory cache
+        def batches():
+            for index, chunk in enumerate(iter_chunks(sources, chunk_rows)):
+                train_rows = ~holdout_mask(index, len(chunk), test_size, random_state)
+                if train_rows.any():
+                    chunk = chunk[train_rows]
+                    yield self.feature_pipeline.feature_matrix(chunk), label(chunk)[2]
+
+        params = {**XGBOOST_DEFAULT_PARAMS, **(model_params or {})}
+        self.model = xgb.XGBClassifier(
+            random_state=42,
+            eval_metric='logloss',
+            scale_pos_weight=label_counts[0] / max(label_counts[1], 1),  # Weight for positive class
+            **params
+        )
+        booster_params = {key: value for key, value in self.model.get_xgb_params().items() if value is not None}
+        booster_params['tree_method'] = 'hist'
+        if len(risk_codes) > 2:
+            booster_params.update(objective='multi:softprob', num_class=len(risk_codes))
+
+        with tempfile.TemporaryDirectory(prefix='xgb-extmem-') as cache_dir:
+            train_matrix = external_memory_matrix(BatchIter(batches, os.path.join(cache_dir, 'train')))
+            booster = xgb.train(booster_params, train_matrix, num_boost_round=params['n_estimators'])
+            del train_matrix
+        # Wrap the booster so the saved model works like train_model()'s
+        self.model.load_model(bytearray(booster.save_raw('ubj')))
+
+        if not eval_y:
+            raise ValueError("No held-out rows to evaluate; increase test_size")
+        X_test = self.scaler.transform(np.concatenate(eval_X)[:, keep])
+        y_test = np.concatenate(eval_y)
+        print(f"📊 Test accuracy: {(self.model.predict(X_test) == y_test).mean():.3f} ({len(y_test)} held-out rows)")
+
+        self.evaluation_data = {'held_out': (X_test, y_test), 'full_data': None}
+        self.training_history['training_samples'] = total_rows
+        self.training_history['chunked'] = {
+            'sources': sources,
+            'chunk_rows': chunk_rows,
+            'training_rows': int(label_counts.sum()),
+            'seconds': time.perf_counter() - start,
+        }
+        print(f"⏱️  Chunked training took {time.perf_counter() - start:.1f}s")
+        return X_test, y_test, self.feature_columns
+
+    def prune_features(self, correlation_threshold=PRUNING_DEFAULTS['correlation_threshold'],
+                       importance_threshold=PRUNING_DEFAULTS['importance_threshold'],
+                       tolerance=PRUNING_DEFAULTS['tolerance'],
+                       validation_size=PRUNING_DEFAULTS['validation_size']):
+        """Drop duplicate and low-importance features, retrain, and report the accuracy delta
+
+        Features correlated above correlation_threshold with one already kept
+        are duplicates (source columns win over engineered copies such as
+        academic_performance = cgpa). SelectFromModel then drops features
+        below importance_threshold for a model trained without duplicates.
+        Candidates are fit on the training rows minus a validation_size
+        share held back to score them: the reduced set wins only if its
+        validation accuracy drops by at most tolerance points; otherwise only
+        the duplicates are removed, or nothing. The winner is refit on all
+        training rows. The held-out split is only used for the reported
+        before/after accuracy.
+        """
+        if not self.evaluation_data or 'train' not in self.evaluation_data:
+            print("⚠️  No in-memory training split; skipping feature pruning")
+            return None
+
+        print("✂️  Pruning features...")
+        X_train, y_train = self.evaluation_data['train']
+        X_test, y_test = self.evaluation_data['held_out']
+        y_train = np.asarray(y_train)
+        columns = self.feature_columns
+        held_out_before = self.model.score(X_test, y_test) * 100
+
+        # Selection is judged on part of the training rows, never the held-out split
+        fit_idx, val_idx = train_test_split(np.arange(len(y_train)), test_size=validation_size,
+                                            random_state=42, stratify=y_train)
+        X_fit, y_fit = X_train[fit_idx], y_train[fit_idx]
+        X_val, y_val = X_train[val_idx], y_train[val_idx]
+        baseline = clone(self.model).fit(X_fit, y_fit).score(X_val, y_val) * 100
+
+        # 1. Near-duplicates, preferring source columns over engineered copies
+        pipeline = self.feature_pipeline
+        engineered = ({name for name, source in pipeline.derived_sources.items() if name != source}
+                      | {name for name, _, _ in pipeline.interactions} | {FAILURE_RISK_FEATURE[0]})
+        order = sorted(range(len(columns)), key=lambda i: columns[i] in engineered)
+        corr = np.nan_to_num(np.abs(np.corrcoef(X_train, rowvar=False)))
+
+        kept, correlated = [], []
+        for i in order:
+            partner = next((j for j in kept if corr[i, j] >= correlation_threshold), None)
+            if partner is None:
+                kept.append(i)
+            else:
+                correlated.append({'feature': columns[i], 'duplicate_of': columns[partner],
+                                   'correlation': corr[i, partner]})
+        kept.sort()
+
+        # 2. Low importance, judged by a model trained without the duplicates
+        deduped_model = clone(self.model).fit(X_fit[:, kept], y_fit)
+        support = SelectFromModel(deduped_model, threshold=importance_threshold, prefit=True).get_support()
+        selected = [i for i, keep in zip(kept, support) if keep]
+        low_importance = [columns[i] for i, keep in zip(kept, support) if not keep]
+
+        # 3. Retrain on the reduced set, backing off if accuracy drops too far
+        pruned_accuracy = clone(self.model).fit(X_fit[:, selected], y_fit).score(X_val[:, selected], y_val) * 100
+        deduped_accuracy = deduped_model.score(X_val[:, kept], y_val) * 100
+
+        if pruned_accuracy >= baseline - tolerance:
+            chosen, accuracy = selected, pruned_accuracy
+        elif deduped_accuracy >= baseline - tolerance:
+            print(f"   Importance pruning cost {baseline - pruned_accuracy:.2f} points; removing duplicates only")
+            chosen, accuracy, low_importance = kept, deduped_accuracy, []
+        else:
+            print(f"   Pruning cost more than {tolerance} points; keeping all features")
+            chosen, accuracy, correlated, low_importance = list(range(len(columns))), baseline, [], []
+
+        held_out_after = held_out_before
+        if len(chosen) < len(columns):
+            self.model = clone(self.model).fit(X_train[:, chosen], y_train)
+            self.feature_columns = [columns[i] for i in chosen]
+            self.scaler = subset_scaler(self.scaler, chosen)
+            self.feature_pipeline.set_feature_columns(self.feature_columns, self.scaler)
+            self.evaluation_data = {key: (X[:, chosen], y) for key, (X, y) in self.evaluation_data.items()}
+            held_out_after = self.model.score(X_test[:, chosen], y_test) * 100
+
+        summary = model_report.to_json_safe({
+            'features_before': len(columns),
+            'features_after': len(chosen),
+            'correlated': correlated,
+            'low_importance': low_importance,
+            'thresholds': {'correlation': correlation_threshold, 'importance': importance_threshold},
+            'validation_accuracy': {'before': baseline, 'after': accuracy, 'delta': accuracy - baseline},
+            'accuracy': {'before': held_out_before, 'after': held_out_after,
+                         'delta': held_out_after - held_out_before},
+        })
+        self.training_history['feature_pruning'] = summary
+
+        for item in correlated:
+            print(f"   Duplicate: {item['feature']} ~ {item['duplicate_of']} (r={item['correlation']:.3f})")
+        if low_importance:
+            print(f"   Low importance: {', '.join(low_importance)}")
+        print(f"   {len(columns)} → {len(chosen)} features; validation accuracy "
+              f"{baseline:.2f}% → {accuracy:.2f}% ({accuracy - baseline:+.2f}), held-out "
+              f"{held_out_before:.2f}% → {held_out_after:.2f}%")
+        return summary
+
+    def distill_model(self, student_params=None, gates=None):
+        """Fit a small, shallow student model to the trained model's probabilities
+
+        Binary models train the student on the teacher's soft probabilities
+        (binary:logistic accepts fractional labels); multi-class models fall
+        back to the teacher's predicted labels. Reports fidelity (agreement
+        with the full model), the accuracy gap and the per-row latency gain
+        on the held-out split. The student is kept only if it passes gates
+        (default DISTILL_GATES); app.py then serves interactive endpoints
+        from it, and from the full model otherwise.
+        """
+        if not self.evaluation_data or 'train' not in self.evaluation_data:
+            print("⚠️  No in-memory training split; skipping distillation")
+            return None
+
+        print("⚗️  Distilling a fast serving model...")
+        X_train, _ = self.evaluation_data['train']
+        X_test, y_test = self.evaluation_data['held_out']
+        params = {**DISTILL_DEFAULT_PARAMS, **(student_params or {})}
+        gates = {**DISTILL_GATES, **(gates or {})}
+
+        teacher_train = self.model.predict_proba(X_train)
+        student = xgb.XGBClassifier(random_state=42, **params)
+        if teacher_train.shape[1] == 2:
+            booster_params = {key: value for key, value in student.get_xgb_params().items() if value is not None}
+            booster = xgb.train(booster_params, xgb.DMatrix(X_train, label=teacher_train[:, 1]),
+                                num_boost_round=params['n_estimators'])
+            student.load_model(bytearray(booster.save_raw('ubj')))
+        else:
+            student.fit(X_train, teacher_train.argmax(axis=1))
+
+        y_test = np.asarray(y_test)
+        teacher_proba = self.model.predict_proba(X_test)
+        student_proba = student.predict_proba(X_test)
+        teacher_pred = teacher_proba.argmax(axis=1)
+        student_pred = student_proba.argmax(axis=1)
+
+        teacher_accuracy = (teacher_pred == y_test).mean() * 100
+        student_accuracy = (student_pred == y_test).mean() * 100
+        teacher_latency = _predict_latency_us(self.model, X_test)
+        student_latency = _predict_latency_us(student, X_test)
+
+        fidelity = (teacher_pred == student_pred).mean() * 100
+        speedup = {key: teacher_latency[key] / max(student_latency[key], 1e-9) for key in teacher_latency}
+        accepted = fidelity >= gates['min_fidelity'] and speedup['single_row'] >= gates['min_speedup']
+
+        self.fast_model = student if accepted else None
+        self.distillation = model_report.to_json_safe({
+            'params': params,
+            'fidelity': fidelity,
+            'probability_mae': np.abs(teacher_proba - student_proba).mean(),
+            'accuracy': {'full': teacher_accuracy, 'fast': student_accuracy,
+                         'gap': teacher_accuracy - student_accuracy},
+            'latency_us': {'full': teacher_latency, 'fast': student_latency},
+            'speedup': speedup,
+            'gates': gates,
+            'accepted': accepted,
+        })
+
+        report = self.distillation
+        print(f"   Fidelity: {report['fidelity']:.1f}% agreement (mean |Δp| {report['probability_mae']:.3f})")
+        print(f"   Accuracy: {student_accuracy:.2f}% vs {teacher_accuracy:.2f}% ({-report['accuracy']['gap']:+.2f})")
+        print(f"   Single-row latency: {student_latency['single_row']:.0f}µs vs {teacher_latency['single_row']:.0f}µs "
+              f"({report['speedup']['single_row']:.1f}x faster)")
+        if not accepted:
+            print(f"⚠️  Below the gates ({gates['min_fidelity']:g}% fidelity, {gates['min_speedup']:g}x speedup): "
+                  f"interactive endpoints will use the full model")
+        return self.distillation
 
     def create_shap_explainer(self, X_train, feature_names):
         """Create SHAP explainer for model interpretability"""
         print("🔬 Creating SHAP explainer...")
 
         try:
+            import shap
+
             # Create SHAP explainer
             self.explainer = shap.TreeExplainer(self.model)
 
             # Ensure data is in the right format for SHAP
             X_train_sample = X_train[:1000]  # Use smaller sample for SHAP
 
-            # Calculate SHAP values for training data
-            shap_values = self.explainer.shap_values(X_train_sample)
-
-            # Create SHAP summary plot
-            plt.figure(figsize=(12, 8))
-            shap.summary_plot(shap_values, X_train_sample,
-                            feature_names=feature_names, show=False)
-            plt.savefig('shap_summary.png', dpi=300, bbox_inches='tight')
-            plt.close()
-
-            # Create SHAP waterfall plot for a sample prediction
-            sample_idx = 0
-            plt.figure(figsize=(10, 6))
-            if isinstance(shap_values, list) and len(shap_values) > 1:
-                # Multi-class case
-                shap.plots.waterfall(self.explainer.expected_value[1], shap_values[1][sample_idx],
-                                   X_train_sample[sample_idx], feature_names=feature_names, show=False)
-            else:
-                # Binary case
-                shap.plots.waterfall(self.explainer.expected_value, shap_values[sample_idx],
-                                   X_train_sample[sample_idx], feature_names=feature_names, show=False)
-            plt.savefig('shap_waterfall.png', dpi=300, bbox_inches='tight')
-            plt.close()
+            # Create SHAP summary and waterfall (first sample) plots
+            diagnostics.plot_shap_summary(self.explainer, X_train_sample, feature_names)
+            diagnostics.plot_shap_waterfall(self.explainer, X_train_sample, feature_names)
 
             print("✅ SHAP analysis completed and saved")
 
@@ -307,30 +849,8 @@ class StudentEngagementPredictor:
             return
 
         try:
-            import matplotlib.pyplot as plt
-            import seaborn as sns
-
-            # Get feature importance
-            if hasattr(self.model, 'feature_importances_'):
-                importance = self.model.feature_importances_
-            else:
-                return
-
-            # Create DataFrame for plotting
-            feature_imp = pd.DataFrame({
-                'feature': self.feature_columns,
-                'importance': importance
-            }).sort_values('importance', ascending=False)
-
-            # Plot
-            plt.figure(figsize=(10, 8))
-            sns.barplot(x='importance', y='feature', data=feature_imp.head(15))
-            plt.title('Top 15 Feature Importance')
-            plt.tight_layout()
-            plt.savefig('feature_importance.png', dpi=300, bbox_inches='tight')
-            plt.close()
-
-            print("📈 Feature importance plot saved as 'feature_importance.png'")
+            if diagnostics.plot_feature_importance(self.model, self.feature_columns):
+                print("📈 Feature importance plot saved as 'feature_importance.png'")
 
         except ImportError:
             print("⚠️  Matplotlib/seaborn not available for plotting")
@@ -347,35 +867,111 @@ class StudentEngagementPredictor:
         joblib.dump(self.scaler, 'models/scaler.pkl')
         joblib.dump(self.feature_columns, 'models/feature_columns.pkl')
         joblib.dump(self.label_encoders, 'models/label_encoders.pkl')
+        joblib.dump(self.feature_pipeline, PIPELINE_PATH)
+
+        if self.fast_model is not None:
+            joblib.dump(self.fast_model, FAST_MODEL_PATH)
+            print("✅ Distilled fast model saved")
+        elif os.path.exists(FAST_MODEL_PATH):
+            # A student distilled from a previous model would disagree with this one
+            os.remove(FAST_MODEL_PATH)
 
         # Save SHAP explainer if available
         if self.explainer:
             joblib.dump(self.explainer, 'models/shap_explainer.pkl')
             print("✅ SHAP explainer saved")
+        elif os.path.exists('models/shap_explainer.pkl'):
+            # An explainer left over from a previous model would be wrong
+            os.remove('models/shap_explainer.pkl')
 
         # Save training history
         self.training_history['timestamp'] = datetime.now()
         self.training_history['model_type'] = type(self.model).__name__
         self.training_history['feature_count'] = len(self.feature_columns)
-        self.training_history['training_samples'] = len(pd.read_csv('data/processed_data.csv'))
+        if self.distillation:
+            self.training_history['distillation'] = self.distillation
+        if 'training_samples' not in self.training_history:
+            self.training_history['training_samples'] = len(pd.read_csv('data/processed_data.csv'))
 
         joblib.dump(self.training_history, 'models/training_history.pkl')
 
+        # Persist the evaluation report served by /api/model_performance
+        self.save_performance_report()
+
+        # Written last: marks the bundle complete for a running app to pick up
+        model_registry.write_bundle_manifest('models')
+
         print("✅ Model saved successfully!")
 
+    def save_performance_report(self, path=model_report.REPORT_PATH):
+        """Compute held-out and full-data metrics once and save them as JSON"""
+        if not self.evaluation_data:
+            return None
+
+        class_names = None
+        if 'risk_level' in self.label_encoders:
+            class_names = list(self.label_encoders['risk_level'].classes_)
+
+        report = model_report.build_report(
+            self.model, self.feature_columns,
+            held_out=self.evaluation_data['held_out'],
+            full_data=self.evaluation_data['full_data'],
+            model_version=model_report.file_version('models/student_engagement_model.pkl'),
+            data_version=model_report.file_version('data/processed_data.csv'),
+            class_names=class_names
+        )
+        if self.distillation:
+            report['distillation'] = self.distillation
+        model_report.save_report(report, path)
+        print(f"📋 Performance report saved to {path}")
+        return report
+
+    def load_saved_model(self, model_dir='models'):
+        """Load a saved model bundle for inference without retraining"""
+        self.model = joblib.load(os.path.join(model_dir, 'student_engagement_model.pkl'))
+        self.scaler = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
+        self.feature_columns = joblib.load(os.path.join(model_dir, 'feature_columns.pkl'))
+        self.label_encoders = joblib.load(os.path.join(model_dir, 'label_encoders.pkl'))
+
+        pipeline_path = os.path.join(model_dir, os.path.basename(PIPELINE_PATH))
+        if os.path.exists(pipeline_path):
+            self.feature_pipeline = joblib.load(pipeline_path)
+        else:
+            # Bundles saved before the feature pipeline existed
+            self.feature_pipeline = FeaturePipeline.from_artifacts(
+                pd.read_csv('data/processed_data.csv'), self.label_encoders,
+                self.feature_columns, self.scaler
+            )
+        self.target_column = self.feature_pipeline.target_column
+
+        explainer_path = os.path.join(model_dir, 'shap_explainer.pkl')
+        if os.path.exists(explainer_path):
+            self.explainer = joblib.load(explainer_path)
+
+        fast_model_path = os.path.join(model_dir, os.path.basename(FAST_MODEL_PATH))
+        if os.path.exists(fast_model_path):
+            self.fast_model = joblib.load(fast_model_path)
+
+        return self
+
+    def transform(self, new_data, scale=True):
+        """Fitted-transform path: build model inputs without refitting anything
+
+        Reuses the stored encoders, imputation values and feature columns;
+        unseen categories fall back to the training mode instead of raising.
+        Nothing is printed, so this is safe to call in tight scoring loops.
+        """
+        if self.feature_pipeline is None or self.feature_pipeline.feature_columns is None:
+            raise ValueError("Model not trained yet!")
+        return self.feature_pipeline.feature_matrix(new_data, scale=scale)
+
     def predict(self, new_data):
         """Make predictions on new data"""
         if not self.model:
             raise ValueError("Model not trained yet!")
 
-        # Preprocess new data
-        processed_data = self.preprocess_data(new_data.copy())
-
-        # Select only trained features
-        processed_data = processed_data[self.feature_columns]
-
-        # Scale data
-        processed_data_scaled = self.scaler.transform(processed_data)
+        # Preprocess and scale with the fitted pipeline
+        processed_data_scaled = self.transform(new_data)
 
         # Make predictions
         predictions = self.model.predict(processed_data_scaled)
@@ -388,39 +984,323 @@ class StudentEngagementPredictor:
         if not self.explainer:
             raise ValueError("SHAP explainer not available!")
 
-        # Preprocess and scale data
-        processed_data = self.preprocess_data(data)
-        processed_data = processed_data[self.feature_columns]
-        scaled_data = self.scaler.transform(processed_data)
+        # Preprocess and scale data with the fitted pipeline
+        processed_data = pd.DataFrame(self.transform(data, scale=False), columns=self.feature_columns)
+        scaled_data = self.transform(data)
 
         # Calculate SHAP values
         shap_values = self.explainer.shap_values(scaled_data)
 
         return shap_values, processed_data
 
-def main():
-    """Main training pipeline"""
+    def encode_target(self, df):
+        """Encoded risk labels for labeled rows, using the saved risk_level encoder
+
+        Mirrors preprocess_data(): a binary numeric target maps 0/1 to
+        Low/High, a categorical target is used directly. Rows with a missing
+        or unknown label come back as NaN.
+        """
+        if not self.target_column:
+            raise ValueError("Saved model doesn't record its target column; retrain it once first")
+        if self.target_column not in df.columns:
+            raise ValueError(f"Labeled data must include the target column '{self.target_column}'")
+
+        classes = [str(c) for c in self.label_encoders['risk_level'].classes_]
+        target = df[self.target_column]
+        if pd.api.types.is_numeric_dtype(target):
+            if sorted(classes) != ['High', 'Low']:
+                # Quantile-binned targets can't be re-binned consistently
+                raise ValueError("Incremental updates need a binary or categorical target; retrain instead")
+            labels = target.map({0: 'Low', 1: 'High'})
+        else:
+            labels = target.astype(str)
+        return labels.map({label: code for code, label in enumerate(classes)})
+
+    def reference_evaluation_data(self, processed_path='data/processed_data.csv'):
+        """Rebuild the training held-out split and full data from processed_data.csv"""
+        df = pd.read_csv(processed_path)
+        if self.target_column in df.columns:
+            # Students added by rescoring.py without a label carry predicted risk levels
+            df = df[df[self.target_column].notnull()]
+        X = self.scaler.transform(df[self.feature_columns])
+        y = df['risk_level_encoded']
+        # Same split as train_model(), so the held-out rows are ones the model never saw
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+        return {'train': (X_train, y_train), 'held_out': (X_test, y_test), 'full_data': (X, y)}
+
+    def update_incremental(self, new_df, mode='continue', n_rounds=25, holdout_fraction=0.2,
+                           tolerance=0.5, random_state=42):
+        """Update the loaded XGBoost model from newly labeled rows without retraining
+
+        continue adds n_rounds boosting rounds fitted on the new rows only;
+        refresh keeps every tree's structure and re-fits its leaf values. The
+        candidate replaces the current model only if its accuracy on the
+        original held-out split and on a held-out slice of the new rows drops
+        by no more than tolerance percentage points. Returns a summary dict.
+        """
+        if not isinstance(self.model, xgb.XGBClassifier):
+            raise ValueError("Incremental updates need an XGBoost model; retrain instead")
+        if mode not in INCREMENTAL_MODES:
+            raise ValueError(f"Unknown incremental mode: {mode}")
+
+        print(f"🔁 Incremental update ({mode}) from {len(new_df)} labeled rows...")
+        start = time.perf_counter()
+
+        y = self.encode_target(new_df)
+        labeled = y.notnull().to_numpy()
+        if not labeled.all():
+            print(f"⚠️  Skipping {int((~labeled).sum())} rows without a known label")
+        X = self.transform(new_df[labeled])
+        y = y[labeled].astype(int).to_numpy()
+
+        class_counts = np.bincount(y, minlength=len(self.model.classes_))
+        if (class_counts == 0).any():
+            raise ValueError("New rows must include every risk level to update the model")
+
+        X_train, X_new_holdout, y_train, y_new_holdout = train_test_split(
+            X, y, test_size=holdout_fraction, random_state=random_state,
+            stratify=y if class_counts.min() >= 2 else None
+        )
+
+        base_params = self.model.get_params()
+        booster = self.model.get_booster()
+        if mode == 'continue':
+            candidate = xgb.XGBClassifier(**{**base_params, 'n_estimators': n_rounds})
+            candidate.fit(X_train, y_train, xgb_model=booster)
+        else:
+            refreshed = xgb.XGBClassifier(**{**base_params, **LEAF_REFRESH_PARAMS,
+                                             'n_estimators': booster.num_boosted_rounds()})
+            refreshed.fit(X_train, y_train, xgb_model=booster)
+            # Keep only the trees so the saved model trains normally next time
+            candidate = xgb.XGBClassifier(**base_params)
+            candidate.load_model(bytearray(refreshed.get_booster().save_raw('ubj')))
+        fit_seconds = time.perf_counter() - start
+
+        # Guard promotion: the candidate must not regress on either held-out set
+        reference = self.reference_evaluation_data()
+        checks = {'reference_held_out': reference['held_out'],
+                  'new_held_out': (X_new_holdout, y_new_holdout)}
+        comparison = {}
+        for name, (X_eval, y_eval) in checks.items():
+            current = model_report.evaluate(self.model, X_eval, y_eval)['accuracy']
+            updated = model_report.evaluate(candidate, X_eval, y_eval)['accuracy']
+            comparison[name] = {'samples': len(y_eval), 'current': current,
+                                'candidate': updated, 'delta': updated - current}
+            print(f"   {name}: {current:.2f}% → {updated:.2f}% ({updated - current:+.2f})")
+
+        promoted = all(result['delta'] >= -tolerance for result in comparison.values())
+
+        update = {
+            'timestamp': datetime.now(),
+            'mode': mode,
+            'source': self.data_path,
+            'rows': int(len(y)),
+            'train_rows': int(len(y_train)),
+            'boosted_rounds': candidate.get_booster().num_boosted_rounds(),
+            'fit_seconds': fit_seconds,
+            'comparison': comparison,
+            'tolerance': tolerance,
+            'promoted': promoted,
+        }
+
+        if promoted:
+            self.model = candidate
+            self.evaluation_data = reference
+            if self.fast_model is not None:
+                # Keep the fast serving model in step with the updated one
+                update['distillation'] = self.distill_model()
+            self.save_incremental_update(update)
+        else:
+            print(f"🛑 Candidate regressed by more than {tolerance} points; keeping the current model")
+
+        update['seconds'] = time.perf_counter() - start
+        print(f"⏱️  Incremental update took {update['seconds']:.1f}s")
+        return update
+
+    def save_incremental_update(self, update):
+        """Swap in the updated model and refresh its history and performance report"""
+        print("💾 Promoting updated model...")
+
+        # Versions this bundle descends from, so a cache restore of one of
+        # them can tell it would undo this update
+        previous = model_registry.read_bundle_manifest('models') or {}
+        base_version = previous.get('version') or model_report.file_version('models/student_engagement_model.pkl')
+        lineage = previous.get('lineage', []) + [base_version]
+
+        # Write then rename so a running app never loads a half-written file
+        model_path = 'models/student_engagement_model.pkl'
+        for path, model in [(model_path, self.model), (FAST_MODEL_PATH, self.fast_model)]:
+            if model is not None:
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                joblib.dump(model, tmp_path)
+                os.replace(tmp_path, path)
+            elif os.path.exists(path):
+                # The re-distilled student failed its gates; it mustn't serve the updated model
+                os.remove(path)
+
+        if os.path.exists('models/shap_explainer.pkl'):
+            # Explains the previous trees; rebuild with diagnostics.py --only shap_explainer
+            os.remove('models/shap_explainer.pkl')
+            self.explainer = None
+
+        history_path = 'models/training_history.pkl'
+        self.training_history = joblib.load(history_path) if os.path.exists(history_path) else {}
+        self.training_history.setdefault('incremental_updates', []).append(update)
+        joblib.dump(self.training_history, history_path)
+
+        self.save_performance_report()
+        model_registry.write_bundle_manifest('models', incremental_update=True, lineage=lineage)
+        print("✅ Updated model saved")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Train the student engagement model')
+    parser.add_argument('--data', default='Dataset.xlsx',
+                        help='Training dataset (Excel, CSV, Parquet, or a directory of them with --chunked)')
+    parser.add_argument('--tune', action='store_true',
+                        help='Search XGBoost hyperparameters before training')
+    parser.add_argument('--tune-trials', type=int, default=18, help='Configurations to try when tuning')
+    parser.add_argument('--tune-jobs', type=int, default=None, help='Tuning worker processes (default: all CPUs)')
+    parser.add_argument('--fast', action='store_true',
+                        help='Headless mode: only the model bundle and metrics (no CV, plots or SHAP)')
+    parser.add_argument('--diagnostics', action='store_true',
+                        help='After saving, render plots and the SHAP explainer in parallel worker processes')
+    parser.add_argument('--chunked', action='store_true',
+                        help='Out-of-core training: stream the data in chunks (memory bounded by --chunk-rows)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='Rows per chunk with --chunked')
+    parser.add_argument('--no-prune', action='store_true',
+                        help='Keep every non-constant feature (skip duplicate/low-importance pruning)')
+    parser.add_argument('--no-distill', action='store_true',
+                        help='Skip the distilled fast model used for interactive serving')
+    parser.add_argument('--distill-min-fidelity', type=float, default=DISTILL_GATES['min_fidelity'],
+                        help='Smallest agreement with the full model (%%) for the fast model to be saved')
+    parser.add_argument('--distill-min-speedup', type=float, default=DISTILL_GATES['min_speedup'],
+                        help='Smallest single-row speedup for the fast model to be saved')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always retrain, even if a bundle for the same inputs is cached')
+    parser.add_argument('--cache-keep', type=int, default=artifact_cache.DEFAULT_MAX_ENTRIES,
+                        help='Cached bundles to keep')
+    parser.add_argument('--cache-max-age', type=float, default=artifact_cache.DEFAULT_MAX_AGE_DAYS,
+                        help='Prune cached bundles unused for this many days')
+    parser.add_argument('--update', metavar='PATH',
+                        help='Update the saved model from newly labeled rows instead of retraining')
+    parser.add_argument('--update-mode', choices=INCREMENTAL_MODES, default='continue',
+                        help='continue: add boosting rounds; refresh: re-fit existing leaf values')
+    parser.add_argument('--update-rounds', type=int, default=25, help='Boosting rounds added in continue mode')
+    parser.add_argument('--update-tolerance', type=float, default=0.5,
+                        help='Largest held-out accuracy drop (percentage points) allowed for promotion')
+    return parser.parse_args(argv)
+
+def training_config(fast=False, tune=False, tune_trials=18, chunked=False, chunk_rows=DEFAULT_CHUNK_ROWS,
+                    distill=True, prune=True, distill_gates=None):
+    """Everything besides the data that determines the trained bundle (for the artifact cache)"""
+    code_dir = os.path.dirname(os.path.abspath(__file__))
+    return {
+        'model_type': 'xgboost',
+        'params': XGBOOST_DEFAULT_PARAMS,
+        'tune': {'trials': tune_trials, 'space': TUNING_SPACE} if tune else None,
+        'fast': fast,
+        'chunk_rows': chunk_rows if chunked else None,
+        'distill': {**DISTILL_DEFAULT_PARAMS, 'gates': {**DISTILL_GATES, **(distill_gates or {})}} if distill else None,
+        'prune': PRUNING_DEFAULTS if prune else None,
+        'features': {
+            'derived': DERIVED_FEATURES,
+            'interactions': INTERACTION_FEATURES,
+            'failure_risk': FAILURE_RISK_FEATURE,
+            'target_derived': TARGET_DERIVED_COLUMNS,
+        },
+        # Training code changes invalidate cached bundles too
+        'code': {name: file_sha256(os.path.join(code_dir, name))
+                 for name in ['train_model.py', 'features.py', 'chunked_training.py',
+                              'model_report.py', 'dataset_cache.py', 'diagnostics.py']},
+    }
+
+def promoted_update_of(version, model_dir='models'):
+    """bundle.json of a promoted incremental update in model_dir built on version, or None"""
+    manifest = model_registry.read_bundle_manifest(model_dir)
+    if version and manifest and manifest.get('incremental_update') and version in manifest.get('lineage', []):
+        return manifest
+    return None
+
+def run_training(data_path='Dataset.xlsx', fast=False, tune=False, tune_trials=18, tune_jobs=None,
+                 run_diagnostics=False, diagnostics_jobs=None, chunked=False, chunk_rows=DEFAULT_CHUNK_ROWS,
+                 use_cache=True, cache_max_entries=artifact_cache.DEFAULT_MAX_ENTRIES,
+                 cache_max_age_days=artifact_cache.DEFAULT_MAX_AGE_DAYS, distill=True, prune=True,
+                 distill_gates=None):
+    """Run the full training pipeline and return the trained predictor
+
+    fast produces only the model bundle and metrics report; run_diagnostics
+    renders plots and the SHAP explainer afterwards as a separate, parallel
+    step (see diagnostics.py). chunked trains out-of-core (see
+    train_chunked()), which is always headless and can't be combined with
+    tuning. With use_cache, a bundle already trained from the same data,
+    features and parameters is restored from models/cache/ instead.
+    prune drops duplicate and low-importance features after training;
+    distill also saves a small student model for interactive serving when
+    it passes distill_gates (overrides of DISTILL_GATES).
+    """
     print("🎓 Student Engagement Prediction System")
     print("=" * 50)
 
+    if chunked and tune:
+        print("❌ Hyperparameter tuning needs the in-memory path; drop --tune or --chunked")
+        return None
+
     # Initialize predictor
-    predictor = StudentEngagementPredictor()
+    predictor = StudentEngagementPredictor(data_path)
+
+    cache_key = config = None
+    if use_cache:
+        config = training_config(fast, tune, tune_trials, chunked, chunk_rows, distill, prune, distill_gates)
+        cache_key = artifact_cache.cache_key(expand_sources(data_path), config)
+        promoted = promoted_update_of(artifact_cache.cached_model_version(cache_key))
+        if promoted:
+            # Restoring the cached bundle would silently roll back the update
+            print(f"♻️  Data, features and parameters unchanged, and models/ holds {promoted['version']}, "
+                  f"a promoted update of the cached bundle {cache_key[:16]}: keeping it "
+                  f"(--no-cache retrains from scratch)")
+            predictor.load_saved_model()
+            if run_diagnostics:
+                diagnostics.generate_diagnostics(n_jobs=diagnostics_jobs)
+            return predictor
+        if artifact_cache.restore_bundle(cache_key):
+            print(f"♻️  Data, features and parameters unchanged: reusing cached bundle {cache_key[:16]}")
+            model_registry.write_bundle_manifest('models')
+            artifact_cache.prune_cache(max_entries=cache_max_entries, max_age_days=cache_max_age_days,
+                                       keep=cache_key)
+            # The restored student CSV predates any rescoring.py runs
+            rescoring.reapply_rescored()
+            predictor.load_saved_model()
+            if run_diagnostics:
+                diagnostics.generate_diagnostics(n_jobs=diagnostics_jobs)
+            print("🚀 Ready to launch the dashboard with: python app.py")
+            return predictor
+
+    if chunked:
+        X_test, y_test, feature_cols = predictor.train_chunked(data_path, chunk_rows=chunk_rows)
+    else:
+        # Load and analyze data
+        df = predictor.load_and_analyze_data()
+        if df is None:
+            print("❌ Could not proceed without valid dataset")
+            return None
 
-    # Load and analyze data
-    df = predictor.load_and_analyze_data()
-    if df is None:
-        print("❌ Could not proceed without valid dataset")
-        return
+        # Preprocess data
+        processed_df = predictor.preprocess_data(df)
 
-    # Preprocess data
-    processed_df = predictor.preprocess_data(df)
+        # Optionally tune hyperparameters first
+        model_params = None
+        if tune:
+            model_params = predictor.tune_hyperparameters(
+                processed_df, n_trials=tune_trials, n_jobs=tune_jobs
+            )
 
-    # Train model
-    X_test, y_test, feature_cols = predictor.train_model(processed_df)
+        # Train model
+        X_test, y_test, feature_cols = predictor.train_model(processed_df, model_params=model_params, fast=fast,
+                                                             prune=prune)
 
     # Evaluate on test set
     print("\n📊 Detailed Evaluation:")
-    y_pred = predictor.model.predict(predictor.scaler.transform(X_test))
+    y_pred = predictor.model.predict(X_test)  # X_test is already scaled
 
     print("\nConfusion Matrix:")
     print(confusion_matrix(y_test, y_pred))
@@ -428,11 +1308,56 @@ def main():
     print("\nClassification Report:")
     print(classification_report(y_test, y_pred))
 
+    if distill:
+        predictor.distill_model(gates=distill_gates)
+
     # Save model
     predictor.save_model()
 
+    if cache_key:
+        artifact_cache.store_bundle(cache_key, config)
+        removed = artifact_cache.prune_cache(max_entries=cache_max_entries, max_age_days=cache_max_age_days,
+                                             keep=cache_key)
+        print(f"🗄️  Bundle cached as {cache_key[:16]}" + (f" (pruned {len(removed)} old)" if removed else ""))
+
+    # Training rewrote the student CSV; put back the students rescoring.py updated
+    rescoring.reapply_rescored()
+
+    if run_diagnostics:
+        diagnostics.generate_diagnostics(n_jobs=diagnostics_jobs)
+
     print("\n🎉 Training complete!")
     print("🚀 Ready to launch the dashboard with: python app.py")
+    return predictor
+
+def run_incremental_update(data_path, mode='continue', n_rounds=25, tolerance=0.5):
+    """Update the saved model bundle from newly labeled data; returns the update summary"""
+    print("🎓 Student Engagement Prediction System - incremental update")
+    print("=" * 50)
+
+    predictor = StudentEngagementPredictor(data_path).load_saved_model()
+    new_df = read_dataset(data_path)
+    update = predictor.update_incremental(new_df, mode=mode, n_rounds=n_rounds, tolerance=tolerance)
+
+    if update['promoted']:
+        print("\n🎉 Model updated! Running servers pick it up from models/bundle.json within "
+              "MODEL_WATCH_INTERVAL seconds; otherwise start one with: python serve.py")
+    return update
+
+def main(argv=None):
+    """Main training pipeline"""
+    args = parse_args(argv)
+    if args.update:
+        run_incremental_update(args.update, mode=args.update_mode, n_rounds=args.update_rounds,
+                               tolerance=args.update_tolerance)
+        return
+    run_training(args.data, fast=args.fast, tune=args.tune, tune_trials=args.tune_trials,
+                 tune_jobs=args.tune_jobs, run_diagnostics=args.diagnostics,
+                 chunked=args.chunked, chunk_rows=args.chunk_rows, use_cache=not args.no_cache,
+                 cache_max_entries=args.cache_keep, cache_max_age_days=args.cache_max_age,
+                 distill=not args.no_distill, prune=not args.no_prune,
+                 distill_gates={'min_fidelity': args.distill_min_fidelity,
+                                'min_speedup': args.distill_min_speedup})
 
 if __name__ == "__main__":
     main()